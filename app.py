@@ -1,8 +1,52 @@
 from fastapi import FastAPI, Request
 from fastapi.responses import JSONResponse
+import asyncio
+import os
+import random
+import time
+import uuid
 
 app = FastAPI()
 
+# سلوك محاكي Graph API قابل للضبط من المتغيرات أو أثناء التشغيل عبر POST /stub/config:
+#   latency_ms / jitter_ms: زمن الرد (متوسط ± تذبذب)
+#   error_rate: نسبة الردود 500 (خطأ مؤقت من Meta)
+#   rate_limit_rate: نسبة الردود 429 العشوائية (#130429)
+#   max_mps: حد الرسائل في الثانية (0 = بلا حد)؛ ما يتجاوزه يُرد بـ 429
+STUB_CONFIG = {
+    "latency_ms": float(os.getenv("GRAPH_STUB_LATENCY_MS", "0")),
+    "jitter_ms": float(os.getenv("GRAPH_STUB_JITTER_MS", "0")),
+    "error_rate": float(os.getenv("GRAPH_STUB_ERROR_RATE", "0")),
+    "rate_limit_rate": float(os.getenv("GRAPH_STUB_RATE_LIMIT_RATE", "0")),
+    "max_mps": float(os.getenv("GRAPH_STUB_MAX_MPS", "0")),
+}
+STUB_STATS = {"requests": 0, "sent": 0, "errors": 0, "rate_limited": 0, "started_at": time.time()}
+_bucket = {"tokens": 0.0, "updated": time.monotonic()}
+
+
+def _take_token():
+    """حد المعدل بطريقة token bucket (سعة ثانية واحدة من max_mps)"""
+    rate = STUB_CONFIG["max_mps"]
+    if not rate:
+        return True
+    now = time.monotonic()
+    _bucket["tokens"] = min(rate, _bucket["tokens"] + (now - _bucket["updated"]) * rate)
+    _bucket["updated"] = now
+    if _bucket["tokens"] < 1:
+        return False
+    _bucket["tokens"] -= 1
+    return True
+
+
+def _graph_error(status, code, message, error_type="OAuthException"):
+    return JSONResponse(status_code=status, content={"error": {
+        "message": message,
+        "type": error_type,
+        "code": code,
+        "fbtrace_id": uuid.uuid4().hex[:22],
+    }})
+
+
 @app.get("/health")
 async def health():
     return {"status": "ok", "message": "🛡️ Guardian API is running!"}
@@ -14,3 +58,50 @@ async def whatsapp(request: Request):
     message = data.get("message")
     print(f"📩 Message to {phone}: {message}")
     return JSONResponse(content={"sent": True, "to": phone, "message": message})
+
+@app.get("/stub/config")
+async def stub_config():
+    return STUB_CONFIG
+
+@app.post("/stub/config")
+async def update_stub_config(request: Request):
+    data = await request.json()
+    for key, value in data.items():
+        if key in STUB_CONFIG:
+            STUB_CONFIG[key] = float(value)
+    return STUB_CONFIG
+
+@app.get("/stub/stats")
+async def stub_stats():
+    return {**STUB_STATS, "uptime": round(time.time() - STUB_STATS["started_at"], 3)}
+
+@app.post("/stub/reset")
+async def reset_stub_stats():
+    STUB_STATS.update({"requests": 0, "sent": 0, "errors": 0, "rate_limited": 0, "started_at": time.time()})
+    return STUB_STATS
+
+# محاكي Graph API لاختبار عميل واتساب محلياً:
+#   WHATSAPP_API_BASE_URL=http://localhost:8001 (مع uvicorn benchmarks.graph_stub:app --port 8001)
+@app.post("/{version}/{phone_number_id}/messages")
+async def graph_messages(version: str, phone_number_id: str, request: Request):
+    data = await request.json()
+    recipient = data.get("to")
+    STUB_STATS["requests"] += 1
+
+    latency = STUB_CONFIG["latency_ms"] + random.uniform(-1, 1) * STUB_CONFIG["jitter_ms"]
+    if latency > 0:
+        await asyncio.sleep(latency / 1000)
+
+    if not _take_token() or random.random() < STUB_CONFIG["rate_limit_rate"]:
+        STUB_STATS["rate_limited"] += 1
+        return _graph_error(429, 130429, "(#130429) Rate limit hit")
+    if random.random() < STUB_CONFIG["error_rate"]:
+        STUB_STATS["errors"] += 1
+        return _graph_error(500, 2, "An unexpected error has occurred. Please retry your request later.")
+
+    STUB_STATS["sent"] += 1
+    return JSONResponse(content={
+        "messaging_product": "whatsapp",
+        "contacts": [{"input": recipient, "wa_id": str(recipient).lstrip("+")}],
+        "messages": [{"id": f"wamid.stub.{uuid.uuid4().hex}"}]
+    })
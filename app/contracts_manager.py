@@ -15,7 +15,15 @@ import logging
 import psycopg2
 from psycopg2.extras import DictCursor
 
-from app.db.database import get_connection
+from app.db.database import db_connection
+from app.db.contracts_view import EXPIRING_THRESHOLD_DAYS, expiring_contracts
+from app.db.loaders import load_contract_detail
+from app.db.pagination import DEFAULT_PAGE_SIZE, Page
+from app.services import search
+from app.services.stats_service import load_dashboard_stats
+from app.services.phone_index import contract_phone_index, load_contract_tenant_by_phone
+from app.services.payment_schedule import create_payment_schedule, regenerate_payment_schedules
+from app.services.contract_import import import_contracts, IMPORT_CHUNK_SIZE
 
 # إعداد التسجيل
 logging.basicConfig(level=logging.INFO)
@@ -30,12 +38,9 @@ class ContractsManager:
     
     @contextmanager
     def _get_connection(self):
-        """مدير سياق للاتصال بقاعدة البيانات الجديدة"""
-        conn = get_connection()
-        try:
+        """مدير سياق يسحب اتصالاً من المجمع المشترك"""
+        with db_connection() as conn:
             yield conn
-        finally:
-            conn.close()
     
     def init_database(self):
         """إنشاء/تحديث جداول العقود في قاعدة البيانات"""
@@ -70,9 +75,7 @@ class ContractsManager:
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                     created_by TEXT,
-                    notes TEXT,
-                    days_remaining INTEGER,
-                    is_expiring BOOLEAN DEFAULT FALSE
+                    notes TEXT
                 )
             ''')
             
@@ -123,6 +126,10 @@ class ContractsManager:
                 )
             ''')
             
+            # renewal_reminders، فهرس أرقام الهاتف، عمود البحث search_doc، العرض contracts_view
+            # وفهارس التذكيرات في supabase/migrations (20251022 - 20251026): DDL ثقيل يأخذ
+            # ACCESS EXCLUSIVE على contracts فلا يُنفذ مع كل إنشاء لـ ContractsManager
+            
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_contracts_status ON contracts(status)')
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_contracts_end_date ON contracts(end_date)')
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_contracts_phone ON contracts(tenant_phone)')
@@ -147,18 +154,13 @@ class ContractsManager:
                 if cursor.fetchone():
                     return False, "رقم العقد موجود مسبقاً", None
                 
-                end_date = datetime.strptime(contract_data['end_date'], '%Y-%m-%d')
-                days_remaining = (end_date - datetime.now()).days
-                is_expiring = days_remaining <= 30
-                
                 insert_query = '''
                     INSERT INTO contracts (
                         contract_number, property_id, tenant_id, owner_id, tenant_name,
                         tenant_phone, property_address, contract_type, start_date, end_date, 
                         monthly_rent, total_amount, deposit_amount, commission_rate, payment_frequency,
-                        currency, terms_conditions, special_conditions, created_by, notes,
-                        days_remaining, is_expiring
-                    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                        currency, terms_conditions, special_conditions, created_by, notes
+                    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
                     RETURNING id
                 '''
                 
@@ -182,9 +184,7 @@ class ContractsManager:
                     contract_data.get('terms_conditions', ''),
                     contract_data.get('special_conditions', ''),
                     contract_data.get('created_by', 'System'),
-                    contract_data.get('notes', ''),
-                    days_remaining,
-                    is_expiring
+                    contract_data.get('notes', '')
                 ))
                 
                 contract_id = cursor.fetchone()[0]
@@ -195,6 +195,8 @@ class ContractsManager:
                     self._create_payment_schedule(cursor, contract_id, contract_data)
                 
                 conn.commit()
+            
+            contract_phone_index.invalidate(contract_data.get('tenant_phone'))
                 
             return True, f"تم إنشاء العقد رقم {contract_data['contract_number']} بنجاح", contract_id
             
@@ -202,26 +204,36 @@ class ContractsManager:
             logger.error(f"خطأ في إنشاء العقد: {str(e)}")
             return False, f"خطأ في إنشاء العقد: {str(e)}", None
     
+    def create_contracts_bulk(self, rows, chunk_size: int = IMPORT_CHUNK_SIZE) -> Dict[str, Any]:
+        """إنشاء عقود متعددة دفعة واحدة (قائمة قواميس بنفس حقول create_contract)"""
+        with self._get_connection() as conn:
+            return import_contracts(conn, rows, chunk_size).to_dict()
+    
+    def _lookup_phone(self, phone: str) -> Optional[Dict[str, Any]]:
+        """حل الرقم عبر فهرس الذاكرة، مع الرجوع لقاعدة البيانات عند عدم وجوده"""
+        def loader(e164):
+            with self._get_connection() as conn:
+                return load_contract_tenant_by_phone(conn, e164)
+        return contract_phone_index.get(phone, loader)
+    
     def get_contracts_by_phone(self, phone: str) -> List[Dict[str, Any]]:
         """الحصول على جميع العقود المرتبطة برقم هاتف معين"""
         try:
+            entry = self._lookup_phone(phone)
+            if not entry:
+                return []
+            
             with self._get_connection() as conn:
                 cursor = conn.cursor(cursor_factory=DictCursor)
                 
                 cursor.execute('''
-                    SELECT * FROM contracts 
-                    WHERE tenant_phone = %s 
+                    SELECT * FROM contracts_view 
+                    WHERE id = ANY(%s) 
                     ORDER BY created_at DESC
-                ''', (phone,))
+                ''', (entry['contract_ids'],))
                 
                 contracts = [dict(row) for row in cursor.fetchall()]
                 
-                for contract in contracts:
-                    if contract['end_date']:
-                        end_date = datetime.strptime(str(contract['end_date']), '%Y-%m-%d')
-                        contract['days_remaining'] = (end_date - datetime.now()).days
-                        contract['is_expiring'] = contract['days_remaining'] <= 30
-                
                 return contracts
                 
         except psycopg2.Error as e:
@@ -229,16 +241,16 @@ class ContractsManager:
             return []
     
     def get_tenant_by_phone(self, phone_number: str) -> Optional[Dict[str, Any]]:
-        """البحث عن عقد مستأجر برقم الهاتف"""
+        """البحث عن عقد مستأجر برقم الهاتف (من فهرس الذاكرة بدون استعلام في الغالب)"""
         try:
-            with self._get_connection() as conn:
-                cursor = conn.cursor(cursor_factory=DictCursor)
-                cursor.execute(
-                    "SELECT id, tenant_name, tenant_phone FROM contracts WHERE tenant_phone = %s LIMIT 1",
-                    (phone_number,)
-                )
-                tenant = cursor.fetchone()
-                return dict(tenant) if tenant else None
+            entry = self._lookup_phone(phone_number)
+            if not entry:
+                return None
+            return {
+                'id': entry['id'],
+                'tenant_name': entry['tenant_name'],
+                'tenant_phone': entry['tenant_phone'],
+            }
         except psycopg2.Error as e:
             logger.error(f"خطأ في البحث عن المستأجر برقم الهاتف: {e}")
             return None
@@ -264,37 +276,21 @@ class ContractsManager:
             logger.error(f"خطأ في الحصول على مدفوعات المستأجر: {e}")
             return []
     
-    def search_contracts(self, search_term: str) -> List[Dict[str, Any]]:
-        """بحث في العقود بمختلف الحقول"""
+    def search_contracts(self, search_term: str, cursor: Optional[str] = None,
+                         page_size: int = DEFAULT_PAGE_SIZE) -> List[Dict[str, Any]]:
+        """بحث في العقود بمختلف الحقول (مرتب حسب الصلة، صفحة واحدة)"""
+        return self.search_contracts_page(search_term, cursor, page_size).items
+
+    def search_contracts_page(self, search_term: str, cursor: Optional[str] = None,
+                              page_size: int = DEFAULT_PAGE_SIZE, status: Optional[str] = None):
+        """بحث العقود مع مؤشر الصفحة التالية"""
         try:
             with self._get_connection() as conn:
-                cursor = conn.cursor(cursor_factory=DictCursor)
-                
-                query = '''
-                    SELECT * FROM contracts 
-                    WHERE contract_number LIKE %s 
-                       OR tenant_name LIKE %s 
-                       OR tenant_phone LIKE %s 
-                       OR property_address LIKE %s
-                    ORDER BY created_at DESC
-                '''
-                
-                search_pattern = f"%{search_term}%"
-                cursor.execute(query, (search_pattern, search_pattern, search_pattern, search_pattern))
-                
-                contracts = [dict(row) for row in cursor.fetchall()]
-                
-                for contract in contracts:
-                    if contract['end_date']:
-                        end_date = datetime.strptime(str(contract['end_date']), '%Y-%m-%d')
-                        contract['days_remaining'] = (end_date - datetime.now()).days
-                        contract['is_expiring'] = contract['days_remaining'] <= 30
-                
-                return contracts
+                return search.search_contracts(conn, search_term, cursor, page_size, status)
                 
         except psycopg2.Error as e:
             logger.error(f"خطأ في البحث: {e}")
-            return []
+            return Page(items=[], page_size=page_size)
     
     def _create_auto_reminders(self, cursor, contract_id: int, contract_data: Dict[str, Any]):
         """إنشاء تذكيرات تلقائية للعقد"""
@@ -305,6 +301,7 @@ class ContractsManager:
             cursor.execute('''
                 INSERT INTO contract_reminders (contract_id, reminder_type, reminder_date, message)
                 VALUES (%s, 'expiry_warning', %s, 'تنبيه: ينتهي العقد خلال شهرين')
+                ON CONFLICT (contract_id, reminder_date) DO NOTHING
             ''', (contract_id, reminder_60.strftime('%Y-%m-%d')))
         
         reminder_30 = end_date - timedelta(days=30)
@@ -312,6 +309,7 @@ class ContractsManager:
             cursor.execute('''
                 INSERT INTO contract_reminders (contract_id, reminder_type, reminder_date, message)
                 VALUES (%s, 'expiry_warning', %s, 'تنبيه: ينتهي العقد خلال شهر')
+                ON CONFLICT (contract_id, reminder_date) DO NOTHING
             ''', (contract_id, reminder_30.strftime('%Y-%m-%d')))
         
         reminder_7 = end_date - timedelta(days=7)
@@ -319,41 +317,25 @@ class ContractsManager:
             cursor.execute('''
                 INSERT INTO contract_reminders (contract_id, reminder_type, reminder_date, message)
                 VALUES (%s, 'expiry_urgent', %s, 'عاجل: ينتهي العقد خلال أسبوع!')
+                ON CONFLICT (contract_id, reminder_date) DO NOTHING
             ''', (contract_id, reminder_7.strftime('%Y-%m-%d')))
     
     def _create_payment_schedule(self, cursor, contract_id: int, contract_data: Dict[str, Any]):
-        """إنشاء جدول المدفوعات الشهرية"""
-        start_date = datetime.strptime(contract_data['start_date'], '%Y-%m-%d')
-        end_date = datetime.strptime(contract_data['end_date'], '%Y-%m-%d')
-        monthly_rent = float(contract_data['monthly_rent'])
-        
-        current_date = start_date
-        while current_date <= end_date:
-            due_date = current_date.replace(day=1)
-            
-            cursor.execute('''
-                INSERT INTO contract_payments (
-                    contract_id, amount, due_date, payment_type, status
-                ) VALUES (%s, %s, %s, 'rent', 'pending')
-            ''', (contract_id, monthly_rent, due_date.strftime('%Y-%m-%d')))
-            
-            if current_date.month == 12:
-                current_date = current_date.replace(year=current_date.year + 1, month=1)
-            else:
-                current_date = current_date.replace(month=current_date.month + 1)
+        """إنشاء جدول المدفوعات حسب payment_frequency بجملة INSERT واحدة"""
+        create_payment_schedule(cursor, contract_id, contract_data)
     
     def get_all_contracts(self, search_term: str = None, filter_status: str = None) -> List[Dict[str, Any]]:
         """الحصول على جميع العقود مع البحث والفلترة"""
         with self._get_connection() as conn:
             cursor = conn.cursor(cursor_factory=DictCursor)
             
-            query = "SELECT * FROM contracts WHERE 1=1"
+            query = "SELECT * FROM contracts_view WHERE 1=1"
             params = []
             
             if search_term:
-                query += " AND (contract_number LIKE %s OR tenant_name LIKE %s OR property_address LIKE %s OR tenant_phone LIKE %s)"
-                search_pattern = f"%{search_term}%"
-                params.extend([search_pattern, search_pattern, search_pattern, search_pattern])
+                term = search.prepare_term(search_term) or search_term
+                query += " AND " + search.match_condition("search_doc")
+                params.extend([term, term])
             
             if filter_status:
                 query += " AND status = %s"
@@ -364,54 +346,19 @@ class ContractsManager:
             cursor.execute(query, params)
             contracts = [dict(row) for row in cursor.fetchall()]
             
-            for contract in contracts:
-                if contract['end_date']:
-                    end_date = datetime.strptime(str(contract['end_date']), '%Y-%m-%d')
-                    contract['days_remaining'] = (end_date - datetime.now()).days
-                    contract['is_expiring'] = contract['days_remaining'] <= 30
-            
             return contracts
     
+    def get_expiring_contracts(self, days: int = EXPIRING_THRESHOLD_DAYS, limit: int = 500) -> List[Dict[str, Any]]:
+        """العقود النشطة التي تنتهي خلال عدد أيام محدد (استعلام على الفهرس)"""
+        with self._get_connection() as conn:
+            return [dict(row) for row in expiring_contracts(conn, days, limit, cursor_factory=DictCursor)]
+    
     def get_contract_by_id(self, contract_id: int) -> Optional[Dict[str, Any]]:
         """الحصول على تفاصيل عقد محدد"""
         with self._get_connection() as conn:
-            cursor = conn.cursor(cursor_factory=DictCursor)
-            
-            cursor.execute("SELECT * FROM contracts WHERE id = %s", (contract_id,))
-            contract = cursor.fetchone()
-            
-            if not contract:
-                return None
-            
-            contract_dict = dict(contract)
-            
-            if contract_dict['end_date']:
-                end_date = datetime.strptime(str(contract_dict['end_date']), '%Y-%m-%d')
-                contract_dict['days_remaining'] = (end_date - datetime.now()).days
-                contract_dict['is_expiring'] = contract_dict['days_remaining'] <= 30
-            
-            cursor.execute("""
-                SELECT * FROM contract_payments 
-                WHERE contract_id = %s 
-                ORDER BY due_date DESC
-            """, (contract_id,))
-            contract_dict['payments'] = [dict(row) for row in cursor.fetchall()]
-            
-            cursor.execute("""
-                SELECT * FROM contract_reminders 
-                WHERE contract_id = %s 
-                ORDER BY reminder_date DESC
-            """, (contract_id,))
-            contract_dict['reminders'] = [dict(row) for row in cursor.fetchall()]
-            
-            cursor.execute("""
-                SELECT * FROM contract_renewals 
-                WHERE contract_id = %s 
-                ORDER BY renewal_date DESC
-            """, (contract_id,))
-            contract_dict['renewals'] = [dict(row) for row in cursor.fetchall()]
-            
-            return contract_dict
+            # العقد ومدفوعاته وتذكيراته وتجديداته في استعلام واحد
+            detail = load_contract_detail(conn, contract_id)
+            return detail.to_dict() if detail else None
     
     def update_contract_status(self, contract_id: int, new_status: str, notes: str = "") -> Tuple[bool, str]:
         """تحديث حالة العقد"""
@@ -440,17 +387,32 @@ class ContractsManager:
         except psycopg2.Error as e:
             logger.error(f"خطأ في تحديث حالة العقد: {str(e)}")
             return False, f"خطأ في التحديث: {str(e)}"
-    
+
+    def regenerate_payment_schedules(self, contract_ids: Optional[List[int]] = None,
+                                     frequency: Optional[str] = None,
+                                     payment_day: Optional[int] = None) -> Tuple[bool, str, Dict[str, int]]:
+        """إعادة توليد جداول الدفعات المعلقة للعقود القائمة دفعة واحدة"""
+        try:
+            with self._get_connection() as conn:
+                result = regenerate_payment_schedules(conn, contract_ids, frequency, payment_day)
+
+            return True, f"تم إعادة توليد جداول {result['contracts']} عقد", result
+
+        except psycopg2.Error as e:
+            logger.error(f"خطأ في إعادة توليد جداول الدفعات: {str(e)}")
+            return False, f"خطأ في إعادة التوليد: {str(e)}", {}
+
     def get_dashboard_stats(self) -> Dict[str, Any]:
         """إحصائيات شاملة للوحة التحكم"""
-        stats = {}
-        
         with self._get_connection() as conn:
-            cursor = conn.cursor()
-            
-            cursor.execute("SELECT COUNT(*) FROM contracts")
-            stats['total_contracts'] = cursor.fetchone()[0]
-            
-            conn.commit()
+            stats = load_dashboard_stats(conn)
             
-            return stats
\ No newline at end of file
+        return {
+            'total_contracts': stats['contracts_count'],
+            'active_contracts': stats['contracts_active'],
+            'expired_contracts': stats['contracts_expired'],
+            'expiring_soon': stats['contracts_expiring_30'],
+            'occupancy_rate': stats['occupancy_rate'],
+            'total_received': stats['total_received'],
+            'total_pending': stats['total_pending'],
+        }
\ No newline at end of file
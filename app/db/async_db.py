@@ -0,0 +1,110 @@
+"""
+طبقة وصول غير حاجبة لقاعدة البيانات للمسارات غير المتزامنة
+=========================================================
+psycopg2 مكتبة حاجبة، واستدعاؤها مباشرة من داخل async def يوقف حلقة
+الأحداث بالكامل (بما في ذلك /webhook). هنا تُنفذ الاستعلامات على منفذ
+خيوط مخصص بحجم مجمع الاتصالات، مع سيمافور يحد عدد العمليات المتزامنة
+حتى لا تنتظر الخيوط على المجمع بلا داعٍ.
+
+الاستخدام:
+    rows = await fetch_all("SELECT ... WHERE id = %s", (1,))
+    result = await run_db(_load_page, page_size)   # _load_page(conn, page_size)
+"""
+
+import asyncio
+import contextvars
+import os
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, List, Optional, Sequence
+
+from app.db.database import db_connection
+
+_MAX_CONCURRENCY = int(os.getenv('DB_ASYNC_CONCURRENCY', os.getenv('DB_POOL_MAX', '10')))
+
+_executor = ThreadPoolExecutor(max_workers=_MAX_CONCURRENCY, thread_name_prefix="db")
+_semaphores = weakref.WeakKeyDictionary()
+
+
+def _semaphore() -> asyncio.Semaphore:
+    """سيمافور لكل حلقة أحداث (مهم عند تشغيل أكثر من حلقة في الاختبارات)"""
+    loop = asyncio.get_running_loop()
+    sem = _semaphores.get(loop)
+    if sem is None:
+        sem = _semaphores[loop] = asyncio.Semaphore(_MAX_CONCURRENCY)
+    return sem
+
+
+async def run_blocking(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """تشغيل دالة حاجبة على منفذ قاعدة البيانات مع حد التزامن"""
+    async with _semaphore():
+        loop = asyncio.get_running_loop()
+        # نسخة من السياق حتى تصل متغيرات الطلب (مؤقت المراحل) إلى خيط المنفذ
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(_executor, partial(context.run, fn, *args, **kwargs))
+
+
+def _with_connection(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    with db_connection() as conn:
+        return fn(conn, *args, **kwargs)
+
+
+async def run_db(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """تشغيل fn(conn, *args) باتصال من المجمع دون حجب حلقة الأحداث"""
+    return await run_blocking(_with_connection, fn, *args, **kwargs)
+
+
+def _fetch_all(conn, query: str, params: Optional[Sequence], cursor_factory) -> List[Any]:
+    cursor = conn.cursor(cursor_factory=cursor_factory) if cursor_factory else conn.cursor()
+    try:
+        cursor.execute(query, params)
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+
+
+def _fetch_one(conn, query: str, params: Optional[Sequence], cursor_factory) -> Any:
+    cursor = conn.cursor(cursor_factory=cursor_factory) if cursor_factory else conn.cursor()
+    try:
+        cursor.execute(query, params)
+        return cursor.fetchone()
+    finally:
+        cursor.close()
+
+
+def _execute(conn, query: str, params: Optional[Sequence], returning: bool) -> Any:
+    cursor = conn.cursor()
+    try:
+        cursor.execute(query, params)
+        result = cursor.fetchone() if returning else cursor.rowcount
+        conn.commit()
+        return result
+    finally:
+        cursor.close()
+
+
+async def fetch_all(query: str, params: Optional[Sequence] = None, cursor_factory=None) -> List[Any]:
+    """تنفيذ استعلام وإرجاع جميع الصفوف"""
+    return await run_db(_fetch_all, query, params, cursor_factory)
+
+
+async def fetch_one(query: str, params: Optional[Sequence] = None, cursor_factory=None) -> Any:
+    """تنفيذ استعلام وإرجاع صف واحد (أو None)"""
+    return await run_db(_fetch_one, query, params, cursor_factory)
+
+
+async def fetch_val(query: str, params: Optional[Sequence] = None) -> Any:
+    """تنفيذ استعلام وإرجاع أول عمود من أول صف"""
+    row = await fetch_one(query, params)
+    return row[0] if row else None
+
+
+async def execute(query: str, params: Optional[Sequence] = None, returning: bool = False) -> Any:
+    """تنفيذ أمر كتابة مع commit - يعيد عدد الصفوف أو صف RETURNING"""
+    return await run_db(_execute, query, params, returning)
+
+
+def shutdown():
+    """إيقاف منفذ الخيوط عند إغلاق التطبيق"""
+    _executor.shutdown(wait=False)
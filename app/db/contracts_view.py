@@ -0,0 +1,31 @@
+"""
+نموذج القراءة للعقود: contracts_view
+====================================
+days_remaining و is_expiring مشتقة في SQL من end_date و CURRENT_DATE عند كل
+قراءة، فلا تتقادم كما كانت الأعمدة المخزنة ولا تحتاج حلقة strptime في Python.
+
+استعلام "تنتهي خلال N يوم" يفلتر على end_date مباشرة (وليس على days_remaining)
+حتى يستخدم الفهرس الجزئي idx_contracts_active_end_date.
+العرض نفسه يُنشأ في supabase/migrations/20251025000000_contracts_view.sql.
+"""
+
+# نفس الحد في تعريف is_expiring داخل العرض
+EXPIRING_THRESHOLD_DAYS = 30
+
+EXPIRING_CONTRACTS_SQL = '''
+    SELECT * FROM contracts_view
+    WHERE status = 'active'
+      AND end_date >= CURRENT_DATE
+      AND end_date <= CURRENT_DATE + %s
+    ORDER BY end_date, id
+    LIMIT %s
+'''
+
+
+def expiring_contracts(conn, days=EXPIRING_THRESHOLD_DAYS, limit=500, cursor_factory=None):
+    """العقود النشطة التي تنتهي خلال days يوم، الأقرب أولاً"""
+    cursor = conn.cursor(cursor_factory=cursor_factory) if cursor_factory else conn.cursor()
+    cursor.execute(EXPIRING_CONTRACTS_SQL, (days, limit))
+    rows = cursor.fetchall()
+    cursor.close()
+    return rows
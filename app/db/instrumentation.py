@@ -0,0 +1,100 @@
+"""
+قياس استعلامات psycopg2 على مستوى المؤشر
+=========================================
+create_connection ينشئ الاتصالات بـ InstrumentedConnection، فكل مؤشر منه
+(الافتراضي أو DictCursor / RealDictCursor أو المؤشر المسمّى على الخادم)
+يُغلّف بصنف فرعي يقيس execute/executemany ويبلغ المراقبين المسجلين:
+
+    observer(query, duration_seconds, error, rows)
+
+rows هو cursor.rowcount بعد التنفيذ (None عند الخطأ أو إن لم يكن معروفاً).
+المراقبون يُستدعون في نفس الخيط بعد كل استعلام، فيجب أن يكونوا خفيفين.
+"""
+
+import time
+from typing import Callable, Dict, List
+
+from psycopg2 import extensions
+
+QueryObserver = Callable[[str, float, "Exception | None", "int | None"], None]
+
+_observers: List[QueryObserver] = []
+
+
+def add_query_observer(observer: QueryObserver):
+    if observer not in _observers:
+        _observers.append(observer)
+
+
+def remove_query_observer(observer: QueryObserver):
+    if observer in _observers:
+        _observers.remove(observer)
+
+
+def query_text(query) -> str:
+    if isinstance(query, str):
+        return query
+    if isinstance(query, bytes):
+        return query.decode("utf-8", "replace")
+    # psycopg2.sql.Composed وما شابه
+    return str(query)
+
+
+def _notify(query, duration, error, rows):
+    for observer in _observers:
+        try:
+            observer(query, duration, error, rows)
+        except Exception:
+            pass
+
+
+class _TimedCursorMixin:
+    def _rows(self, error):
+        if error is not None or self.rowcount < 0:
+            return None
+        return self.rowcount
+
+    def execute(self, query, vars=None):
+        started = time.perf_counter()
+        error = None
+        try:
+            return super().execute(query, vars)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            if _observers:
+                _notify(query, time.perf_counter() - started, error, self._rows(error))
+
+    def executemany(self, query, vars_list):
+        started = time.perf_counter()
+        error = None
+        try:
+            return super().executemany(query, vars_list)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            if _observers:
+                _notify(query, time.perf_counter() - started, error, self._rows(error))
+
+
+_timed_factories: Dict[type, type] = {}
+
+
+def timed_cursor_factory(factory: type) -> type:
+    """صنف مؤشر فرعي يقيس الاستعلامات (يُنشأ مرة واحدة لكل صنف)"""
+    timed = _timed_factories.get(factory)
+    if timed is None:
+        timed = type(f"Timed{factory.__name__}", (_TimedCursorMixin, factory), {})
+        timed = _timed_factories.setdefault(factory, timed)
+    return timed
+
+
+class InstrumentedConnection(extensions.connection):
+    """اتصال psycopg2 يقيس كل مؤشر يُنشأ منه"""
+
+    def cursor(self, *args, **kwargs):
+        factory = kwargs.get("cursor_factory") or self.cursor_factory or extensions.cursor
+        kwargs["cursor_factory"] = timed_cursor_factory(factory)
+        return super().cursor(*args, **kwargs)
@@ -0,0 +1,191 @@
+"""
+محمّلات صفحات التفاصيل: الكيان مع أبنائه في رحلة واحدة إلى قاعدة البيانات
+======================================================================
+بدلاً من استعلام للكيان ثم استعلام لكل قائمة تابعة (عقود، مدفوعات، تذكيرات...)
+يبني استعلام واحد الكيان كـ JSONB والقوائم التابعة كـ jsonb_agg في استعلامات
+فرعية مرتبطة، فيعود صف واحد بكل شيء.
+
+- الأرقام العشرية تُقرأ Decimal (وليس float) والتواريخ تعود date/datetime
+- النتيجة dataclass صغيرة؛ to_dict() يعيد الشكل القديم عند الحاجة
+"""
+
+import json
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from decimal import Decimal
+from functools import partial
+from typing import Any, Dict, List, Optional
+
+from psycopg2.extras import register_default_json, register_default_jsonb
+
+_loads = partial(json.loads, parse_float=Decimal)
+
+
+def _revive_value(key, value):
+    if not isinstance(value, str) or not (key.endswith("_date") or key.endswith("_at") or key == "date"):
+        return value
+    try:
+        if len(value) == 10:
+            return date.fromisoformat(value)
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return value
+
+
+def _revive(row):
+    """إرجاع أنواع التواريخ لصف قادم من JSON"""
+    if row is None:
+        return None
+    return {key: _revive_value(key, value) for key, value in row.items()}
+
+
+def _revive_all(rows):
+    return [_revive(row) for row in rows or []]
+
+
+def _fetch_row(conn, sql, params):
+    cursor = conn.cursor()
+    try:
+        # Decimal للأرقام داخل JSON على هذا المؤشر فقط
+        register_default_json(cursor, loads=_loads)
+        register_default_jsonb(cursor, loads=_loads)
+        cursor.execute(sql, params)
+        return cursor.fetchone()
+    finally:
+        cursor.close()
+
+
+# ---------- المستأجر ----------
+
+@dataclass
+class TenantDetail:
+    id: int
+    tenant: Dict[str, Any]
+    contracts: List[Dict[str, Any]] = field(default_factory=list)
+    payments: List[Dict[str, Any]] = field(default_factory=list)
+
+    def to_dict(self):
+        return {**self.tenant, "contracts": self.contracts, "payments": self.payments}
+
+
+TENANT_DETAIL_SQL = '''
+    SELECT to_jsonb(t) - 'search_doc',
+           COALESCE((
+               SELECT jsonb_agg(
+                          to_jsonb(c) - 'search_doc' || jsonb_build_object('property_name', p.name)
+                          ORDER BY c.start_date DESC
+                      )
+               FROM contracts c
+               LEFT JOIN properties p ON p.id = c.property_id
+               WHERE c.tenant_id = t.id
+           ), '[]'::jsonb),
+           COALESCE((
+               SELECT jsonb_agg(to_jsonb(x) ORDER BY x.payment_date DESC)
+               FROM (
+                   SELECT * FROM payments
+                   WHERE tenant_id = t.id
+                   ORDER BY payment_date DESC
+                   LIMIT %s
+               ) x
+           ), '[]'::jsonb)
+    FROM tenants t
+    WHERE t.id = %s
+'''
+
+
+def load_tenant_detail(conn, tenant_id, payments_limit=10) -> Optional[TenantDetail]:
+    """المستأجر مع عقوده وآخر مدفوعاته"""
+    row = _fetch_row(conn, TENANT_DETAIL_SQL, (payments_limit, tenant_id))
+    if not row:
+        return None
+    tenant, contracts, payments = row
+    return TenantDetail(id=tenant["id"], tenant=_revive(tenant),
+                        contracts=_revive_all(contracts), payments=_revive_all(payments))
+
+
+# ---------- العقار ----------
+
+@dataclass
+class PropertyDetail:
+    id: int
+    property: Dict[str, Any]
+    contracts: List[Dict[str, Any]] = field(default_factory=list)
+
+    def to_dict(self):
+        return {**self.property, "contracts": self.contracts}
+
+
+PROPERTY_DETAIL_SQL = '''
+    SELECT to_jsonb(p) || jsonb_build_object('client_name', cl.name, 'client_phone', cl.phone),
+           COALESCE((
+               SELECT jsonb_agg(
+                          to_jsonb(c) - 'search_doc' || jsonb_build_object('tenant_name', t.name)
+                          ORDER BY c.start_date DESC
+                      )
+               FROM contracts c
+               LEFT JOIN tenants t ON t.id = c.tenant_id
+               WHERE c.property_id = p.id
+           ), '[]'::jsonb)
+    FROM properties p
+    LEFT JOIN clients cl ON cl.id = p.client_id
+    WHERE p.id = %s
+'''
+
+
+def load_property_detail(conn, property_id) -> Optional[PropertyDetail]:
+    """العقار مع المالك (العميل) وعقوده"""
+    row = _fetch_row(conn, PROPERTY_DETAIL_SQL, (property_id,))
+    if not row:
+        return None
+    property_data, contracts = row
+    return PropertyDetail(id=property_data["id"], property=_revive(property_data),
+                          contracts=_revive_all(contracts))
+
+
+# ---------- العقد (جداول ContractsManager) ----------
+
+@dataclass
+class ContractDetail:
+    id: int
+    contract: Dict[str, Any]
+    payments: List[Dict[str, Any]] = field(default_factory=list)
+    reminders: List[Dict[str, Any]] = field(default_factory=list)
+    renewals: List[Dict[str, Any]] = field(default_factory=list)
+
+    def to_dict(self):
+        return {
+            **self.contract,
+            "payments": self.payments,
+            "reminders": self.reminders,
+            "renewals": self.renewals,
+        }
+
+
+CONTRACT_DETAIL_SQL = '''
+    SELECT to_jsonb(c) - 'search_doc',
+           COALESCE((
+               SELECT jsonb_agg(to_jsonb(x) ORDER BY x.due_date DESC)
+               FROM contract_payments x WHERE x.contract_id = c.id
+           ), '[]'::jsonb),
+           COALESCE((
+               SELECT jsonb_agg(to_jsonb(x) ORDER BY x.reminder_date DESC)
+               FROM contract_reminders x WHERE x.contract_id = c.id
+           ), '[]'::jsonb),
+           COALESCE((
+               SELECT jsonb_agg(to_jsonb(x) ORDER BY x.renewal_date DESC)
+               FROM contract_renewals x WHERE x.contract_id = c.id
+           ), '[]'::jsonb)
+    FROM contracts_view c
+    WHERE c.id = %s
+'''
+
+
+def load_contract_detail(conn, contract_id) -> Optional[ContractDetail]:
+    """العقد (مع days_remaining من contracts_view) ومدفوعاته وتذكيراته وتجديداته"""
+    row = _fetch_row(conn, CONTRACT_DETAIL_SQL, (contract_id,))
+    if not row:
+        return None
+    contract, payments, reminders, renewals = row
+    return ContractDetail(id=contract["id"], contract=_revive(contract),
+                          payments=_revive_all(payments), reminders=_revive_all(reminders),
+                          renewals=_revive_all(renewals))
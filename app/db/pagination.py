@@ -0,0 +1,161 @@
+"""
+ترقيم الصفحات بالمؤشر (Keyset Pagination) لصفحات قوائم الداشبورد
+================================================================
+بدلاً من OFFSET الذي يمسح كل الصفوف السابقة، نتذكر مفتاح الترتيب لآخر
+صف في الصفحة ونطلب ما بعده مباشرة:
+
+    WHERE (c.start_date, c.id) < (%s, %s)
+    ORDER BY c.start_date DESC, c.id DESC
+    LIMIT page_size + 1
+
+يعمل هذا على فهرس (start_date DESC, id DESC) بزمن ثابت مهما كان عمق
+الصفحة. المؤشر نص base64 يحمل قيم مفتاح الترتيب لآخر صف.
+"""
+
+import base64
+import json
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class InvalidCursor(ValueError):
+    """مؤشر الصفحة غير صالح أو تم التلاعب به"""
+
+
+def clamp_page_size(page_size: Optional[int]) -> int:
+    """حصر حجم الصفحة بين 1 و MAX_PAGE_SIZE"""
+    if not page_size:
+        return DEFAULT_PAGE_SIZE
+    return max(1, min(int(page_size), MAX_PAGE_SIZE))
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    if isinstance(value, date):
+        return {"d": value.isoformat()}
+    if isinstance(value, Decimal):
+        return {"n": str(value)}
+    return value
+
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict):
+        if "dt" in value:
+            return datetime.fromisoformat(value["dt"])
+        if "d" in value:
+            return date.fromisoformat(value["d"])
+        if "n" in value:
+            return Decimal(value["n"])
+    return value
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """تحويل قيم مفتاح الترتيب إلى مؤشر نصي آمن للروابط"""
+    payload = json.dumps([_encode_value(v) for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str], size: int) -> Optional[List[Any]]:
+    """استرجاع قيم مفتاح الترتيب من المؤشر"""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+    except (ValueError, UnicodeDecodeError) as e:
+        raise InvalidCursor(str(e))
+    if not isinstance(values, list) or len(values) != size:
+        raise InvalidCursor("عدد قيم المؤشر لا يطابق مفتاح الترتيب")
+    return [_decode_value(v) for v in values]
+
+
+@dataclass
+class Page:
+    """صفحة نتائج مع مؤشر الصفحة التالية"""
+    items: List[Any]
+    page_size: int
+    next_cursor: Optional[str] = None
+    filters: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def has_more(self) -> bool:
+        return self.next_cursor is not None
+
+    def next_url(self, request) -> Optional[str]:
+        """رابط الصفحة التالية مع الإبقاء على الفلاتر الحالية"""
+        if not self.next_cursor:
+            return None
+        return str(request.url.include_query_params(cursor=self.next_cursor, page_size=self.page_size))
+
+    def first_url(self, request) -> str:
+        return str(request.url.remove_query_params("cursor"))
+
+
+class KeysetQuery:
+    """
+    بناء استعلام صفحة واحدة.
+
+    sort_keys: أعمدة الترتيب (تنازلياً) وآخرها يجب أن يكون فريداً مثل id.
+    يجب أن يتضمن SELECT هذه الأعمدة في نهايته بنفس الترتيب حتى نقرأ
+    مفتاح آخر صف دون تغيير مواضع الأعمدة التي تعتمد عليها القوالب.
+    """
+
+    def __init__(self, select_sql: str, sort_keys: Sequence[str]):
+        self.select_sql = select_sql
+        self.sort_keys = list(sort_keys)
+        self._conditions: List[str] = []
+        self._params: List[Any] = []
+        self.filters: Dict[str, Any] = {}
+
+    def where(self, condition: str, *params: Any, name: Optional[str] = None, value: Any = None) -> "KeysetQuery":
+        """إضافة شرط فلترة من جهة الخادم"""
+        self._conditions.append(condition)
+        self._params.extend(params)
+        if name:
+            self.filters[name] = value
+        return self
+
+    def build(self, cursor: Optional[str], page_size: int) -> Tuple[str, List[Any]]:
+        conditions = list(self._conditions)
+        params = list(self._params)
+
+        after = decode_cursor(cursor, len(self.sort_keys))
+        if after is not None:
+            keys = ", ".join(self.sort_keys)
+            marks = ", ".join(["%s"] * len(after))
+            conditions.append(f"({keys}) < ({marks})")
+            params.extend(after)
+
+        sql = self.select_sql
+        if conditions:
+            sql += "\nWHERE " + "\n  AND ".join(conditions)
+        sql += "\nORDER BY " + ", ".join(f"{k} DESC" for k in self.sort_keys)
+        sql += "\nLIMIT %s"
+        params.append(page_size + 1)
+        return sql, params
+
+    def fetch(self, conn, cursor: Optional[str] = None, page_size: Optional[int] = None) -> Page:
+        """تنفيذ الاستعلام وإرجاع صفحة (تستدعى داخل run_db)"""
+        page_size = clamp_page_size(page_size)
+        sql, params = self.build(cursor, page_size)
+        cur = conn.cursor()
+        try:
+            cur.execute(sql, params)
+            rows = cur.fetchall()
+        finally:
+            cur.close()
+        return self.to_page(rows, page_size)
+
+    def to_page(self, rows: List[Any], page_size: int) -> Page:
+        next_cursor = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            last = rows[-1]
+            next_cursor = encode_cursor(last[-len(self.sort_keys):])
+        return Page(items=rows, page_size=page_size, next_cursor=next_cursor, filters=dict(self.filters))
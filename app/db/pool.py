@@ -0,0 +1,294 @@
+"""
+مجمع اتصالات قاعدة البيانات المشترك على مستوى العملية
+=====================================================
+بدلاً من فتح اتصال TLS جديد مع Transaction Pooler في كل طلب، يحتفظ هذا
+المجمع بعدد محدود من الاتصالات الجاهزة ويعيد استخدامها:
+
+- حد أدنى وأقصى لعدد الاتصالات (min_size / max_size)
+- فحص صحة الاتصال عند السحب إذا بقي خاملاً أكثر من health_check_interval
+- إعادة تدوير الاتصالات الخاملة (max_idle) والقديمة (max_lifetime)
+- واجهة مدير سياق: with pool.connection() as conn
+- إحصائيات: المستخدم، المنتظر، زمن السحب
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, Optional
+
+from psycopg2 import extensions
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeout(Exception):
+    """انتهت مهلة انتظار اتصال متاح من المجمع"""
+
+
+class _PooledConnection:
+    """اتصال داخل المجمع مع أوقات الإنشاء وآخر استخدام"""
+
+    __slots__ = ("conn", "created_at", "last_used")
+
+    def __init__(self, conn):
+        now = time.monotonic()
+        self.conn = conn
+        self.created_at = now
+        self.last_used = now
+
+
+class ConnectionPool:
+    """مجمع اتصالات psycopg2 آمن للاستخدام من عدة خيوط"""
+
+    def __init__(
+        self,
+        connect: Callable[[], Any],
+        min_size: int = 1,
+        max_size: int = 10,
+        max_idle: float = 300.0,
+        max_lifetime: float = 3600.0,
+        checkout_timeout: float = 10.0,
+        health_check_interval: float = 30.0,
+    ):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError("قيم min_size/max_size غير صالحة")
+
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
+        self.checkout_timeout = checkout_timeout
+        self.health_check_interval = health_check_interval
+
+        self._cond = threading.Condition()
+        self._idle: Deque[_PooledConnection] = deque()
+        self._in_use: Dict[int, _PooledConnection] = {}
+        self._total = 0
+        self._waiting = 0
+        self._closed = False
+
+        self._checkouts = 0
+        self._timeouts = 0
+        self._created = 0
+        self._discarded = 0
+        self._checkout_time_total = 0.0
+        self._checkout_time_max = 0.0
+
+    # ------------------------------------------------------------------
+    # دورة حياة الاتصالات
+    # ------------------------------------------------------------------
+    def open(self):
+        """تهيئة الحد الأدنى من الاتصالات مسبقاً"""
+        for _ in range(self.min_size):
+            with self._cond:
+                if self._total >= self.min_size:
+                    break
+                self._total += 1
+            try:
+                item = self._new_connection()
+            except Exception:
+                with self._cond:
+                    self._total -= 1
+                    self._cond.notify()
+                raise
+            with self._cond:
+                self._idle.append(item)
+                self._cond.notify()
+
+    def _new_connection(self) -> _PooledConnection:
+        conn = self._connect()
+        with self._cond:
+            self._created += 1
+        return _PooledConnection(conn)
+
+    def _close_quietly(self, item: _PooledConnection):
+        try:
+            item.conn.close()
+        except Exception:
+            pass
+
+    def _is_expired(self, item: _PooledConnection, now: float) -> bool:
+        if self.max_lifetime and now - item.created_at > self.max_lifetime:
+            return True
+        return False
+
+    def _is_healthy(self, item: _PooledConnection, now: float) -> bool:
+        """فحص الاتصال قبل تسليمه إذا طال خموله"""
+        conn = item.conn
+        if conn.closed:
+            return False
+        if now - item.last_used < self.health_check_interval:
+            return True
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+            cursor.close()
+            conn.rollback()
+            return True
+        except Exception as e:
+            logger.warning(f"⚠️ اتصال غير صالح في المجمع سيتم استبداله: {e}")
+            return False
+
+    def getconn(self, timeout: Optional[float] = None):
+        """سحب اتصال من المجمع (أو إنشاء اتصال جديد ضمن الحد الأقصى)"""
+        timeout = self.checkout_timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+
+        while True:
+            item = None
+            create = False
+            with self._cond:
+                if self._closed:
+                    raise PoolTimeout("المجمع مغلق")
+                while True:
+                    if self._idle:
+                        item = self._idle.pop()
+                        break
+                    if self._total < self.max_size:
+                        self._total += 1
+                        create = True
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        raise PoolTimeout(
+                            f"لا يوجد اتصال متاح خلال {timeout} ثانية "
+                            f"(المستخدم: {len(self._in_use)}/{self.max_size})"
+                        )
+                    self._waiting += 1
+                    try:
+                        self._cond.wait(remaining)
+                    finally:
+                        self._waiting -= 1
+
+            now = time.monotonic()
+            if create:
+                try:
+                    item = self._new_connection()
+                except Exception:
+                    with self._cond:
+                        self._total -= 1
+                        self._cond.notify()
+                    raise
+            elif self._is_expired(item, now) or not self._is_healthy(item, now):
+                self._discard(item)
+                continue
+
+            elapsed = time.monotonic() - started
+            with self._cond:
+                self._in_use[id(item.conn)] = item
+                self._checkouts += 1
+                self._checkout_time_total += elapsed
+                if elapsed > self._checkout_time_max:
+                    self._checkout_time_max = elapsed
+            return item.conn
+
+    def putconn(self, conn, discard: bool = False):
+        """إرجاع اتصال إلى المجمع"""
+        with self._cond:
+            item = self._in_use.pop(id(conn), None)
+        if item is None:
+            # اتصال لا يتبع هذا المجمع
+            try:
+                conn.close()
+            except Exception:
+                pass
+            return
+
+        if not discard and not conn.closed:
+            try:
+                status = conn.get_transaction_status()
+                if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+                    discard = True
+                elif status != extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except Exception:
+                discard = True
+
+        now = time.monotonic()
+        if discard or conn.closed or self._closed or self._is_expired(item, now):
+            self._discard(item)
+            return
+
+        item.last_used = now
+        with self._cond:
+            self._idle.append(item)
+            self._cond.notify()
+        self.recycle_idle()
+
+    def _discard(self, item: _PooledConnection):
+        self._close_quietly(item)
+        with self._cond:
+            self._total -= 1
+            self._discarded += 1
+            self._cond.notify()
+
+    def recycle_idle(self):
+        """إغلاق الاتصالات الخاملة لفترة طويلة مع الإبقاء على min_size"""
+        if not self.max_idle:
+            return
+        now = time.monotonic()
+        expired = []
+        with self._cond:
+            # الأقدم استخداماً في بداية الطابور
+            while (
+                self._idle
+                and self._total - len(expired) > self.min_size
+                and now - self._idle[0].last_used > self.max_idle
+            ):
+                expired.append(self._idle.popleft())
+        for item in expired:
+            self._discard(item)
+
+    @contextmanager
+    def connection(self, timeout: Optional[float] = None):
+        """مدير سياق يعيد الاتصال تلقائياً ويتراجع عن المعاملة عند الخطأ"""
+        conn = self.getconn(timeout)
+        broken = False
+        try:
+            yield conn
+        except BaseException:
+            try:
+                if not conn.closed:
+                    conn.rollback()
+            except Exception:
+                broken = True
+            raise
+        finally:
+            self.putconn(conn, discard=broken or bool(conn.closed))
+
+    def close(self):
+        """إغلاق جميع الاتصالات الخاملة ومنع السحب الجديد"""
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._cond.notify_all()
+        for item in idle:
+            self._discard(item)
+
+    # ------------------------------------------------------------------
+    # الإحصائيات
+    # ------------------------------------------------------------------
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            checkouts = self._checkouts
+            return {
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "total": self._total,
+                "in_use": len(self._in_use),
+                "idle": len(self._idle),
+                "waiting": self._waiting,
+                "checkouts": checkouts,
+                "timeouts": self._timeouts,
+                "connections_created": self._created,
+                "connections_discarded": self._discarded,
+                "checkout_avg_ms": round(self._checkout_time_total / checkouts * 1000, 3) if checkouts else 0.0,
+                "checkout_max_ms": round(self._checkout_time_max * 1000, 3),
+            }
@@ -0,0 +1,207 @@
+"""
+إحصائيات الاستعلامات حسب البصمة وكشف N+1
+==========================================
+كل استعلام يمر عبر مؤشرات InstrumentedConnection (app.db.instrumentation)
+فيُجمع هنا حسب بصمته (app.utils.sql_fingerprint):
+عدد مرات التنفيذ، الأخطاء، الزمن الكلي والأقصى، المئينات p50/p95/p99
+(من آخر LATENCY_SAMPLES قياس)، وعدد الصفوف.
+
+- الاستعلام الأبطأ من SLOW_QUERY_MS يُسجل تحذيراً ويُعد في slow
+- في نهاية كل طلب HTTP (RequestTimingMiddleware) تُفحص استعلاماته: البصمة
+  التي تتكرر N_PLUS_ONE_THRESHOLD مرة أو أكثر في نفس الطلب تُعلَّم N+1
+  (استعلام داخل حلقة بدلاً من استعلام واحد للمجموعة)
+- عدد الاستعلامات لكل مسار (المتوسط والأقصى لكل طلب)
+
+التقرير: GET /health/queries ، والتصفير: POST /health/queries/reset (بمصادقة لوحة التحكم)
+"""
+
+import logging
+import os
+import threading
+from collections import deque
+from typing import Callable, Dict, List
+
+from app.db.instrumentation import add_query_observer, query_text
+from app.utils.sql_fingerprint import fingerprint, fingerprint_id
+
+logger = logging.getLogger(__name__)
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "5"))
+LATENCY_SAMPLES = 512
+# حد عدد البصمات المتتبعة حتى لا تنمو الذاكرة مع استعلامات مولّدة ديناميكياً
+MAX_FINGERPRINTS = int(os.getenv("QUERY_STATS_MAX_FINGERPRINTS", "2000"))
+
+REPORT_SORTS = ("total", "calls", "mean", "p95", "max", "rows", "errors", "n_plus_one")
+
+RequestListener = Callable[[str, str, int, List[dict]], None]
+
+
+def _percentile(ordered, fraction):
+    if not ordered:
+        return 0.0
+    index = min(int(round(fraction * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+class FingerprintStats:
+    __slots__ = ("sql", "calls", "errors", "slow", "total", "max", "rows", "samples",
+                 "n_plus_one", "n_plus_one_routes")
+
+    def __init__(self, sql):
+        self.sql = sql
+        self.calls = 0
+        self.errors = 0
+        self.slow = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.rows = 0
+        self.samples = deque(maxlen=LATENCY_SAMPLES)
+        self.n_plus_one = 0
+        self.n_plus_one_routes = set()
+
+    def to_dict(self) -> dict:
+        ordered = sorted(self.samples)
+        return {
+            "id": fingerprint_id(self.sql),
+            "sql": self.sql,
+            "calls": self.calls,
+            "errors": self.errors,
+            "slow": self.slow,
+            "total_ms": round(self.total * 1000, 3),
+            "mean_ms": round(self.total / self.calls * 1000, 3) if self.calls else 0.0,
+            "p50_ms": round(_percentile(ordered, 0.50) * 1000, 3),
+            "p95_ms": round(_percentile(ordered, 0.95) * 1000, 3),
+            "p99_ms": round(_percentile(ordered, 0.99) * 1000, 3),
+            "max_ms": round(self.max * 1000, 3),
+            "rows": self.rows,
+            "rows_per_call": round(self.rows / self.calls, 2) if self.calls else 0.0,
+            "n_plus_one": self.n_plus_one,
+            "n_plus_one_routes": sorted(self.n_plus_one_routes),
+        }
+
+
+class QueryStats:
+    """سجل إحصائيات الاستعلامات للعملية (آمن للاستخدام من عدة خيوط)"""
+
+    def __init__(self, slow_ms=SLOW_QUERY_MS, n_plus_one_threshold=N_PLUS_ONE_THRESHOLD):
+        self.slow_ms = slow_ms
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self._lock = threading.Lock()
+        self._queries: Dict[str, FingerprintStats] = {}
+        # "METHOD route" -> [الطلبات، الاستعلامات، أقصى عدد في طلب واحد]
+        self._routes: Dict[str, list] = {}
+        self._listeners: List[RequestListener] = []
+
+    # ---------- التسجيل ----------
+
+    def observe(self, query, duration, error, rows):
+        sql = fingerprint(query_text(query))
+        with self._lock:
+            stats = self._queries.get(sql)
+            if stats is None:
+                if len(self._queries) >= MAX_FINGERPRINTS:
+                    sql = "<other>"
+                    stats = self._queries.get(sql)
+                if stats is None:
+                    stats = self._queries[sql] = FingerprintStats(sql)
+            stats.calls += 1
+            stats.total += duration
+            stats.samples.append(duration)
+            if duration > stats.max:
+                stats.max = duration
+            if error is not None:
+                stats.errors += 1
+            if rows:
+                stats.rows += rows
+            slow = duration * 1000 >= self.slow_ms
+            if slow:
+                stats.slow += 1
+        if slow:
+            logger.warning(f"🐢 استعلام بطيء ({duration * 1000:.1f}ms): {sql[:300]}")
+
+    def record_request(self, method, route, timer) -> List[dict]:
+        """فحص استعلامات طلب منتهٍ (RequestTimer)؛ يعيد بصمات N+1 فيه"""
+        counts: Dict[str, list] = {}
+        total_queries = 0
+        for query, (count, seconds, _errors, _rows) in list(timer.queries.items()):
+            total_queries += count
+            entry = counts.setdefault(fingerprint(query), [0, 0.0])
+            entry[0] += count
+            entry[1] += seconds
+
+        key = f"{method} {route}"
+        findings = [
+            {"id": fingerprint_id(sql), "sql": sql, "calls": count, "ms": round(seconds * 1000, 3)}
+            for sql, (count, seconds) in counts.items()
+            if count >= self.n_plus_one_threshold
+        ]
+        with self._lock:
+            route_stats = self._routes.get(key)
+            if route_stats is None:
+                route_stats = self._routes[key] = [0, 0, 0]
+            route_stats[0] += 1
+            route_stats[1] += total_queries
+            route_stats[2] = max(route_stats[2], total_queries)
+            for finding in findings:
+                stats = self._queries.get(finding["sql"])
+                if stats is not None:
+                    stats.n_plus_one += 1
+                    stats.n_plus_one_routes.add(key)
+            listeners = list(self._listeners)
+
+        for finding in findings:
+            logger.warning(
+                f"🔁 N+1 في {key}: {finding['calls']} تنفيذ لنفس الاستعلام "
+                f"({finding['ms']}ms): {finding['sql'][:300]}"
+            )
+        for listener in listeners:
+            try:
+                listener(method, route, total_queries, findings)
+            except Exception as e:
+                logger.error(f"❌ خطأ في مستمع إحصائيات الاستعلامات: {e}")
+        return findings
+
+    def add_request_listener(self, listener: RequestListener):
+        with self._lock:
+            self._listeners.append(listener)
+
+    def remove_request_listener(self, listener: RequestListener):
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+    # ---------- التقرير ----------
+
+    def report(self, sort="total", limit=50) -> dict:
+        if sort not in REPORT_SORTS:
+            raise ValueError(f"الترتيب يجب أن يكون واحداً من {', '.join(REPORT_SORTS)}")
+        with self._lock:
+            queries = [stats.to_dict() for stats in self._queries.values()]
+            routes = [
+                {"route": key, "requests": requests, "queries": queries_count,
+                 "queries_per_request": round(queries_count / requests, 2) if requests else 0.0,
+                 "max_queries": max_queries}
+                for key, (requests, queries_count, max_queries) in self._routes.items()
+            ]
+
+        field = {"total": "total_ms", "mean": "mean_ms", "p95": "p95_ms", "max": "max_ms"}.get(sort, sort)
+        queries.sort(key=lambda item: item[field], reverse=True)
+        routes.sort(key=lambda item: item["max_queries"], reverse=True)
+        return {
+            "slow_query_ms": self.slow_ms,
+            "n_plus_one_threshold": self.n_plus_one_threshold,
+            "fingerprints": len(queries),
+            "queries": queries[:limit],
+            "n_plus_one": [item for item in queries if item["n_plus_one"]][:limit],
+            "routes": routes[:limit],
+        }
+
+    def reset(self):
+        with self._lock:
+            self._queries.clear()
+            self._routes.clear()
+
+
+query_stats = QueryStats()
+add_query_observer(query_stats.observe)
@@ -1,7 +1,21 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Depends
+from fastapi.responses import Response
 from fastapi.staticfiles import StaticFiles
-import os, logging, psycopg2
+import os, logging, asyncio
 from dotenv import load_dotenv
+from app.db.database import get_pool, close_pool, pool_stats
+from app.db import async_db
+from app.db.query_stats import query_stats
+from app.services.stats_service import refresh_dashboard_stats
+from app.services.phone_index import warm_phone_indexes, tenant_index, contract_phone_index
+from app.services.whatsapp_api import close_async_whatsapp_client
+from app.services.outbox import start_outbox_workers
+from app.services.reminder_scheduler import schedule_due_reminders
+from app.services.rollups import run_rollup
+from app.services.partitions import run_partition_maintenance
+from app.services.webhook_ingest import ingestor as webhook_ingestor
+from app.utils.metrics import metrics, MetricsMiddleware, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from app.utils.request_timing import RequestTimingMiddleware
 
 # --- استيراد الداشبورد ---
 from app.routes.dashboard import router as dashboard_router
@@ -14,7 +28,7 @@ from app.routes.maintenance_handler import router as maintenance_router
 from app.routes.payment_handler import router as payment_router
 from app.routes.webhook import router as webhook_router
 from app.routes.api_routes import router as api_router
-from app.routes.auth import router as auth_router
+from app.routes.auth import router as auth_router, verify_credentials
 from app.routes.endpoints.send_message import router as send_message_router
 from app.routes.endpoints.contracts import router as contracts_router
 from app.routes.endpoints.payments import router as payments_router
@@ -25,6 +39,11 @@ app = FastAPI(title="Ashal Bot API", version="2.0")
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# زمن كل طلب حسب المسار (يُعرض في /metrics)
+app.add_middleware(MetricsMiddleware)
+# توزيع زمن الطلب على مراحله (Server-Timing) وسجل الطلبات البطيئة
+app.add_middleware(RequestTimingMiddleware)
+
 # Mount static files (إذا كان لديك مجلد باسم 'static' بجانب 'app')
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
@@ -56,14 +75,113 @@ for r in routers:
 def health_check():
     return {"status": "ok", "message": "Ashal Bot FastAPI is running"}
 
+@app.get("/health/db")
+def db_health_check():
+    """إحصائيات مجمع الاتصالات"""
+    return {
+        "status": "ok",
+        "pool": pool_stats(),
+        "phone_index": {"tenants": tenant_index.stats(), "contracts": contract_phone_index.stats()}
+    }
+
+@app.get("/health/queries")
+def query_stats_report(sort: str = "total", limit: int = 50, username: str = Depends(verify_credentials)):
+    """الاستعلامات حسب البصمة (العدد، المئينات، الصفوف، N+1) وعدد الاستعلامات لكل مسار"""
+    try:
+        return {"status": "ok", **query_stats.report(sort=sort, limit=max(1, min(limit, 500)))}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/health/queries/reset")
+def query_stats_reset(username: str = Depends(verify_credentials)):
+    """تصفير إحصائيات الاستعلامات (مثلاً قبل قياس صفحة معينة)"""
+    query_stats.reset()
+    return {"status": "ok"}
+
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    """المقاييس بصيغة Prometheus النصية"""
+    return Response(metrics.expose(), media_type=METRICS_CONTENT_TYPE)
+
+async def _recycle_idle_connections():
+    """إعادة تدوير الاتصالات الخاملة دورياً"""
+    while True:
+        await asyncio.sleep(60)
+        try:
+            get_pool().recycle_idle()
+        except Exception as e:
+            logger.error(f"❌ خطأ في إعادة تدوير الاتصالات: {e}")
+
+async def _reconcile_dashboard_stats():
+    """تصحيح إحصائيات الداشبورد دورياً من الجداول الأساسية"""
+    interval = int(os.getenv("STATS_RECONCILE_INTERVAL", "600"))
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await async_db.run_db(refresh_dashboard_stats)
+        except Exception as e:
+            logger.error(f"❌ خطأ في تصحيح إحصائيات الداشبورد: {e}")
+
+async def _schedule_contract_reminders():
+    """ملء جدول التذكيرات وإضافة المستحق إلى outbox دورياً"""
+    interval = int(os.getenv("REMINDER_SCHEDULE_INTERVAL", "3600"))
+    while True:
+        try:
+            await async_db.run_db(schedule_due_reminders)
+        except Exception as e:
+            logger.error(f"❌ خطأ في جدولة تذكيرات العقود: {e}")
+        await asyncio.sleep(interval)
+
+async def _rollup_analytics_events():
+    """تجميع أحداث analytics_events الجديدة دورياً"""
+    interval = int(os.getenv("ROLLUP_INTERVAL", "300"))
+    while True:
+        try:
+            await async_db.run_db(run_rollup)
+        except Exception as e:
+            logger.error(f"❌ خطأ في تجميع الأحداث: {e}")
+        await asyncio.sleep(interval)
+
+async def _maintain_partitions():
+    """أشهر analytics_events و ai_agent_logs القادمة وحذف المنتهية دورياً"""
+    interval = int(os.getenv("PARTITION_MAINTENANCE_INTERVAL", "86400"))
+    while True:
+        try:
+            await async_db.run_db(run_partition_maintenance)
+        except Exception as e:
+            logger.error(f"❌ خطأ في صيانة الجداول المقسمة: {e}")
+        await asyncio.sleep(interval)
+
 @app.on_event("startup")
-def connect_db_legacy():
+async def open_db_pool():
     try:
-        conn = psycopg2.connect(os.getenv("DATABASE_URL"))
+        await asyncio.get_running_loop().run_in_executor(None, get_pool().open)
         logger.info("✅ اتصال قاعدة البيانات ناجح!")
-        conn.close()
+        await async_db.run_db(warm_phone_indexes)
     except Exception as e:
         logger.error(f"❌ فشل الاتصال بقاعدة البيانات: {e}")
+    app.state.pool_recycler = asyncio.create_task(_recycle_idle_connections())
+    app.state.stats_reconciler = asyncio.create_task(_reconcile_dashboard_stats())
+    app.state.outbox_workers = start_outbox_workers()
+    app.state.reminder_scheduler = asyncio.create_task(_schedule_contract_reminders())
+    app.state.event_rollup = asyncio.create_task(_rollup_analytics_events())
+    app.state.partition_maintainer = asyncio.create_task(_maintain_partitions())
+    webhook_ingestor.start()
+
+@app.on_event("shutdown")
+async def close_db_pool():
+    await webhook_ingestor.stop()
+    app.state.pool_recycler.cancel()
+    app.state.stats_reconciler.cancel()
+    app.state.reminder_scheduler.cancel()
+    app.state.event_rollup.cancel()
+    app.state.partition_maintainer.cancel()
+    for worker in app.state.outbox_workers:
+        worker.cancel()
+    await asyncio.gather(*app.state.outbox_workers, return_exceptions=True)
+    await close_async_whatsapp_client()
+    async_db.shutdown()
+    close_pool()
 
 # Properties routes
 from app.routes.properties import router as properties_router
@@ -84,3 +202,7 @@ app.include_router(contracts_router_new, prefix="/dashboard/contracts", tags=["C
 # Payments Dashboard routes
 from app.routes.payments_dashboard import router as payments_dash_router
 app.include_router(payments_dash_router, prefix="/dashboard/payments", tags=["Payments Dashboard"])
+
+# Reports / exports routes
+from app.routes.reports import router as reports_router
+app.include_router(reports_router, prefix="/dashboard/reports", tags=["Reports"])
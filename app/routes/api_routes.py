@@ -1,5 +1,12 @@
 from fastapi import APIRouter, HTTPException
-from app.db.database import get_connection
+from typing import Optional
+from datetime import datetime
+from app.db.async_db import fetch_all, run_db
+from app.db.loaders import load_property_detail, load_tenant_detail
+from app.db.pagination import DEFAULT_PAGE_SIZE
+from app.services.stats_service import load_dashboard_stats
+from app.services.search import search_tenants
+from app.services.rollups import metric_timeseries
 
 router = APIRouter()
 
@@ -7,40 +14,62 @@ router = APIRouter()
 async def get_properties():
     """الحصول على قائمة العقارات"""
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM properties LIMIT 100")
-        properties = cursor.fetchall()
-        cursor.close()
-        conn.close()
+        properties = await fetch_all("SELECT * FROM properties LIMIT 100")
         return {"status": "success", "data": properties}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/api/properties/{property_id}")
+async def get_property(property_id: int):
+    """تفاصيل عقار مع المالك وعقوده"""
+    try:
+        detail = await run_db(load_property_detail, property_id)
+        if not detail:
+            raise HTTPException(status_code=404, detail="العقار غير موجود")
+        return {"status": "success", "data": detail.to_dict()}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.get("/api/tenants")
 async def get_tenants():
     """الحصول على قائمة المستأجرين"""
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM tenants LIMIT 100")
-        tenants = cursor.fetchall()
-        cursor.close()
-        conn.close()
+        tenants = await fetch_all("SELECT * FROM tenants LIMIT 100")
         return {"status": "success", "data": tenants}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/api/tenants/search")
+async def search_tenants_api(q: str, cursor: Optional[str] = None, page_size: int = DEFAULT_PAGE_SIZE):
+    """بحث المستأجرين بالاسم أو رقم الهاتف"""
+    try:
+        page = await run_db(search_tenants, q, cursor, page_size)
+        return {"status": "success", "data": page.items, "next_cursor": page.next_cursor}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/api/tenants/{tenant_id}")
+async def get_tenant(tenant_id: int):
+    """تفاصيل مستأجر مع عقوده وآخر مدفوعاته"""
+    try:
+        detail = await run_db(load_tenant_detail, tenant_id)
+        if not detail:
+            raise HTTPException(status_code=404, detail="المستأجر غير موجود")
+        return {"status": "success", "data": detail.to_dict()}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.get("/api/contracts")
 async def get_contracts():
     """الحصول على قائمة العقود"""
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM contracts LIMIT 100")
-        contracts = cursor.fetchall()
-        cursor.close()
-        conn.close()
+        contracts = await fetch_all("SELECT * FROM contracts LIMIT 100")
         return {"status": "success", "data": contracts}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -49,23 +78,24 @@ async def get_contracts():
 async def get_stats():
     """إحصائيات عامة"""
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        stats = {}
-        
-        cursor.execute("SELECT COUNT(*) FROM properties")
-        stats['properties_count'] = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT COUNT(*) FROM tenants")
-        stats['tenants_count'] = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT COUNT(*) FROM contracts")
-        stats['contracts_count'] = cursor.fetchone()[0]
-        
-        cursor.close()
-        conn.close()
-        
+        stats = await run_db(load_dashboard_stats)
         return {"status": "success", "data": stats}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/api/metrics/timeseries")
+async def get_metric_timeseries(
+    metric: str,
+    period: str = "day",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    dimension: Optional[str] = None
+):
+    """سلسلة زمنية لمقياس من العدّادات المجمّعة (dimension=* للتفصيل حسب البعد)"""
+    try:
+        points = await run_db(metric_timeseries, metric, period, start, end, dimension)
+        return {"status": "success", "metric": metric, "period": period, "data": points}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
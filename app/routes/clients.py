@@ -1,34 +1,40 @@
 from fastapi import APIRouter, Depends, Request, Form, HTTPException
 from fastapi.responses import HTMLResponse, RedirectResponse
 from fastapi.templating import Jinja2Templates
-from app.db.database import get_connection
+from app.utils.request_timing import instrument_templates
+from app.db.async_db import fetch_one, execute, run_db
+from app.db.pagination import KeysetQuery, DEFAULT_PAGE_SIZE
 from app.routes.auth import verify_credentials
 from models.client import ClientCreate, ClientUpdate
 from typing import Optional
 
 router = APIRouter()
-templates = Jinja2Templates(directory="templates")
+templates = instrument_templates(Jinja2Templates(directory="templates"))
 
 @router.get("/", response_class=HTMLResponse)
-async def list_clients(request: Request, username: str = Depends(verify_credentials)):
+async def list_clients(
+    request: Request,
+    q: Optional[str] = None,
+    cursor: Optional[str] = None,
+    page_size: int = DEFAULT_PAGE_SIZE,
+    username: str = Depends(verify_credentials)
+):
     """قائمة العملاء"""
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT id, name, email, phone, address, notes, created_at, updated_at 
-            FROM clients 
-            ORDER BY created_at DESC
-        """)
-        clients = cursor.fetchall()
-        
-        cursor.close()
-        conn.close()
-        
+        query = KeysetQuery("""
+            SELECT id, name, email, phone, address, notes, created_at, updated_at,
+                   created_at, id
+            FROM clients
+        """, ["created_at", "id"])
+        if q:
+            query.where("(name ILIKE %s OR phone ILIKE %s)", f"%{q}%", f"{q}%", name="q", value=q)
+
+        page = await run_db(query.fetch, cursor, page_size)
+
         return templates.TemplateResponse("dashboard/clients/list.html", {
             "request": request,
-            "clients": clients,
+            "clients": page.items,
+            "page": page,
             "username": username
         })
     except Exception as e:
@@ -54,42 +60,39 @@ async def add_client(
 ):
     """إضافة عميل جديد"""
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("""
+        await execute("""
             INSERT INTO clients (name, email, phone, address, notes, created_at, updated_at)
             VALUES (%s, %s, %s, %s, %s, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
             RETURNING id
-        """, (client.name, client.email, client.phone, client.address, client.notes))
-        
-        conn.commit()
-        cursor.close()
-        conn.close()
-        
+        """, (client.name, client.email, client.phone, client.address, client.notes), returning=True)
+
         return RedirectResponse(url="/dashboard/clients", status_code=303)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"خطأ في إضافة العميل: {str(e)}")
 
+def _load_client(conn, client_id):
+    cursor = conn.cursor()
+
+    cursor.execute("SELECT id, name, email, phone, address, notes, created_at, updated_at FROM clients WHERE id = %s", (client_id,))
+    client = cursor.fetchone()
+
+    properties = []
+    if client:
+        cursor.execute("SELECT id, name, address, type, status FROM properties WHERE client_id = %s", (client_id,))
+        properties = cursor.fetchall()
+
+    cursor.close()
+    return client, properties
+
 @router.get("/{client_id}", response_class=HTMLResponse)
 async def view_client(client_id: int, request: Request, username: str = Depends(verify_credentials)):
     """عرض تفاصيل عميل"""
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT id, name, email, phone, address, notes, created_at, updated_at FROM clients WHERE id = %s", (client_id,))
-        client = cursor.fetchone()
-        
+        client, properties = await run_db(_load_client, client_id)
+
         if not client:
             raise HTTPException(status_code=404, detail="العميل غير موجود")
-        
-        cursor.execute("SELECT id, name, address, type, status FROM properties WHERE client_id = %s", (client_id,))
-        properties = cursor.fetchall()
-        
-        cursor.close()
-        conn.close()
-        
+
         return templates.TemplateResponse("dashboard/clients/view.html", {
             "request": request,
             "client": client,
@@ -103,18 +106,11 @@ async def view_client(client_id: int, request: Request, username: str = Depends(
 async def edit_client_form(client_id: int, request: Request, username: str = Depends(verify_credentials)):
     """صفحة تعديل عميل"""
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT id, name, email, phone, address, notes FROM clients WHERE id = %s", (client_id,))
-        client = cursor.fetchone()
-        
+        client = await fetch_one("SELECT id, name, email, phone, address, notes FROM clients WHERE id = %s", (client_id,))
+
         if not client:
             raise HTTPException(status_code=404, detail="العميل غير موجود")
-        
-        cursor.close()
-        conn.close()
-        
+
         return templates.TemplateResponse("dashboard/clients/edit.html", {
             "request": request,
             "client": client,
@@ -131,12 +127,9 @@ async def edit_client(
 ):
     """تعديل عميل"""
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        
         update_fields = []
         update_values = []
-        
+
         if client.name:
             update_fields.append("name = %s")
             update_values.append(client.name)
@@ -152,18 +145,14 @@ async def edit_client(
         if client.notes is not None:
             update_fields.append("notes = %s")
             update_values.append(client.notes)
-        
+
         if update_fields:
             update_fields.append("updated_at = CURRENT_TIMESTAMP")
             update_values.append(client_id)
-            
+
             query = f"UPDATE clients SET {', '.join(update_fields)} WHERE id = %s"
-            cursor.execute(query, update_values)
-            conn.commit()
-        
-        cursor.close()
-        conn.close()
-        
+            await execute(query, update_values)
+
         return RedirectResponse(url=f"/dashboard/clients/{client_id}", status_code=303)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"خطأ في تعديل العميل: {str(e)}")
@@ -172,15 +161,8 @@ async def edit_client(
 async def delete_client(client_id: int, username: str = Depends(verify_credentials)):
     """حذف عميل"""
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("DELETE FROM clients WHERE id = %s", (client_id,))
-        conn.commit()
-        
-        cursor.close()
-        conn.close()
-        
+        await execute("DELETE FROM clients WHERE id = %s", (client_id,))
+
         return RedirectResponse(url="/dashboard/clients", status_code=303)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"خطأ في حذف العميل: {str(e)}")
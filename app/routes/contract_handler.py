@@ -1,6 +1,5 @@
 from datetime import datetime
 from fastapi import APIRouter
-from app.db.database import get_connection
 from app.services.reminder_service import SmartReminder
 from app.templates.contract_reminders import ContractTemplates
 
@@ -1,38 +1,69 @@
 from fastapi import APIRouter, Depends, Request, Form, HTTPException
 from fastapi.responses import HTMLResponse, RedirectResponse
 from fastapi.templating import Jinja2Templates
-from app.db.database import get_connection
+from app.utils.request_timing import instrument_templates
+from app.db.async_db import fetch_one, run_db
+from app.db.pagination import KeysetQuery, DEFAULT_PAGE_SIZE
 from app.routes.auth import verify_credentials
+from app.services.stats_service import load_dashboard_stats
+from app.services.phone_index import contract_phone_index
+from app.services.search import contract_match_condition, prepare_term
 from typing import Optional
 from datetime import datetime
 
 router = APIRouter()
-templates = Jinja2Templates(directory="templates")
+templates = instrument_templates(Jinja2Templates(directory="templates"))
+
+def _load_contracts(conn, query, page_cursor, page_size, q=None):
+    if q:
+        # شكل الشرط يعتمد على وجود contracts.search_doc فيُبنى داخل الاتصال
+        condition, params = contract_match_condition(conn, prepare_term(q) or q)
+        query.where(condition, *params, name="q", value=q)
+    page = query.fetch(conn, page_cursor, page_size)
+    # بطاقات الإحصائيات لكل العقود وليس لصفحة واحدة فقط
+    stats = load_dashboard_stats(conn)
+    return page, stats
 
 @router.get("/", response_class=HTMLResponse)
-async def list_contracts(request: Request, username: str = Depends(verify_credentials)):
+async def list_contracts(
+    request: Request,
+    q: Optional[str] = None,
+    status: Optional[str] = None,
+    tenant_id: Optional[int] = None,
+    property_id: Optional[int] = None,
+    expiring_within: Optional[int] = None,
+    cursor: Optional[str] = None,
+    page_size: int = DEFAULT_PAGE_SIZE,
+    username: str = Depends(verify_credentials)
+):
     """قائمة العقود"""
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("""
+        query = KeysetQuery("""
             SELECT c.id, c.start_date, c.end_date, c.rent_amount, c.status,
                    t.name as tenant_name, p.name as property_name,
-                   CAST((julianday(c.end_date) - julianday('now')) AS INTEGER) as days_left
+                   (c.end_date - CURRENT_DATE) as days_left,
+                   c.start_date, c.id
             FROM contracts c
             LEFT JOIN tenants t ON c.tenant_id = t.id
             LEFT JOIN properties p ON c.property_id = p.id
-            ORDER BY c.start_date DESC
-        """)
-        contracts = cursor.fetchall()
-        
-        cursor.close()
-        conn.close()
-        
+        """, ["c.start_date", "c.id"])
+        if status:
+            query.where("c.status = %s", status, name="status", value=status)
+        if tenant_id:
+            query.where("c.tenant_id = %s", tenant_id, name="tenant_id", value=tenant_id)
+        if property_id:
+            query.where("c.property_id = %s", property_id, name="property_id", value=property_id)
+        if expiring_within is not None:
+            query.where("c.end_date BETWEEN CURRENT_DATE AND CURRENT_DATE + %s", expiring_within,
+                        name="expiring_within", value=expiring_within)
+
+        page, stats = await run_db(_load_contracts, query, cursor, page_size, q)
+
         return templates.TemplateResponse("dashboard/contracts/list.html", {
             "request": request,
-            "contracts": contracts,
+            "contracts": page.items,
+            "page": page,
+            "stats": stats,
             "username": username
         })
     except Exception as e:
@@ -43,22 +74,24 @@ async def list_contracts(request: Request, username: str = Depends(verify_creden
             "error": str(e)
         })
 
+def _load_form_options(conn):
+    cursor = conn.cursor()
+
+    cursor.execute("SELECT id, name FROM tenants ORDER BY name")
+    tenants = cursor.fetchall()
+
+    cursor.execute("SELECT id, name FROM properties WHERE status = 'available' ORDER BY name")
+    properties = cursor.fetchall()
+
+    cursor.close()
+    return tenants, properties
+
 @router.get("/add", response_class=HTMLResponse)
 async def add_contract_form(request: Request, username: str = Depends(verify_credentials)):
     """صفحة إضافة عقد"""
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT id, name FROM tenants ORDER BY name")
-        tenants = cursor.fetchall()
-        
-        cursor.execute("SELECT id, name FROM properties WHERE status = 'available' ORDER BY name")
-        properties = cursor.fetchall()
-        
-        cursor.close()
-        conn.close()
-        
+        tenants, properties = await run_db(_load_form_options)
+
         return templates.TemplateResponse("dashboard/contracts/add.html", {
             "request": request,
             "tenants": tenants,
@@ -74,6 +107,22 @@ async def add_contract_form(request: Request, username: str = Depends(verify_cre
             "error": str(e)
         })
 
+def _insert_contract(conn, values, property_id):
+    cursor = conn.cursor()
+
+    cursor.execute("""
+        INSERT INTO contracts
+        (tenant_id, property_id, start_date, end_date, rent_amount,
+         deposit_amount, payment_day, status, notes, created_at)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, 'active', %s, CURRENT_TIMESTAMP)
+    """, values)
+
+    # تحديث حالة العقار إلى مؤجر
+    cursor.execute("UPDATE properties SET status = 'rented' WHERE id = %s", (property_id,))
+
+    conn.commit()
+    cursor.close()
+
 @router.post("/add")
 async def add_contract(
     tenant_id: int = Form(...),
@@ -88,24 +137,9 @@ async def add_contract(
 ):
     """إضافة عقد جديد"""
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            INSERT INTO contracts 
-            (tenant_id, property_id, start_date, end_date, rent_amount, 
-             deposit_amount, payment_day, status, notes, created_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, 'active', ?, datetime('now'))
-        """, (tenant_id, property_id, start_date, end_date, rent_amount, 
-              deposit_amount, payment_day, notes))
-        
-        # تحديث حالة العقار إلى مؤجر
-        cursor.execute("UPDATE properties SET status = 'rented' WHERE id = ?", (property_id,))
-        
-        conn.commit()
-        cursor.close()
-        conn.close()
-        
+        await run_db(_insert_contract, (tenant_id, property_id, start_date, end_date, rent_amount,
+                                        deposit_amount, payment_day, notes), property_id)
+
         return RedirectResponse(url="/dashboard/contracts", status_code=303)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"خطأ في إضافة العقد: {str(e)}")
@@ -114,25 +148,18 @@ async def add_contract(
 async def view_contract(contract_id: int, request: Request, username: str = Depends(verify_credentials)):
     """عرض تفاصيل عقد"""
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("""
+        contract = await fetch_one("""
             SELECT c.*, t.name as tenant_name, t.phone as tenant_phone,
                    p.name as property_name, p.address as property_address
             FROM contracts c
             LEFT JOIN tenants t ON c.tenant_id = t.id
             LEFT JOIN properties p ON c.property_id = p.id
-            WHERE c.id = ?
+            WHERE c.id = %s
         """, (contract_id,))
-        contract = cursor.fetchone()
-        
+
         if not contract:
             raise HTTPException(status_code=404, detail="العقد غير موجود")
-        
-        cursor.close()
-        conn.close()
-        
+
         return templates.TemplateResponse("dashboard/contracts/view.html", {
             "request": request,
             "contract": contract,
@@ -141,26 +168,28 @@ async def view_contract(contract_id: int, request: Request, username: str = Depe
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def _delete_contract(conn, contract_id):
+    cursor = conn.cursor()
+
+    # جلب property_id قبل الحذف
+    cursor.execute("SELECT property_id FROM contracts WHERE id = %s", (contract_id,))
+    result = cursor.fetchone()
+
+    if result:
+        property_id = result[0]
+        cursor.execute("DELETE FROM contracts WHERE id = %s", (contract_id,))
+        cursor.execute("UPDATE properties SET status = 'available' WHERE id = %s", (property_id,))
+
+    conn.commit()
+    cursor.close()
+
 @router.post("/{contract_id}/delete")
 async def delete_contract(contract_id: int, username: str = Depends(verify_credentials)):
     """حذف عقد"""
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        # جلب property_id قبل الحذف
-        cursor.execute("SELECT property_id FROM contracts WHERE id = ?", (contract_id,))
-        result = cursor.fetchone()
-        
-        if result:
-            property_id = result[0]
-            cursor.execute("DELETE FROM contracts WHERE id = ?", (contract_id,))
-            cursor.execute("UPDATE properties SET status = 'available' WHERE id = ?", (property_id,))
-        
-        conn.commit()
-        cursor.close()
-        conn.close()
-        
+        await run_db(_delete_contract, contract_id)
+        contract_phone_index.invalidate_where(lambda entry: contract_id in entry["contract_ids"])
+
         return RedirectResponse(url="/dashboard/contracts", status_code=303)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"خطأ في حذف العقد: {str(e)}")
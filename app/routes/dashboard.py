@@ -1,34 +1,26 @@
 from fastapi import APIRouter, Depends, Request
 from fastapi.responses import HTMLResponse
 from fastapi.templating import Jinja2Templates
+from app.utils.request_timing import instrument_templates
 from app.routes.auth import verify_credentials
-from app.db.database import get_connection
+from app.db.async_db import run_db
+from app.services.stats_service import load_dashboard_stats
 
 router = APIRouter(prefix="/dashboard", tags=["dashboard"])
-templates = Jinja2Templates(directory="templates")
+templates = instrument_templates(Jinja2Templates(directory="templates"))
 
 @router.get("/", response_class=HTMLResponse)
 async def dashboard_home(request: Request, username: str = Depends(verify_credentials)):
     """الصفحة الرئيسية للوحة التحكم"""
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        # إحصائيات بسيطة
-        cursor.execute("SELECT COUNT(*) FROM clients")
-        total_clients = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT COUNT(*) FROM properties")
-        total_properties = cursor.fetchone()[0]
-        
-        cursor.close()
-        conn.close()
+        stats = await run_db(load_dashboard_stats)
         
         return templates.TemplateResponse("dashboard/index.html", {
             "request": request,
             "username": username,
-            "total_clients": total_clients,
-            "total_properties": total_properties
+            "total_clients": stats["clients_count"],
+            "total_properties": stats["properties_count"],
+            "stats": stats
         })
     except Exception as e:
         return templates.TemplateResponse("dashboard/index.html", {
@@ -1,6 +1,12 @@
-from fastapi import APIRouter, HTTPException
-from app.db.database import get_connection
-from typing import Optional
+from fastapi import APIRouter, HTTPException, UploadFile, File, Query
+from app.db.async_db import fetch_all, run_db
+from app.db.loaders import load_contract_detail
+from app.db.contracts_view import EXPIRING_CONTRACTS_SQL, EXPIRING_THRESHOLD_DAYS
+from app.services.payment_schedule import regenerate_payment_schedules, is_known_frequency
+from app.services.contract_import import import_contracts, iter_csv_rows, iter_json_rows, IMPORT_CHUNK_SIZE
+from app.services.search import search_contracts
+from app.db.pagination import DEFAULT_PAGE_SIZE
+from typing import List, Optional
 
 router = APIRouter()
 
@@ -8,12 +14,7 @@ router = APIRouter()
 async def get_contracts(limit: Optional[int] = 100):
     """الحصول على قائمة العقود"""
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute(f"SELECT * FROM contracts LIMIT {limit}")
-        contracts = cursor.fetchall()
-        cursor.close()
-        conn.close()
+        contracts = await fetch_all("SELECT * FROM contracts_view LIMIT %s", (limit,))
         return {
             "status": "success",
             "data": contracts,
@@ -22,40 +23,44 @@ async def get_contracts(limit: Optional[int] = 100):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/contracts/search")
+async def search_contracts_api(q: str, cursor: Optional[str] = None, page_size: int = DEFAULT_PAGE_SIZE,
+                               status: Optional[str] = None):
+    """بحث العقود (رقم العقد، المستأجر، الهاتف، العنوان) مرتب حسب الصلة"""
+    try:
+        page = await run_db(search_contracts, q, cursor, page_size, status)
+        return {
+            "status": "success",
+            "data": page.items,
+            "count": len(page.items),
+            "next_cursor": page.next_cursor
+        }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.get("/contracts/{contract_id}")
 async def get_contract(contract_id: int):
     """الحصول على تفاصيل عقد محدد"""
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM contracts WHERE id = ?", (contract_id,))
-        contract = cursor.fetchone()
-        cursor.close()
-        conn.close()
-        
-        if not contract:
+        # العقد ومدفوعاته وتذكيراته وتجديداته في استعلام واحد
+        detail = await run_db(load_contract_detail, contract_id)
+
+        if not detail:
             raise HTTPException(status_code=404, detail="العقد غير موجود")
-        
-        return {"status": "success", "data": contract}
+
+        return {"status": "success", "data": detail.to_dict()}
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/contracts/expiring/soon")
-async def get_expiring_contracts(days: Optional[int] = 30):
+async def get_expiring_contracts(days: Optional[int] = EXPIRING_THRESHOLD_DAYS, limit: Optional[int] = 500):
     """الحصول على العقود القريبة من الانتهاء"""
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT * FROM contracts 
-            WHERE end_date <= date('now', '+' || ? || ' days')
-            AND end_date >= date('now')
-        """, (days,))
-        contracts = cursor.fetchall()
-        cursor.close()
-        conn.close()
+        contracts = await fetch_all(EXPIRING_CONTRACTS_SQL, (days, limit))
         return {
             "status": "success",
             "data": contracts,
@@ -63,3 +68,40 @@ async def get_expiring_contracts(days: Optional[int] = 30):
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/contracts/payment-schedules/regenerate")
+async def regenerate_schedules(contract_ids: Optional[List[int]] = None,
+                               frequency: Optional[str] = None,
+                               payment_day: Optional[int] = Query(None, ge=1, le=31)):
+    """
+    إعادة توليد جداول الدفعات المعلقة (لكل العقود إذا لم تحدد contract_ids)
+    frequency يُحفظ في العقود؛ payment_day يطبق على هذه الإعادة فقط
+    """
+    if frequency is not None:
+        if not is_known_frequency(frequency):
+            raise HTTPException(status_code=400, detail=f"تكرار الدفع غير معروف: {frequency}")
+        frequency = frequency.strip().lower()
+    try:
+        result = await run_db(regenerate_payment_schedules, contract_ids, frequency, payment_day)
+        return {"status": "success", "data": result}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/contracts/import")
+async def import_contracts_file(file: UploadFile = File(...), chunk_size: int = IMPORT_CHUNK_SIZE):
+    """استيراد عقود من ملف CSV أو JSON/NDJSON؛ أخطاء كل صف تُعاد دون إيقاف الاستيراد"""
+    name = (file.filename or "").lower()
+    if name.endswith(".csv") or file.content_type == "text/csv":
+        rows = iter_csv_rows(file.file)
+    elif name.endswith((".json", ".ndjson", ".jsonl")) or file.content_type == "application/json":
+        rows = iter_json_rows(file.file)
+    else:
+        raise HTTPException(status_code=400, detail="صيغة الملف غير مدعومة (CSV أو JSON)")
+
+    try:
+        report = await run_db(import_contracts, rows, chunk_size)
+        return {"status": "success", "data": report.to_dict()}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"ملف غير صالح: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
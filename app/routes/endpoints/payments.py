@@ -1,5 +1,5 @@
 from fastapi import APIRouter, HTTPException
-from app.db.database import get_connection
+from app.db.async_db import fetch_all, fetch_one, execute
 from typing import Optional
 from pydantic import BaseModel
 
@@ -15,12 +15,7 @@ class PaymentCreate(BaseModel):
 async def get_payments(limit: Optional[int] = 100):
     """الحصول على قائمة الدفعات"""
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute(f"SELECT * FROM payments ORDER BY payment_date DESC LIMIT {limit}")
-        payments = cursor.fetchall()
-        cursor.close()
-        conn.close()
+        payments = await fetch_all("SELECT * FROM payments ORDER BY payment_date DESC LIMIT %s", (limit,))
         return {
             "status": "success",
             "data": payments,
@@ -33,16 +28,11 @@ async def get_payments(limit: Optional[int] = 100):
 async def get_payment(payment_id: int):
     """الحصول على تفاصيل دفعة محددة"""
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM payments WHERE id = ?", (payment_id,))
-        payment = cursor.fetchone()
-        cursor.close()
-        conn.close()
-        
+        payment = await fetch_one("SELECT * FROM payments WHERE id = %s", (payment_id,))
+
         if not payment:
             raise HTTPException(status_code=404, detail="الدفعة غير موجودة")
-        
+
         return {"status": "success", "data": payment}
     except HTTPException:
         raise
@@ -53,17 +43,13 @@ async def get_payment(payment_id: int):
 async def create_payment(payment: PaymentCreate):
     """تسجيل دفعة جديدة"""
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
+        row = await execute("""
             INSERT INTO payments (tenant_id, amount, payment_date, notes)
-            VALUES (?, ?, COALESCE(?, date('now')), ?)
-        """, (payment.tenant_id, payment.amount, payment.payment_date, payment.notes))
-        conn.commit()
-        payment_id = cursor.lastrowid
-        cursor.close()
-        conn.close()
-        
+            VALUES (%s, %s, COALESCE(%s, CURRENT_DATE), %s)
+            RETURNING id
+        """, (payment.tenant_id, payment.amount, payment.payment_date, payment.notes), returning=True)
+        payment_id = row[0] if row else None
+
         return {
             "status": "success",
             "message": "تم تسجيل الدفعة بنجاح",
@@ -76,12 +62,7 @@ async def create_payment(payment: PaymentCreate):
 async def get_tenant_payments(tenant_id: int):
     """الحصول على دفعات مستأجر معين"""
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM payments WHERE tenant_id = ? ORDER BY payment_date DESC", (tenant_id,))
-        payments = cursor.fetchall()
-        cursor.close()
-        conn.close()
+        payments = await fetch_all("SELECT * FROM payments WHERE tenant_id = %s ORDER BY payment_date DESC", (tenant_id,))
         return {
             "status": "success",
             "data": payments,
@@ -1,5 +1,7 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
+from app.db.async_db import run_db
+from app.services.outbox import enqueue
 
 router = APIRouter()
 
@@ -11,11 +13,13 @@ class MessageRequest(BaseModel):
 async def send_message(data: MessageRequest):
     """إرسال رسالة واتساب"""
     try:
-        # TODO: إضافة منطق إرسال الرسالة عبر WhatsApp API
+        # الإرسال الفعلي يتم في الخلفية عبر عمّال outbox
+        outbox_id = await run_db(enqueue, data.phone, data.message, kind="manual")
         return {
-            "status": "success",
-            "message": "تم إرسال الرسالة",
-            "phone": data.phone
+            "status": "queued",
+            "message": "تمت جدولة الرسالة للإرسال",
+            "phone": data.phone,
+            "outbox_id": outbox_id
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
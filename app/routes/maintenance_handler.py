@@ -1,49 +1,95 @@
-from datetime import datetime
-from fastapi import APIRouter
-from app.db.database import get_connection
-from app.services.reminder_service import SmartReminder
-from app.templates.contract_reminders import ContractTemplates
+from datetime import date
+from fastapi import APIRouter, Depends
+from app.db.async_db import run_db
+from app.routes.auth import verify_credentials
+from app.services.reminder_dispatch import build_payment_reminder_jobs
+from app.services.reminder_scheduler import schedule_due_reminders, backfill_contract_reminders
+from app.services.outbox import enqueue_jobs, outbox_stats
+from app.services.analytics_jobs import run_analytics_batch
+from app.services.rollups import run_rollup
+from app.services.partitions import run_partition_maintenance
 
 router = APIRouter()
 
+def _queue_payment_reminders(conn, days_ahead):
+    jobs = build_payment_reminder_jobs(conn, days_ahead)
+    return len(jobs), enqueue_jobs(conn, jobs, dedupe_suffix=date.today().isoformat())
+
 @router.post("/maintenance/contract-reminders/send")
 async def send_contract_reminders():
-    """إرسال تنبيهات تجديد العقود تلقائياً"""
+    """إضافة تنبيهات تجديد العقود المستحقة إلى صندوق الإرسال (يرسلها عمّال outbox)"""
+    try:
+        result = await run_db(schedule_due_reminders)
+
+        return {
+            "status": "success",
+            "sent_count": result["queued"],
+            "duplicates": result["claimed"] - result["skipped"] - result["queued"],
+            **result,
+            "message": f"تمت جدولة {result['queued']} تذكير للإرسال"
+        }
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+@router.post("/maintenance/contract-reminders/backfill")
+async def backfill_reminders(username: str = Depends(verify_credentials)):
+    """إنشاء صفوف التذكير الناقصة لكل العقود النشطة من renewal_reminders"""
+    try:
+        inserted = await run_db(backfill_contract_reminders)
+        return {"status": "success", "inserted": inserted}
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+@router.post("/maintenance/analytics/run")
+async def run_analytics(period: str = "monthly", username: str = Depends(verify_credentials)):
+    """حساب الإشغال لكل المالكين ومخاطر المغادرة لكل المستأجرين دفعة واحدة"""
+    try:
+        summary = await run_db(run_analytics_batch, period)
+        return {"status": "success", **summary}
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+@router.post("/maintenance/analytics/rollup")
+async def rollup_events(username: str = Depends(verify_credentials)):
+    """تجميع أحداث analytics_events الجديدة في عدّادات الساعة/اليوم/الشهر"""
+    try:
+        result = await run_db(run_rollup)
+        return {"status": "success", **result}
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+@router.post("/maintenance/partitions")
+async def maintain_partitions(username: str = Depends(verify_credentials)):
+    """إنشاء الأشهر القادمة وتلخيص وحذف الأشهر الأقدم من مدة الاحتفاظ"""
     try:
-        reminders = SmartReminder.check_contract_reminders()
-        sent_count = 0
-        
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        # الحصول على أرقام هواتف المستأجرين
-        for period, contracts in reminders.items():
-            for contract in contracts:
-                try:
-                    cursor.execute('''
-                        SELECT t.phone
-                        FROM tenants t
-                        JOIN contracts c ON t.id = c.tenant_id
-                        WHERE c.id = ?
-                    ''', (contract['contract_id'],))
-                    
-                    tenant_phone = cursor.fetchone()
-                    
-                    if tenant_phone and tenant_phone[0]:
-                        sent_count += 1
-                        
-                except Exception as e:
-                    print(f"❌ خطأ في إرسال تنبيه: {e}")
-        
-        conn.close()
+        result = await run_db(run_partition_maintenance)
+        return {"status": "success", **result}
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+@router.post("/maintenance/payment-reminders/send")
+async def send_payment_reminders(days_ahead: int = 3, username: str = Depends(verify_credentials)):
+    """إضافة تذكيرات الدفعات المستحقة والمتأخرة إلى صندوق الإرسال"""
+    try:
+        total, queued = await run_db(_queue_payment_reminders, days_ahead)
+
         return {
             "status": "success",
-            "sent_count": sent_count,
-            "message": f"تم إرسال {sent_count} تذكير"
+            "sent_count": queued,
+            "duplicates": total - queued,
+            "message": f"تمت جدولة {queued} تذكير للإرسال"
         }
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
+@router.get("/maintenance/outbox/stats")
+async def get_outbox_stats(username: str = Depends(verify_credentials)):
+    """حالة صندوق الرسائل الصادرة"""
+    try:
+        return {"status": "success", "data": await run_db(outbox_stats)}
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
 @router.post("/maintenance/contract-renewal")
 async def handle_contract_renewal(phone_number: str, message: str):
     """معالجة ردود المستأجرين على تجديد العقود"""
@@ -1,5 +1,4 @@
 from fastapi import APIRouter
-from app.db.database import get_connection
 
 router = APIRouter()
 
@@ -12,11 +11,7 @@ async def test_payments():
 async def collect_payment(tenant_id: int, amount: float):
     """تحصيل دفعة"""
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
         # TODO: إضافة منطق تحصيل الدفعات
-        cursor.close()
-        conn.close()
         return {
             "status": "success",
             "message": f"تم تسجيل دفعة بمبلغ {amount}",
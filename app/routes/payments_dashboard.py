@@ -1,43 +1,61 @@
 from fastapi import APIRouter, Depends, Request, Form, HTTPException
 from fastapi.responses import HTMLResponse, RedirectResponse
 from fastapi.templating import Jinja2Templates
-from app.db.database import get_connection
+from app.utils.request_timing import instrument_templates
+from app.db.async_db import execute, run_db
+from app.db.pagination import KeysetQuery, DEFAULT_PAGE_SIZE
 from app.routes.auth import verify_credentials
+from app.services.stats_service import load_dashboard_stats
 from typing import Optional
 
 router = APIRouter()
-templates = Jinja2Templates(directory="templates")
+templates = instrument_templates(Jinja2Templates(directory="templates"))
+
+def _load_payments(conn, query, page_cursor, page_size):
+    page = query.fetch(conn, page_cursor, page_size)
+
+    # الإجماليات من جدول dashboard_stats بدلاً من SUM على جدول المدفوعات
+    stats = load_dashboard_stats(conn)
+    return page, stats["total_received"], stats["total_pending"]
 
 @router.get("/", response_class=HTMLResponse)
-async def list_payments(request: Request, username: str = Depends(verify_credentials)):
+async def list_payments(
+    request: Request,
+    status: Optional[str] = None,
+    tenant_id: Optional[int] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    cursor: Optional[str] = None,
+    page_size: int = DEFAULT_PAGE_SIZE,
+    username: str = Depends(verify_credentials)
+):
     """قائمة المدفوعات"""
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("""
+        # payment_date فارغ للمدفوعات المعلقة والمتأخرة، فالترتيب على تاريخ الدفع
+        # أو تاريخ الاستحقاق (غير فارغ دائماً) حتى لا يقارن المؤشر مع NULL
+        query = KeysetQuery("""
             SELECT p.id, p.amount, p.payment_date, p.payment_method, p.status,
-                   t.name as tenant_name, pr.name as property_name
+                   t.name as tenant_name, pr.name as property_name,
+                   COALESCE(p.payment_date, p.due_date), p.id
             FROM payments p
             LEFT JOIN tenants t ON p.tenant_id = t.id
             LEFT JOIN properties pr ON p.property_id = pr.id
-            ORDER BY p.payment_date DESC
-        """)
-        payments = cursor.fetchall()
-        
-        # حساب الإحصائيات
-        cursor.execute("SELECT SUM(amount) FROM payments WHERE status = 'completed'")
-        total_received = cursor.fetchone()[0] or 0
-        
-        cursor.execute("SELECT SUM(amount) FROM payments WHERE status = 'pending'")
-        total_pending = cursor.fetchone()[0] or 0
-        
-        cursor.close()
-        conn.close()
-        
+        """, ["COALESCE(p.payment_date, p.due_date)", "p.id"])
+        if status:
+            query.where("p.status = %s", status, name="status", value=status)
+        if tenant_id:
+            query.where("p.tenant_id = %s", tenant_id, name="tenant_id", value=tenant_id)
+        if date_from:
+            query.where("p.payment_date >= %s", date_from, name="date_from", value=date_from)
+        if date_to:
+            query.where("p.payment_date <= %s", date_to, name="date_to", value=date_to)
+
+        page, total_received, total_pending = await run_db(_load_payments, query, cursor, page_size)
+
         return templates.TemplateResponse("dashboard/payments/list.html", {
             "request": request,
-            "payments": payments,
+            "payments": page.items,
+            "page": page,
             "total_received": total_received,
             "total_pending": total_pending,
             "username": username
@@ -52,22 +70,24 @@ async def list_payments(request: Request, username: str = Depends(verify_credent
             "error": str(e)
         })
 
+def _load_form_options(conn):
+    cursor = conn.cursor()
+
+    cursor.execute("SELECT id, name FROM tenants ORDER BY name")
+    tenants = cursor.fetchall()
+
+    cursor.execute("SELECT id, name FROM properties ORDER BY name")
+    properties = cursor.fetchall()
+
+    cursor.close()
+    return tenants, properties
+
 @router.get("/add", response_class=HTMLResponse)
 async def add_payment_form(request: Request, username: str = Depends(verify_credentials)):
     """صفحة إضافة دفعة"""
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT id, name FROM tenants ORDER BY name")
-        tenants = cursor.fetchall()
-        
-        cursor.execute("SELECT id, name FROM properties ORDER BY name")
-        properties = cursor.fetchall()
-        
-        cursor.close()
-        conn.close()
-        
+        tenants, properties = await run_db(_load_form_options)
+
         return templates.TemplateResponse("dashboard/payments/add.html", {
             "request": request,
             "tenants": tenants,
@@ -95,19 +115,12 @@ async def add_payment(
 ):
     """إضافة دفعة جديدة"""
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            INSERT INTO payments 
+        await execute("""
+            INSERT INTO payments
             (tenant_id, property_id, amount, payment_date, payment_method, status, notes, created_at)
-            VALUES (?, ?, ?, ?, ?, 'completed', ?, datetime('now'))
+            VALUES (%s, %s, %s, %s, %s, 'completed', %s, CURRENT_TIMESTAMP)
         """, (tenant_id, property_id, amount, payment_date, payment_method, notes))
-        
-        conn.commit()
-        cursor.close()
-        conn.close()
-        
+
         return RedirectResponse(url="/dashboard/payments", status_code=303)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"خطأ في إضافة الدفعة: {str(e)}")
@@ -116,15 +129,8 @@ async def add_payment(
 async def delete_payment(payment_id: int, username: str = Depends(verify_credentials)):
     """حذف دفعة"""
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("DELETE FROM payments WHERE id = ?", (payment_id,))
-        conn.commit()
-        
-        cursor.close()
-        conn.close()
-        
+        await execute("DELETE FROM payments WHERE id = %s", (payment_id,))
+
         return RedirectResponse(url="/dashboard/payments", status_code=303)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"خطأ في حذف الدفعة: {str(e)}")
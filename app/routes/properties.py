@@ -1,35 +1,59 @@
 from fastapi import APIRouter, Depends, Request, Form, HTTPException
 from fastapi.responses import HTMLResponse, RedirectResponse
 from fastapi.templating import Jinja2Templates
-from app.db.database import get_connection
+from app.utils.request_timing import instrument_templates
+from app.db.async_db import fetch_all, execute, run_db
+from app.db.loaders import load_property_detail
+from app.db.pagination import KeysetQuery, DEFAULT_PAGE_SIZE
 from app.routes.auth import verify_credentials
+from app.services.stats_service import load_dashboard_stats
 from typing import Optional
 
 router = APIRouter()
-templates = Jinja2Templates(directory="templates")
+templates = instrument_templates(Jinja2Templates(directory="templates"))
+
+def _load_properties(conn, query, page_cursor, page_size):
+    page = query.fetch(conn, page_cursor, page_size)
+    # بطاقات الإحصائيات لكل العقارات وليس لصفحة واحدة فقط
+    stats = load_dashboard_stats(conn)
+    return page, stats
 
 @router.get("/", response_class=HTMLResponse)
-async def list_properties(request: Request, username: str = Depends(verify_credentials)):
+async def list_properties(
+    request: Request,
+    q: Optional[str] = None,
+    status: Optional[str] = None,
+    property_type: Optional[str] = None,
+    client_id: Optional[int] = None,
+    cursor: Optional[str] = None,
+    page_size: int = DEFAULT_PAGE_SIZE,
+    username: str = Depends(verify_credentials)
+):
     """قائمة العقارات"""
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT p.id, p.name, p.address, p.type, p.status, 
-                   p.rent_amount, c.name as client_name
+        query = KeysetQuery("""
+            SELECT p.id, p.name, p.address, p.type, p.status,
+                   p.rent_amount, c.name as client_name,
+                   p.created_at, p.id
             FROM properties p
             LEFT JOIN clients c ON p.client_id = c.id
-            ORDER BY p.created_at DESC
-        """)
-        properties = cursor.fetchall()
-        
-        cursor.close()
-        conn.close()
-        
+        """, ["p.created_at", "p.id"])
+        if q:
+            query.where("(p.name ILIKE %s OR p.address ILIKE %s)", f"%{q}%", f"%{q}%", name="q", value=q)
+        if status:
+            query.where("p.status = %s", status, name="status", value=status)
+        if property_type:
+            query.where("p.type = %s", property_type, name="property_type", value=property_type)
+        if client_id:
+            query.where("p.client_id = %s", client_id, name="client_id", value=client_id)
+
+        page, stats = await run_db(_load_properties, query, cursor, page_size)
+
         return templates.TemplateResponse("dashboard/properties/list.html", {
             "request": request,
-            "properties": properties,
+            "properties": page.items,
+            "page": page,
+            "stats": stats,
             "username": username
         })
     except Exception as e:
@@ -44,16 +68,9 @@ async def list_properties(request: Request, username: str = Depends(verify_crede
 async def add_property_form(request: Request, username: str = Depends(verify_credentials)):
     """صفحة إضافة عقار"""
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        
         # جلب قائمة العملاء
-        cursor.execute("SELECT id, name FROM clients ORDER BY name")
-        clients = cursor.fetchall()
-        
-        cursor.close()
-        conn.close()
-        
+        clients = await fetch_all("SELECT id, name FROM clients ORDER BY name")
+
         return templates.TemplateResponse("dashboard/properties/add.html", {
             "request": request,
             "clients": clients,
@@ -83,21 +100,14 @@ async def add_property(
 ):
     """إضافة عقار جديد"""
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            INSERT INTO properties 
-            (name, address, type, rent_amount, client_id, rooms, bathrooms, 
+        await execute("""
+            INSERT INTO properties
+            (name, address, type, rent_amount, client_id, rooms, bathrooms,
              area, floor, status, notes, created_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 'available', ?, datetime('now'))
-        """, (name, address, property_type, rent_amount, client_id, 
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, 'available', %s, CURRENT_TIMESTAMP)
+        """, (name, address, property_type, rent_amount, client_id,
               rooms, bathrooms, area, floor, notes))
-        
-        conn.commit()
-        cursor.close()
-        conn.close()
-        
+
         return RedirectResponse(url="/dashboard/properties", status_code=303)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"خطأ في إضافة العقار: {str(e)}")
@@ -106,37 +116,16 @@ async def add_property(
 async def view_property(property_id: int, request: Request, username: str = Depends(verify_credentials)):
     """عرض تفاصيل عقار"""
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT p.*, c.name as client_name, c.phone as client_phone
-            FROM properties p
-            LEFT JOIN clients c ON p.client_id = c.id
-            WHERE p.id = ?
-        """, (property_id,))
-        property_data = cursor.fetchone()
-        
-        if not property_data:
+        # العقار والمالك وعقوده في استعلام واحد
+        detail = await run_db(load_property_detail, property_id)
+
+        if not detail:
             raise HTTPException(status_code=404, detail="العقار غير موجود")
-        
-        # جلب العقود المرتبطة
-        cursor.execute("""
-            SELECT c.*, t.name as tenant_name
-            FROM contracts c
-            LEFT JOIN tenants t ON c.tenant_id = t.id
-            WHERE c.property_id = ?
-            ORDER BY c.start_date DESC
-        """, (property_id,))
-        contracts = cursor.fetchall()
-        
-        cursor.close()
-        conn.close()
-        
+
         return templates.TemplateResponse("dashboard/properties/view.html", {
             "request": request,
-            "property": property_data,
-            "contracts": contracts,
+            "property": detail.property,
+            "contracts": detail.contracts,
             "username": username
         })
     except Exception as e:
@@ -146,15 +135,8 @@ async def view_property(property_id: int, request: Request, username: str = Depe
 async def delete_property(property_id: int, username: str = Depends(verify_credentials)):
     """حذف عقار"""
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("DELETE FROM properties WHERE id = ?", (property_id,))
-        conn.commit()
-        
-        cursor.close()
-        conn.close()
-        
+        await execute("DELETE FROM properties WHERE id = %s", (property_id,))
+
         return RedirectResponse(url="/dashboard/properties", status_code=303)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"خطأ في حذف العقار: {str(e)}")
@@ -0,0 +1,44 @@
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from app.routes.auth import verify_credentials
+from app.services.exports import EXPORTS, EXPORT_FORMATS, ExportBusy, export_stream
+from typing import Optional
+from datetime import date
+
+router = APIRouter()
+
+@router.get("/")
+async def list_reports(username: str = Depends(verify_credentials)):
+    """التقارير المتاحة للتصدير"""
+    return {
+        "status": "success",
+        "datasets": list(EXPORTS),
+        "formats": list(EXPORT_FORMATS),
+        "filters": ["date_from", "date_to", "owner_id"]
+    }
+
+@router.get("/export/{dataset}")
+async def export_report(
+    dataset: str,
+    format: str = "csv",
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    owner_id: Optional[int] = None,
+    username: str = Depends(verify_credentials)
+):
+    """تصدير المدفوعات أو العقود أو المستأجرين بالتدفق (CSV / NDJSON / XLSX)"""
+    try:
+        chunks = export_stream(dataset, format, date_from, date_to, owner_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ExportBusy as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "30"})
+
+    suffix = f"_owner{owner_id}" if owner_id is not None else ""
+    filename = f"{dataset}{suffix}_{date.today().isoformat()}.{format}"
+    # المولد متزامن فيُقرأ في مجمع الخيوط جزءاً بجزء دون حجز حلقة الأحداث
+    return StreamingResponse(
+        chunks,
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
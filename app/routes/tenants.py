@@ -1,36 +1,46 @@
 from fastapi import APIRouter, Depends, Request, Form, HTTPException
 from fastapi.responses import HTMLResponse, RedirectResponse
 from fastapi.templating import Jinja2Templates
-from app.db.database import get_connection
+from app.utils.request_timing import instrument_templates
+from app.db.async_db import execute, run_db
+from app.db.loaders import load_tenant_detail
+from app.db.pagination import KeysetQuery, DEFAULT_PAGE_SIZE
 from app.routes.auth import verify_credentials
+from app.services.phone_index import tenant_index
+from app.services.search import match_condition, prepare_term
 from typing import Optional
 
 router = APIRouter()
-templates = Jinja2Templates(directory="templates")
+templates = instrument_templates(Jinja2Templates(directory="templates"))
 
 @router.get("/", response_class=HTMLResponse)
-async def list_tenants(request: Request, username: str = Depends(verify_credentials)):
+async def list_tenants(
+    request: Request,
+    q: Optional[str] = None,
+    cursor: Optional[str] = None,
+    page_size: int = DEFAULT_PAGE_SIZE,
+    username: str = Depends(verify_credentials)
+):
     """قائمة المستأجرين"""
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("""
+        # عدد العقود يُحسب لصفوف الصفحة فقط عبر فهرس contracts(tenant_id)
+        # بدلاً من GROUP BY على جدول العقود بالكامل
+        query = KeysetQuery("""
             SELECT t.id, t.name, t.phone, t.email, t.national_id,
-                   COUNT(c.id) as contracts_count
+                   (SELECT COUNT(*) FROM contracts c WHERE c.tenant_id = t.id) as contracts_count,
+                   t.created_at, t.id
             FROM tenants t
-            LEFT JOIN contracts c ON t.id = c.tenant_id
-            GROUP BY t.id, t.name, t.phone, t.email, t.national_id
-            ORDER BY t.created_at DESC
-        """)
-        tenants = cursor.fetchall()
-        
-        cursor.close()
-        conn.close()
-        
+        """, ["t.created_at", "t.id"])
+        if q:
+            term = prepare_term(q) or q
+            query.where(match_condition("t.search_doc"), term, term, name="q", value=q)
+
+        page = await run_db(query.fetch, cursor, page_size)
+
         return templates.TemplateResponse("dashboard/tenants/list.html", {
             "request": request,
-            "tenants": tenants,
+            "tenants": page.items,
+            "page": page,
             "username": username
         })
     except Exception as e:
@@ -61,18 +71,13 @@ async def add_tenant(
 ):
     """إضافة مستأجر جديد"""
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("""
+        await execute("""
             INSERT INTO tenants (name, phone, email, national_id, address, notes, created_at)
-            VALUES (?, ?, ?, ?, ?, ?, datetime('now'))
+            VALUES (%s, %s, %s, %s, %s, %s, CURRENT_TIMESTAMP)
         """, (name, phone, email, national_id, address, notes))
-        
-        conn.commit()
-        cursor.close()
-        conn.close()
-        
+        # إزالة أي نتيجة سلبية مخزنة لهذا الرقم
+        tenant_index.invalidate(phone)
+
         return RedirectResponse(url="/dashboard/tenants", status_code=303)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"خطأ في إضافة المستأجر: {str(e)}")
@@ -81,42 +86,17 @@ async def add_tenant(
 async def view_tenant(tenant_id: int, request: Request, username: str = Depends(verify_credentials)):
     """عرض تفاصيل مستأجر"""
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT * FROM tenants WHERE id = ?", (tenant_id,))
-        tenant = cursor.fetchone()
-        
-        if not tenant:
+        # المستأجر وعقوده وآخر مدفوعاته في استعلام واحد
+        detail = await run_db(load_tenant_detail, tenant_id)
+
+        if not detail:
             raise HTTPException(status_code=404, detail="المستأجر غير موجود")
-        
-        # جلب العقود
-        cursor.execute("""
-            SELECT c.*, p.name as property_name
-            FROM contracts c
-            LEFT JOIN properties p ON c.property_id = p.id
-            WHERE c.tenant_id = ?
-            ORDER BY c.start_date DESC
-        """, (tenant_id,))
-        contracts = cursor.fetchall()
-        
-        # جلب المدفوعات
-        cursor.execute("""
-            SELECT * FROM payments 
-            WHERE tenant_id = ?
-            ORDER BY payment_date DESC
-            LIMIT 10
-        """, (tenant_id,))
-        payments = cursor.fetchall()
-        
-        cursor.close()
-        conn.close()
-        
+
         return templates.TemplateResponse("dashboard/tenants/view.html", {
             "request": request,
-            "tenant": tenant,
-            "contracts": contracts,
-            "payments": payments,
+            "tenant": detail.tenant,
+            "contracts": detail.contracts,
+            "payments": detail.payments,
             "username": username
         })
     except Exception as e:
@@ -126,15 +106,9 @@ async def view_tenant(tenant_id: int, request: Request, username: str = Depends(
 async def delete_tenant(tenant_id: int, username: str = Depends(verify_credentials)):
     """حذف مستأجر"""
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("DELETE FROM tenants WHERE id = ?", (tenant_id,))
-        conn.commit()
-        
-        cursor.close()
-        conn.close()
-        
+        await execute("DELETE FROM tenants WHERE id = %s", (tenant_id,))
+        tenant_index.invalidate_where(lambda tenant: tenant["id"] == tenant_id)
+
         return RedirectResponse(url="/dashboard/tenants", status_code=303)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"خطأ في حذف المستأجر: {str(e)}")
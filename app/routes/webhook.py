@@ -1,20 +1,42 @@
 from fastapi import APIRouter, Request
+from fastapi.responses import JSONResponse
 from typing import Dict, Any
+import json
+from app.services.webhook_ingest import ingestor, verify_signature, is_valid_payload
 
 router = APIRouter()
 
 @router.post("/webhook")
 async def handle_webhook(request: Request):
-    """معالجة Webhook من WhatsApp"""
+    """
+    استقبال Webhook من WhatsApp: تحقق سريع ثم وضع الحمولة في الطابور والرد فوراً
+    المعالجة الفعلية في app/services/webhook_ingest.py
+    """
+    raw = await request.body()
+    if not verify_signature(raw, request.headers.get("X-Hub-Signature-256")):
+        return JSONResponse(status_code=403, content={"status": "error", "message": "Invalid signature"})
+
     try:
-        body = await request.json()
-        # TODO: إضافة منطق معالجة الـ webhook
-        return {
-            "status": "success",
-            "message": "Webhook received"
-        }
-    except Exception as e:
-        return {"status": "error", "message": str(e)}
+        body = json.loads(raw)
+    except ValueError:
+        return JSONResponse(status_code=400, content={"status": "error", "message": "Invalid JSON"})
+
+    if not is_valid_payload(body):
+        return JSONResponse(status_code=400, content={"status": "error", "message": "Unsupported payload"})
+
+    # عند امتلاء الطابور نرد بـ 503 لتعيد Meta الإرسال لاحقاً بدلاً من فقدان الرسائل
+    if not ingestor.submit(body):
+        return JSONResponse(status_code=503, content={"status": "error", "message": "Busy"})
+
+    return {
+        "status": "success",
+        "message": "Webhook received"
+    }
+
+@router.get("/webhook/stats")
+async def webhook_stats():
+    """إحصائيات طابور الـ webhook"""
+    return {"status": "success", "data": ingestor.snapshot()}
 
 @router.get("/webhook")
 async def verify_webhook(request: Request):
@@ -0,0 +1,125 @@
+"""
+مهمة التحليلات الدورية: الإشغال لكل مالك ومخاطر المغادرة لكل مستأجر
+=====================================================================
+بدلاً من تحميل كل عقارات المالك (أو كل أحداث المستخدم) إلى DataFrame لكل
+مالك على حدة كما في services/analytics_manager، يحسب استعلام مجمّع واحد
+(GROUP BY) القيمة لكل الملاك/المستأجرين ويكتبها مباشرة بـ INSERT ... SELECT:
+لا تنتقل صفوف البيانات الخام إلى بايثون ولا يوجد استعلام لكل مالك.
+
+- aggregated_metrics: صف occupancy_rate لكل مالك (النسبة المئوية للعقارات المشغولة)
+- user_insights: صف churn_prediction لكل مستأجر له أحداث
+  (نسبة أحداث payment_overdue إلى كل أحداثه خلال آخر CHURN_WINDOW_DAYS يوماً، نفس
+  تعريف services/analytics_manager.generate_user_insights ونافذته؛ window_days في data_source)
+"""
+
+import os
+import logging
+from datetime import datetime
+
+from psycopg2.extras import Json
+
+from app.services.stats_service import OCCUPIED_STATUSES
+
+logger = logging.getLogger(__name__)
+
+CHURN_EVENT_TYPE = "payment_overdue"
+# analytics_events مقسم شهرياً: نافذة زمنية تقصر المسح على الأشهر الحديثة
+CHURN_WINDOW_DAYS = int(os.getenv("CHURN_WINDOW_DAYS", "180"))
+
+OCCUPANCY_SQL = '''
+    INSERT INTO aggregated_metrics (metric_type, period, value, details, owner_id)
+    SELECT 'occupancy_rate', %(period)s, s.rate,
+           jsonb_build_object(
+               'occupancy_rate', s.rate,
+               'properties', s.total,
+               'occupied', s.occupied,
+               'generated_at', %(generated_at)s
+           ),
+           s.owner_id
+    FROM (
+        SELECT owner_id,
+               COUNT(*) AS total,
+               COUNT(*) FILTER (WHERE status = ANY(%(occupied)s)) AS occupied,
+               ROUND(100.0 * COUNT(*) FILTER (WHERE status = ANY(%(occupied)s)) / COUNT(*), 2) AS rate
+        FROM properties
+        WHERE %(owner_ids)s::int[] IS NULL OR owner_id = ANY(%(owner_ids)s::int[])
+        GROUP BY owner_id
+    ) s
+'''
+
+CHURN_SQL = '''
+    INSERT INTO user_insights (user_id, insight_type, score, description, data_source)
+    SELECT s.user_id, 'churn_prediction', s.score,
+           format('Churn risk: %%s%%%% based on %%s events', to_char(s.score * 100, 'FM990.00'), s.events),
+           jsonb_build_object('events', s.events, 'overdue_events', s.overdue,
+                              'window_days', %(window_days)s, 'generated_at', %(generated_at)s)
+    FROM (
+        SELECT user_id,
+               COUNT(*) AS events,
+               COUNT(*) FILTER (WHERE event_type = %(event_type)s) AS overdue,
+               ROUND(COUNT(*) FILTER (WHERE event_type = %(event_type)s)::NUMERIC / COUNT(*), 4) AS score
+        FROM analytics_events
+        WHERE user_id IS NOT NULL
+          AND timestamp >= NOW() - make_interval(days => %(window_days)s)
+          AND (%(user_ids)s::int[] IS NULL OR user_id = ANY(%(user_ids)s::int[]))
+        GROUP BY user_id
+    ) s
+'''
+
+
+def compute_occupancy_metrics(conn, period="monthly", owner_ids=None, generated_at=None) -> int:
+    """كتابة نسبة الإشغال لكل المالكين (أو المحددين) في استعلام واحد؛ يعيد عدد الصفوف"""
+    cursor = conn.cursor()
+    try:
+        cursor.execute(OCCUPANCY_SQL, {
+            "period": period,
+            "occupied": list(OCCUPIED_STATUSES),
+            "owner_ids": list(owner_ids) if owner_ids is not None else None,
+            "generated_at": (generated_at or datetime.now()).isoformat(),
+        })
+        return cursor.rowcount
+    finally:
+        cursor.close()
+
+
+def compute_churn_insights(conn, user_ids=None, generated_at=None, window_days=CHURN_WINDOW_DAYS) -> int:
+    """كتابة مخاطر المغادرة لكل مستأجر له أحداث في استعلام واحد؛ يعيد عدد الصفوف"""
+    cursor = conn.cursor()
+    try:
+        cursor.execute(CHURN_SQL, {
+            "event_type": CHURN_EVENT_TYPE,
+            "window_days": window_days,
+            "user_ids": list(user_ids) if user_ids is not None else None,
+            "generated_at": (generated_at or datetime.now()).isoformat(),
+        })
+        return cursor.rowcount
+    finally:
+        cursor.close()
+
+
+def run_analytics_batch(conn, period="monthly") -> dict:
+    """المهمة الكاملة في معاملة واحدة مع سطر ملخص في ai_agent_logs"""
+    generated_at = datetime.now()
+    try:
+        owners = compute_occupancy_metrics(conn, period, generated_at=generated_at)
+        tenants = compute_churn_insights(conn, generated_at=generated_at)
+        summary = {
+            "period": period,
+            "owners": owners,
+            "tenants": tenants,
+            "generated_at": generated_at.isoformat(),
+            "elapsed_ms": round((datetime.now() - generated_at).total_seconds() * 1000, 1),
+        }
+        cursor = conn.cursor()
+        cursor.execute(
+            "INSERT INTO ai_agent_logs (event_type, details, severity) VALUES ('analytics_batch', %s, 'low')",
+            (Json(summary),)
+        )
+        cursor.close()
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    logger.info(f"📊 التحليلات: إشغال {owners} مالك، مخاطر مغادرة {tenants} مستأجر")
+    return summary
@@ -0,0 +1,341 @@
+"""
+استيراد العقود جماعياً (CSV / JSON / واجهة Python)
+
+- الصفوف تُقرأ وتُتحقق منها كتدفق (بدون تحميل الملف كاملاً في الذاكرة)؛
+  عدا مصفوفة JSON التي تُقرأ كاملة بحد IMPORT_JSON_ARRAY_MAX_BYTES
+- أرقام العقود المكررة داخل الملف تُكتشف في الذاكرة، والموجودة مسبقاً باستعلام واحد لكل دفعة
+- كل دفعة (chunk) في معاملة واحدة: العقود بجملة INSERT متعددة الصفوف،
+  ثم التذكيرات (backfill_contract_reminders) وجداول الدفعات (create_payment_schedules)
+- خطأ في صف لا يوقف الاستيراد: إذا فشلت الدفعة تُعاد صفاً صفاً مع SAVEPOINT
+  ويُسجل الخطأ لذلك الصف فقط
+"""
+
+import io
+import os
+import csv
+import json
+import time
+import logging
+from itertools import chain
+from dataclasses import dataclass, field
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from typing import List
+
+import psycopg2
+from psycopg2.extras import execute_values
+
+from app.services.payment_schedule import create_payment_schedules, FREQUENCY_MONTHS
+from app.services.phone_index import contract_phone_index
+from app.services.reminder_scheduler import backfill_contract_reminders
+
+logger = logging.getLogger(__name__)
+
+IMPORT_CHUNK_SIZE = 500
+# مصفوفة JSON تُقرأ كاملة في الذاكرة (NDJSON وحده تدفقي)، فحجمها محدود
+IMPORT_JSON_ARRAY_MAX_BYTES = int(os.getenv("IMPORT_JSON_ARRAY_MAX_BYTES", str(20 * 1024 * 1024)))
+
+CONTRACT_COLUMNS = [
+    'contract_number', 'property_id', 'tenant_id', 'owner_id', 'tenant_name',
+    'tenant_phone', 'property_address', 'contract_type', 'start_date', 'end_date',
+    'monthly_rent', 'total_amount', 'deposit_amount', 'commission_rate', 'payment_frequency',
+    'currency', 'terms_conditions', 'special_conditions', 'created_by', 'notes',
+]
+
+DEFAULTS = {
+    'tenant_name': '',
+    'tenant_phone': '',
+    'property_address': '',
+    'contract_type': 'rental',
+    'monthly_rent': Decimal('0'),
+    'total_amount': Decimal('0'),
+    'deposit_amount': Decimal('0'),
+    'commission_rate': Decimal('5.0'),
+    'payment_frequency': 'monthly',
+    'currency': 'OMR',
+    'terms_conditions': '',
+    'special_conditions': '',
+    'created_by': 'Import',
+    'notes': '',
+}
+
+INT_FIELDS = ('property_id', 'tenant_id', 'owner_id', 'payment_day')
+DECIMAL_FIELDS = ('monthly_rent', 'total_amount', 'deposit_amount', 'commission_rate')
+
+
+@dataclass
+class ImportReport:
+    total: int = 0
+    inserted: int = 0
+    duplicates: int = 0
+    failed: int = 0
+    chunks: int = 0
+    payments: int = 0
+    reminders: int = 0
+    elapsed: float = 0.0
+    errors: List[dict] = field(default_factory=list)
+    contract_ids: List[int] = field(default_factory=list)
+
+    def add_error(self, row_number, contract_number, message, duplicate=False):
+        if duplicate:
+            self.duplicates += 1
+        else:
+            self.failed += 1
+        self.errors.append({"row": row_number, "contract_number": contract_number, "error": message})
+
+    def to_dict(self):
+        return {
+            "total": self.total,
+            "inserted": self.inserted,
+            "duplicates": self.duplicates,
+            "failed": self.failed,
+            "chunks": self.chunks,
+            "payments": self.payments,
+            "reminders": self.reminders,
+            "elapsed_seconds": round(self.elapsed, 3),
+            "errors": self.errors,
+        }
+
+
+# ---------- القراءة ----------
+
+@dataclass
+class RowError:
+    """صف تعذرت قراءته (مثل سطر NDJSON تالف)؛ يُسجل كخطأ لصفه دون إيقاف الاستيراد"""
+    message: str
+
+
+def iter_csv_rows(stream):
+    """صفوف CSV كقواميس؛ stream نصي أو ثنائي (يُفك بـ utf-8-sig لدعم ملفات Excel)"""
+    if not isinstance(stream, io.TextIOBase):
+        stream = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    for row in csv.DictReader(stream):
+        yield {key.strip(): value for key, value in row.items() if key}
+
+
+def iter_json_rows(stream, max_array_bytes=IMPORT_JSON_ARRAY_MAX_BYTES):
+    """
+    NDJSON (كائن في كل سطر) يُقرأ تدفقياً وكل سطر تالف يصبح RowError لصفه.
+    مصفوفة JSON تُقرأ كاملة في الذاكرة، لذا تُرفض إذا تجاوزت max_array_bytes
+    (ValueError قبل كتابة أي دفعة)؛ للملفات الكبيرة استخدم NDJSON أو CSV
+    """
+    if not isinstance(stream, io.TextIOBase):
+        stream = io.TextIOWrapper(stream, encoding='utf-8-sig')
+    first = stream.read(1)
+    while first and first.isspace():
+        first = stream.read(1)
+    if first == '[':
+        body = stream.read(max_array_bytes)
+        if stream.read(1):
+            raise ValueError(f"مصفوفة JSON أكبر من {max_array_bytes} بايت، استخدم NDJSON أو CSV")
+        yield from json.loads(first + body)
+        return
+    for line in chain([first + stream.readline()], stream):
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except ValueError as e:
+                yield RowError(f"سطر JSON غير صالح: {e}")
+
+
+# ---------- التحقق ----------
+
+def _parse_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    return datetime.strptime(str(value).strip()[:10], '%Y-%m-%d').date()
+
+
+def validate_row(raw):
+    """تحويل صف خام إلى بيانات عقد جاهزة: (contract_data, errors)"""
+    errors = []
+    data = dict(DEFAULTS)
+    for key, value in raw.items():
+        if value is None or (isinstance(value, str) and not value.strip()):
+            continue
+        data[key] = value.strip() if isinstance(value, str) else value
+
+    for key in ('contract_number', 'start_date', 'end_date'):
+        if not data.get(key):
+            errors.append(f"الحقل {key} مطلوب")
+    if errors:
+        return None, errors
+
+    data['contract_number'] = str(data['contract_number'])
+    try:
+        data['start_date'] = _parse_date(data['start_date'])
+        data['end_date'] = _parse_date(data['end_date'])
+        if data['end_date'] <= data['start_date']:
+            errors.append("تاريخ الانتهاء يجب أن يكون بعد تاريخ البداية")
+    except ValueError:
+        errors.append("صيغة التاريخ يجب أن تكون YYYY-MM-DD")
+
+    for key in DECIMAL_FIELDS:
+        try:
+            data[key] = Decimal(str(data[key]))
+            if data[key] < 0:
+                errors.append(f"الحقل {key} لا يقبل قيمة سالبة")
+        except (InvalidOperation, ValueError):
+            errors.append(f"الحقل {key} يجب أن يكون رقماً")
+
+    for key in INT_FIELDS:
+        if data.get(key) is None:
+            continue
+        try:
+            data[key] = int(data[key])
+        except (TypeError, ValueError):
+            errors.append(f"الحقل {key} يجب أن يكون عدداً صحيحاً")
+
+    if isinstance(data.get('payment_day'), int) and not 1 <= data['payment_day'] <= 31:
+        errors.append("payment_day يجب أن يكون بين 1 و 31")
+    frequency = str(data['payment_frequency']).strip().lower()
+    if frequency not in FREQUENCY_MONTHS and not frequency.isdigit():
+        errors.append(f"تكرار الدفع غير معروف: {data['payment_frequency']}")
+    data['payment_frequency'] = frequency
+
+    if errors:
+        return None, errors
+    return data, []
+
+
+# ---------- الكتابة ----------
+
+def _existing_numbers(cursor, numbers):
+    cursor.execute("SELECT contract_number FROM contracts WHERE contract_number = ANY(%s)", (numbers,))
+    return {row[0] for row in cursor.fetchall()}
+
+
+def _insert_contracts(cursor, items):
+    """INSERT متعدد الصفوف؛ يعيد {contract_number: id} للصفوف المضافة فعلاً"""
+    rows = [tuple(data.get(column) for column in CONTRACT_COLUMNS) for _, data in items]
+    inserted = execute_values(cursor, f'''
+        INSERT INTO contracts ({", ".join(CONTRACT_COLUMNS)})
+        VALUES %s
+        ON CONFLICT (contract_number) DO NOTHING
+        RETURNING contract_number, id
+    ''', rows, page_size=len(rows) or 1, fetch=True)
+    return dict(inserted)
+
+
+def _insert_dependents(cursor, conn, items, ids):
+    """
+    التذكيرات وجداول الدفعات لعقود الدفعة بجملتين؛ يعيد (reminders, payments)
+    ولا يعدّل التقرير: العدد يُحتسب فقط بعد نجاح COMMIT أو RELEASE SAVEPOINT
+    """
+    new_ids = list(ids.values())
+    reminders = backfill_contract_reminders(conn, contract_ids=new_ids, commit=False)
+    payments = create_payment_schedules(cursor, [
+        (ids[data['contract_number']], data)
+        for _, data in items
+        if data['contract_number'] in ids and data['contract_type'] == 'rental' and data['monthly_rent']
+    ])
+    return reminders, payments
+
+
+def _write_chunk(conn, items, report):
+    """
+    كتابة دفعة في معاملة واحدة؛ items = [(row_number, contract_data)]
+    عند فشل الدفعة تُعاد الصفوف فردياً حتى يُنسب الخطأ لصفه
+    """
+    cursor = conn.cursor()
+    try:
+        existing = _existing_numbers(cursor, [data['contract_number'] for _, data in items])
+        fresh = []
+        for row_number, data in items:
+            if data['contract_number'] in existing:
+                report.add_error(row_number, data['contract_number'], "رقم العقد موجود مسبقاً", duplicate=True)
+            else:
+                fresh.append((row_number, data))
+        if not fresh:
+            conn.commit()
+            return
+
+        failed_rows = set()
+        try:
+            ids = _insert_contracts(cursor, fresh)
+            reminders, payments = _insert_dependents(cursor, conn, fresh, ids)
+            conn.commit()
+            report.reminders += reminders
+            report.payments += payments
+        except psycopg2.Error as e:
+            conn.rollback()
+            logger.warning(f"⚠️ فشل إدراج الدفعة كاملة ({e.__class__.__name__})، إعادة المحاولة صفاً صفاً")
+            ids, failed_rows = _write_rows_individually(conn, cursor, fresh, report)
+
+        for row_number, data in fresh:
+            if data['contract_number'] not in ids and row_number not in failed_rows:
+                # أُضيف بالتوازي من عملية أخرى بعد فحص الموجود
+                report.add_error(row_number, data['contract_number'], "رقم العقد موجود مسبقاً", duplicate=True)
+        report.inserted += len(ids)
+        report.contract_ids.extend(ids.values())
+        for _, data in fresh:
+            if data['contract_number'] in ids:
+                contract_phone_index.invalidate(data.get('tenant_phone'))
+    finally:
+        cursor.close()
+
+
+def _write_rows_individually(conn, cursor, items, report):
+    ids = {}
+    failed_rows = set()
+    reminders = payments = 0
+    for row_number, data in items:
+        cursor.execute("SAVEPOINT import_row")
+        try:
+            row_ids = _insert_contracts(cursor, [(row_number, data)])
+            row_reminders, row_payments = _insert_dependents(cursor, conn, [(row_number, data)], row_ids)
+            cursor.execute("RELEASE SAVEPOINT import_row")
+            ids.update(row_ids)
+            reminders += row_reminders
+            payments += row_payments
+        except psycopg2.Error as e:
+            cursor.execute("ROLLBACK TO SAVEPOINT import_row")
+            report.add_error(row_number, data['contract_number'], str(e).strip())
+            failed_rows.add(row_number)
+    conn.commit()
+    report.reminders += reminders
+    report.payments += payments
+    return ids, failed_rows
+
+
+def import_contracts(conn, rows, chunk_size=IMPORT_CHUNK_SIZE):
+    """
+    استيراد تدفقي: rows أي iterable من القواميس (iter_csv_rows / iter_json_rows / قائمة)
+    يعيد ImportReport بأخطاء كل صف دون إيقاف الدفعة كاملة
+    """
+    report = ImportReport()
+    started = time.monotonic()
+    seen = set()
+    chunk = []
+
+    for row_number, raw in enumerate(rows, start=1):
+        report.total += 1
+        if isinstance(raw, RowError):
+            report.add_error(row_number, None, raw.message)
+            continue
+        if not isinstance(raw, dict):
+            report.add_error(row_number, None, "الصف يجب أن يكون كائناً")
+            continue
+        data, errors = validate_row(raw)
+        if errors:
+            report.add_error(row_number, raw.get('contract_number'), "؛ ".join(errors))
+            continue
+        if data['contract_number'] in seen:
+            report.add_error(row_number, data['contract_number'], "رقم العقد مكرر في الملف", duplicate=True)
+            continue
+        seen.add(data['contract_number'])
+        chunk.append((row_number, data))
+
+        if len(chunk) >= chunk_size:
+            _write_chunk(conn, chunk, report)
+            report.chunks += 1
+            chunk = []
+
+    if chunk:
+        _write_chunk(conn, chunk, report)
+        report.chunks += 1
+
+    report.elapsed = time.monotonic() - started
+    logger.info(f"📥 استيراد العقود: {report.inserted}/{report.total} مضاف، "
+                f"{report.duplicates} مكرر، {report.failed} خطأ في {report.elapsed:.2f} ث")
+    return report
@@ -0,0 +1,353 @@
+"""
+تصدير المدفوعات والعقود والمستأجرين (CSV / NDJSON / XLSX) بالتدفق
+================================================================
+الصفوف تُقرأ من مؤشر على الخادم (named cursor) بدفعات EXPORT_FETCH_SIZE
+وتُكتب مباشرة إلى أجزاء الاستجابة، فلا تُحمَّل النتيجة كاملة في الذاكرة:
+استهلاك الذاكرة ثابت مهما كان عدد السنوات أو الصفوف.
+
+- CSV: بعلامة BOM ليفتحه Excel بالعربية صحيحاً
+- NDJSON: سطر JSON لكل صف
+- XLSX: ملف ZIP يُكتب بالتدفق (SpreadsheetML بنصوص مضمنة، دون مكتبة خارجية)
+
+الفلاتر: نطاق تاريخ (date_from/date_to) والمالك (owner_id = العميل مالك العقار).
+
+كل تصدير يستخدم اتصالاً مخصصاً خارج المجمع المشترك (العميل البطيء يحجزه طوال
+التنزيل)، وعدد التصديرات المتزامنة محدود بـ EXPORT_MAX_CONCURRENT؛ الزائد يُرفض
+بـ ExportBusy (429). statement_timeout و idle_in_transaction_session_timeout على
+الاتصال يُنهيان الاستعلام إذا طال أو توقف العميل عن القراءة.
+"""
+
+import csv
+import io
+import json
+import os
+import re
+import threading
+import uuid
+import weakref
+import zipfile
+from dataclasses import dataclass
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Iterable, Iterator, List, Optional, Tuple
+from xml.sax.saxutils import escape
+
+from app.db.database import create_connection
+
+EXPORT_FETCH_SIZE = 2000
+EXPORT_MAX_CONCURRENT = int(os.getenv("EXPORT_MAX_CONCURRENT", "3"))
+EXPORT_STATEMENT_TIMEOUT_MS = int(os.getenv("EXPORT_STATEMENT_TIMEOUT_MS", "120000"))
+EXPORT_IDLE_TIMEOUT_MS = int(os.getenv("EXPORT_IDLE_TIMEOUT_MS", "60000"))
+# حجم الجزء المرسل للعميل تقريباً
+EXPORT_CHUNK_BYTES = 64 * 1024
+
+EXPORT_FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+
+@dataclass
+class ExportSpec:
+    name: str
+    sql: str
+    columns: List[str]
+    # شرط نطاق التاريخ: معاملان (من، إلى)
+    date_from_condition: str
+    date_to_condition: str
+    owner_condition: str
+    order_by: str
+
+
+EXPORTS = {
+    "payments": ExportSpec(
+        name="payments",
+        sql='''
+            SELECT p.id, p.payment_date, p.amount, p.payment_method, p.status,
+                   t.name, t.phone, pr.name, pr.client_id
+            FROM payments p
+            LEFT JOIN tenants t ON p.tenant_id = t.id
+            LEFT JOIN properties pr ON p.property_id = pr.id
+        ''',
+        columns=["id", "payment_date", "amount", "payment_method", "status",
+                 "tenant_name", "tenant_phone", "property_name", "owner_id"],
+        date_from_condition="p.payment_date >= %s",
+        date_to_condition="p.payment_date <= %s",
+        owner_condition="pr.client_id = %s",
+        order_by="p.payment_date, p.id",
+    ),
+    "contracts": ExportSpec(
+        name="contracts",
+        sql='''
+            SELECT c.id, c.start_date, c.end_date, c.rent_amount, c.status,
+                   t.name, t.phone, pr.name, pr.client_id
+            FROM contracts c
+            LEFT JOIN tenants t ON c.tenant_id = t.id
+            LEFT JOIN properties pr ON c.property_id = pr.id
+        ''',
+        columns=["id", "start_date", "end_date", "rent_amount", "status",
+                 "tenant_name", "tenant_phone", "property_name", "owner_id"],
+        # العقود المتداخلة مع النطاق
+        date_from_condition="c.end_date >= %s",
+        date_to_condition="c.start_date <= %s",
+        owner_condition="pr.client_id = %s",
+        order_by="c.start_date, c.id",
+    ),
+    "tenants": ExportSpec(
+        name="tenants",
+        sql='''
+            SELECT t.id, t.name, t.phone, t.email, t.national_id, t.created_at
+            FROM tenants t
+        ''',
+        columns=["id", "name", "phone", "email", "national_id", "created_at"],
+        date_from_condition="t.created_at >= %s",
+        date_to_condition="t.created_at < %s::date + 1",
+        owner_condition='''EXISTS (
+            SELECT 1 FROM contracts c
+            JOIN properties pr ON c.property_id = pr.id
+            WHERE c.tenant_id = t.id AND pr.client_id = %s
+        )''',
+        order_by="t.id",
+    ),
+}
+
+
+def build_export_query(spec: ExportSpec, date_from=None, date_to=None, owner_id=None) -> Tuple[str, list]:
+    conditions, params = [], []
+    if date_from:
+        conditions.append(spec.date_from_condition)
+        params.append(date_from)
+    if date_to:
+        conditions.append(spec.date_to_condition)
+        params.append(date_to)
+    if owner_id is not None:
+        conditions.append(spec.owner_condition)
+        params.append(owner_id)
+
+    sql = spec.sql
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    sql += f" ORDER BY {spec.order_by}"
+    return sql, params
+
+
+class ExportBusy(RuntimeError):
+    """بلغ عدد التصديرات الجارية EXPORT_MAX_CONCURRENT"""
+
+
+_export_slots = threading.BoundedSemaphore(EXPORT_MAX_CONCURRENT)
+
+
+def _acquire_slot():
+    """حجز مكان تصدير؛ يعيد دالة تحرير آمنة للاستدعاء أكثر من مرة"""
+    if not _export_slots.acquire(blocking=False):
+        raise ExportBusy(f"يوجد {EXPORT_MAX_CONCURRENT} تصدير جارٍ، حاول لاحقاً")
+    lock = threading.Lock()
+    held = [True]
+
+    def release():
+        with lock:
+            if held[0]:
+                held[0] = False
+                _export_slots.release()
+    return release
+
+
+def stream_rows(sql, params, fetch_size=EXPORT_FETCH_SIZE, release=None) -> Iterator[tuple]:
+    """الصفوف من مؤشر على الخادم عبر اتصال مخصص يُغلق عند انتهاء التدفق أو إغلاق المولد"""
+    try:
+        conn = create_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SET statement_timeout = %s", (EXPORT_STATEMENT_TIMEOUT_MS,))
+            cursor.execute("SET idle_in_transaction_session_timeout = %s", (EXPORT_IDLE_TIMEOUT_MS,))
+            cursor.close()
+
+            cursor = conn.cursor(name=f"export_{uuid.uuid4().hex[:12]}")
+            cursor.itersize = fetch_size
+            try:
+                cursor.execute(sql, params)
+                for row in cursor:
+                    yield row
+            finally:
+                cursor.close()
+        finally:
+            conn.close()
+    finally:
+        if release is not None:
+            release()
+
+
+# ---------- الكتّاب ----------
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return str(value)
+
+
+def _cell_text(value):
+    if value is None:
+        return ""
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return str(value)
+
+
+def _buffered(pieces: Iterable[bytes], chunk_bytes=EXPORT_CHUNK_BYTES) -> Iterator[bytes]:
+    """تجميع القطع الصغيرة في أجزاء بحجم معقول قبل إرسالها"""
+    buffer, size = [], 0
+    for piece in pieces:
+        buffer.append(piece)
+        size += len(piece)
+        if size >= chunk_bytes:
+            yield b"".join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield b"".join(buffer)
+
+
+def write_csv(columns, rows) -> Iterator[bytes]:
+    def pieces():
+        out = io.StringIO()
+        writer = csv.writer(out)
+        out.write("\ufeff")
+        writer.writerow(columns)
+        for row in rows:
+            writer.writerow([_cell_text(value) for value in row])
+            if out.tell() >= EXPORT_CHUNK_BYTES:
+                yield out.getvalue().encode("utf-8")
+                out.seek(0)
+                out.truncate()
+        yield out.getvalue().encode("utf-8")
+    return _buffered(pieces())
+
+
+def write_ndjson(columns, rows) -> Iterator[bytes]:
+    return _buffered(
+        (json.dumps(dict(zip(columns, row)), ensure_ascii=False, default=_json_default) + "\n").encode("utf-8")
+        for row in rows
+    )
+
+
+class _ChunkSink(io.RawIOBase):
+    """هدف كتابة غير قابل للتنقل: zipfile يكتب إليه ونفرغه بعد كل دفعة"""
+
+    def __init__(self):
+        self._chunks = []
+        self.pending = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self.pending += len(data)
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        self.pending = 0
+        return data
+
+
+_XLSX_STATIC = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    "xl/_rels/workbook.xml.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+
+_XML_ILLEGAL = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+def _xlsx_cell(value):
+    if value is None:
+        return "<c/>"
+    if isinstance(value, (int, float, Decimal)) and not isinstance(value, bool):
+        return f"<c><v>{value}</v></c>"
+    text = escape(_XML_ILLEGAL.sub("", _cell_text(value)))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def _xlsx_row(values):
+    return ("<row>" + "".join(_xlsx_cell(value) for value in values) + "</row>").encode("utf-8")
+
+
+def write_xlsx(columns, rows, sheet_name="export") -> Iterator[bytes]:
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for path, content in _XLSX_STATIC.items():
+            archive.writestr(path, content)
+        archive.writestr("xl/workbook.xml", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+            f'<sheets><sheet name="{escape(sheet_name)}" sheetId="1" r:id="rId1"/></sheets>'
+            '</workbook>'
+        ))
+        yield sink.drain()
+
+        with archive.open("xl/worksheets/sheet1.xml", "w", force_zip64=True) as sheet:
+            sheet.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                b'<sheetViews><sheetView workbookViewId="0" rightToLeft="1"/></sheetViews>'
+                b'<sheetData>'
+            )
+            sheet.write(_xlsx_row(columns))
+            for row in rows:
+                sheet.write(_xlsx_row(row))
+                # المضغوط يتراكم في sink ويُرسل عند تجاوز حجم الجزء
+                if sink.pending >= EXPORT_CHUNK_BYTES:
+                    yield sink.drain()
+            sheet.write(b"</sheetData></worksheet>")
+    yield sink.drain()
+
+
+WRITERS = {"csv": write_csv, "ndjson": write_ndjson, "xlsx": write_xlsx}
+
+
+def export_stream(dataset, fmt, date_from=None, date_to=None, owner_id: Optional[int] = None,
+                  fetch_size=EXPORT_FETCH_SIZE) -> Iterator[bytes]:
+    """أجزاء الملف المصدّر؛ ValueError لنوع بيانات أو صيغة غير معروفة"""
+    spec = EXPORTS.get(dataset)
+    if spec is None:
+        raise ValueError(f"نوع تصدير غير معروف: {dataset}")
+    writer = WRITERS.get(fmt)
+    if writer is None:
+        raise ValueError(f"صيغة غير مدعومة: {fmt}")
+
+    sql, params = build_export_query(spec, date_from, date_to, owner_id)
+    release = _acquire_slot()
+    rows = stream_rows(sql, params, fetch_size, release)
+    # مولد لم يبدأ (انقطع العميل قبل أول جزء) لا ينفذ finally، فالتحرير أيضاً عند جمعه
+    weakref.finalize(rows, release)
+    return writer(spec.columns, rows)
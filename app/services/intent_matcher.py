@@ -0,0 +1,229 @@
+"""
+مطابقة النوايا بكلمات مفتاحية متعددة في مرور واحد (Aho-Corasick)
+
+بدلاً من اختبار كل كلمة مفتاحية على حدة (in / re.search لكل كلمة في كل رسالة)
+نبني آلة واحدة من كل جداول الكلمات (ar/en/hi) مرة واحدة، ثم نمرّ على نص
+الرسالة مرة واحدة ونحصل على كل النوايا المطابقة. عند تعدد النوايا تفوز
+الأعلى أولوية، ثم الأسبق ظهوراً في النص.
+
+التطبيع العربي (normalize_text):
+- إزالة التشكيل والتطويل
+- أ/إ/آ/ٱ ← ا ، ى ← ي ، ة ← ه ، ؤ ← و ، ئ ← ي
+يطبق على الكلمات عند البناء فقط. النص لا يُطبّع قبل البحث (كلفة التطبيع
+تعادل كلفة البحث نفسه)، بل تُبنى الآلة كـ DFA كامل تكون فيه أشكال الحرف
+الواحدة انتقالاً واحداً، ويُتخطى التشكيل أثناء المرور.
+
+حدود الكلمات: الكلمات العربية والهندية تطابق كجزء من كلمة (بالسداد، والصيانة)
+كما في السابق. الكلمات اللاتينية يجب أن تبدأ بداية كلمة (leak تطابق leaking)،
+والقصيرة منها (3 أحرف أو أقل مثل ac) يجب أن تكون كلمة كاملة حتى لا تطابق
+each أو account.
+"""
+
+import re
+from collections import deque
+from dataclasses import dataclass
+
+_DIACRITICS = re.compile(r"[\u064B-\u065F\u0670\u06D6-\u06ED\u0640]")
+_SKIP_CHARS = frozenset(
+    [chr(cp) for cp in range(0x064B, 0x0660)] + ["\u0670", "\u0640"]
+    + [chr(cp) for cp in range(0x06D6, 0x06EE)]
+)
+_FOLDS = {
+    "أ": "ا", "إ": "ا", "آ": "ا", "ٱ": "ا",
+    "ى": "ي", "ئ": "ي",
+    "ة": "ه",
+    "ؤ": "و",
+}
+_ARABIC_FOLD = str.maketrans(_FOLDS)
+
+# بدون حدود / بداية كلمة / كلمة كاملة
+BOUNDARY_NONE = 0
+BOUNDARY_PREFIX = 1
+BOUNDARY_WORD = 2
+
+
+def normalize_text(text):
+    """تطبيع النص للمطابقة: أحرف صغيرة، بدون تشكيل، مع توحيد أشكال الحروف العربية"""
+    if not text:
+        return ""
+    return _DIACRITICS.sub("", text.lower()).translate(_ARABIC_FOLD)
+
+
+def _default_boundary(keyword):
+    if not keyword.isascii():
+        return BOUNDARY_NONE
+    return BOUNDARY_WORD if len(keyword) <= 3 else BOUNDARY_PREFIX
+
+
+def _is_word_char(ch):
+    return ch.isalnum() or ch == "_"
+
+
+@dataclass(frozen=True)
+class IntentMatch:
+    intent: str
+    keyword: str
+    start: int
+    end: int
+    priority: int
+
+
+class IntentMatcher:
+    """آلة Aho-Corasick مبنية مرة واحدة من (كلمة، نية، أولوية)"""
+
+    def __init__(self, entries):
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+        self._patterns = []
+
+        for keyword, intent, priority in entries:
+            normalized = normalize_text(keyword)
+            if not normalized:
+                continue
+            self._add(normalized, intent, priority, _default_boundary(normalized))
+        self._build()
+
+    @classmethod
+    def from_table(cls, table, priorities=None):
+        """
+        البناء من جدول {نية: {لغة: [كلمات]}} أو {نية: [كلمات]}
+        priorities: {نية: أولوية}؛ بدونها تكون الأولوية حسب ترتيب الجدول (الأول أعلى)
+        """
+        entries = []
+        intents = list(table)
+        for index, intent in enumerate(intents):
+            priority = priorities.get(intent, 0) if priorities else len(intents) - index
+            keywords = table[intent]
+            if isinstance(keywords, dict):
+                keywords = [kw for words in keywords.values() for kw in words]
+            entries.extend((kw, intent, priority) for kw in keywords)
+        return cls(entries)
+
+    @classmethod
+    def from_keyword_map(cls, keyword_map, priorities=None):
+        """البناء من قاموس مسطح {كلمة: نية} مثل KEYWORDS_MAP"""
+        table = {}
+        for keyword, intent in keyword_map.items():
+            table.setdefault(intent, []).append(keyword)
+        return cls.from_table(table, priorities)
+
+    def _add(self, keyword, intent, priority, boundary):
+        node = 0
+        for ch in keyword:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            node = nxt
+        self._output[node].append(len(self._patterns))
+        self._patterns.append((keyword, intent, priority, boundary))
+
+    def _build(self):
+        """حساب روابط الفشل (BFS) ثم تحويل الآلة إلى DFA كامل"""
+        order = []
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            order.append(node)
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(ch, 0)
+                self._fail[child] = target if target != child else 0
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+        # كل عقدة ترث انتقالات عقدة الفشل فلا حاجة لتتبع روابط الفشل أثناء البحث
+        delta = [None] * len(self._goto)
+        delta[0] = dict(self._goto[0])
+        for node in order:
+            transitions = dict(delta[self._fail[node]])
+            transitions.update(self._goto[node])
+            delta[node] = transitions
+        # أشكال الحرف الواحد (أ/إ/آ ← ا ...) تنتقل لنفس العقدة
+        for transitions in delta:
+            for variant, base in _FOLDS.items():
+                if base in transitions:
+                    transitions[variant] = transitions[base]
+        self._delta = delta
+        self._out = [tuple(out) if out else None for out in self._output]
+
+    def _accept(self, text, start, end, boundary):
+        if boundary == BOUNDARY_NONE:
+            return True
+        if start > 0 and _is_word_char(text[start - 1]):
+            return False
+        if boundary == BOUNDARY_WORD and end < len(text) and _is_word_char(text[end]):
+            return False
+        return True
+
+    def find_all(self, text):
+        """كل المطابقات في مرور واحد على النص"""
+        if not text:
+            return []
+        text = text.lower()
+        delta, out, patterns, skip = self._delta, self._out, self._patterns, _SKIP_CHARS
+        matches = []
+        node = 0
+        for i, ch in enumerate(text):
+            if ch in skip:
+                continue
+            node = delta[node].get(ch, 0)
+            if out[node] is None:
+                continue
+            for index in out[node]:
+                keyword, intent, priority, boundary = patterns[index]
+                start = i - len(keyword) + 1
+                if boundary == BOUNDARY_NONE or self._accept(text, start, i + 1, boundary):
+                    matches.append(IntentMatch(intent, keyword, start, i + 1, priority))
+        return matches
+
+    def intents(self, text):
+        """النوايا المطابقة مرتبة حسب الأولوية ثم موضع الظهور"""
+        best = {}
+        for match in self.find_all(text):
+            current = best.get(match.intent)
+            if current is None or match.start < current.start:
+                best[match.intent] = match
+        ordered = sorted(best.values(), key=lambda m: (-m.priority, m.start))
+        return [m.intent for m in ordered]
+
+    def match(self, text):
+        """النية الفائزة أو None"""
+        winner = None
+        for match in self.find_all(text):
+            if winner is None or (match.priority, -match.start) > (winner.priority, -winner.start):
+                winner = match
+        return winner.intent if winner else None
+
+
+# نوايا رسائل واتساب (MessageProcessor) بالترتيب حسب الأولوية
+MESSAGE_INTENT_KEYWORDS = {
+    "payment": {
+        "ar": ["سداد", "دفع", "دفعة", "إيجار", "مبلغ"],
+        "en": ["payment", "pay", "rent", "transfer"],
+        "hi": ["भुगतान", "किराया"],
+    },
+    "maintenance": {
+        "ar": ["صيانة", "إصلاح", "عطل", "مشكلة", "خراب", "يحتاج"],
+        "en": ["maintenance", "repair", "broken", "problem", "fix"],
+        "hi": ["मरम्मत", "खराब", "समस्या"],
+    },
+    "inquiry": {
+        "ar": ["استفسار", "سؤال", "معلومات", "تفاصيل"],
+        "en": ["inquiry", "question", "info", "details"],
+        "hi": ["सवाल", "जानकारी"],
+    },
+    "greeting": {
+        "ar": ["السلام", "أهلا", "مرحبا", "صباح", "مساء"],
+        "en": ["hello", "good morning", "good evening"],
+        "hi": ["नमस्ते"],
+    },
+}
+
+MESSAGE_INTENTS = IntentMatcher.from_table(MESSAGE_INTENT_KEYWORDS)
@@ -1,52 +1,32 @@
 from datetime import datetime
 import logging
+from app.services.intent_matcher import MESSAGE_INTENTS
+from app.services.outbox import OutboxSender
 
 logger = logging.getLogger(__name__)
 
 class MessageProcessor:
     """معالج الرسائل مع تحسينات"""
     
-    def __init__(self, whatsapp_api):
-        self.whatsapp_api = whatsapp_api
-        self.keywords = {
-            'سداد': self.handle_payment,
-            'دفع': self.handle_payment, 
-            'دفعة': self.handle_payment,
-            'إيجار': self.handle_payment,
-            'مبلغ': self.handle_payment,
-            
-            'صيانة': self.handle_maintenance,
-            'إصلاح': self.handle_maintenance,
-            'عطل': self.handle_maintenance,
-            'مشكلة': self.handle_maintenance,
-            'خراب': self.handle_maintenance,
-            'يحتاج': self.handle_maintenance,
-            
-            'استفسار': self.handle_inquiry,
-            'سؤال': self.handle_inquiry,
-            'معلومات': self.handle_inquiry,
-            'تفاصيل': self.handle_inquiry,
-            
-            'السلام': self.handle_greeting,
-            'أهلا': self.handle_greeting,
-            'مرحبا': self.handle_greeting,
-            'صباح': self.handle_greeting,
-            'مساء': self.handle_greeting
+    def __init__(self, whatsapp_api=None):
+        # الافتراضي: الردود تُكتب في outbox ويرسلها العمّال في الخلفية
+        self.whatsapp_api = whatsapp_api or OutboxSender()
+        # النية ← المعالج؛ الكلمات المفتاحية في intent_matcher.MESSAGE_INTENT_KEYWORDS
+        self.handlers = {
+            'payment': self.handle_payment,
+            'maintenance': self.handle_maintenance,
+            'inquiry': self.handle_inquiry,
+            'greeting': self.handle_greeting
         }
     
     def process(self, message, sender, message_id=None):
         """معالجة الرسالة وإرسال الرد"""
         message_text = message.lower().strip()
         
-        for keyword, handler in self.keywords.items():
-            if keyword in message_text:
-                result = handler(message_text, sender, message_id)
-                if result.get('response'):
-                    send_result = self.whatsapp_api.send_message(sender, result['response'])
-                    result['whatsapp_status'] = send_result.get('status')
-                return result
+        intent = MESSAGE_INTENTS.match(message_text)
+        handler = self.handlers.get(intent, self.handle_default)
         
-        result = self.handle_default(message_text, sender, message_id)
+        result = handler(message_text, sender, message_id)
         if result.get('response'):
             send_result = self.whatsapp_api.send_message(sender, result['response'])
             result['whatsapp_status'] = send_result.get('status')
@@ -0,0 +1,291 @@
+"""
+صندوق الرسائل الصادرة (Outbox) وعمّال الإرسال
+
+الطلبات لا ترسل إلى Graph API مباشرة؛ بل تكتب الرسالة في message_outbox
+(عملية INSERT سريعة) وتعود فوراً. عمّال الخلفية:
+- يستلمون دفعات من الصفوف المستحقة عبر FOR UPDATE SKIP LOCKED (آمن مع عدة عمّال وعدة عمليات)
+- يرسلونها بالتوازي عبر ReminderDispatcher (نفس حدود المعدل للحساب ولكل رقم)
+- يعيدون جدولة الأخطاء المؤقتة بتأخير تصاعدي، وينقلون الدائمة أو المستنفدة إلى 'dead'
+
+تعطل WhatsApp أو بطؤه لا يُسقط الرسائل ولا يؤخر الطلبات: الرسائل تبقى في الجدول حتى تنجح.
+"""
+
+import os
+import json
+import random
+import asyncio
+import logging
+
+from psycopg2.extras import execute_values
+
+from app.db.async_db import run_db
+from app.services.reminder_dispatch import ReminderJob, is_retryable
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_WORKERS = int(os.getenv("OUTBOX_WORKERS", "2"))
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "50"))
+OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", "1"))
+OUTBOX_LEASE_SECONDS = int(os.getenv("OUTBOX_LEASE_SECONDS", "120"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "5"))
+OUTBOX_BACKOFF_BASE = float(os.getenv("OUTBOX_BACKOFF_BASE", "5"))
+OUTBOX_BACKOFF_MAX = float(os.getenv("OUTBOX_BACKOFF_MAX", "3600"))
+
+
+def text_payload(recipient, message):
+    return {
+        "messaging_product": "whatsapp",
+        "to": recipient,
+        "type": "text",
+        "text": {"body": message}
+    }
+
+
+# ---------- الإدراج ----------
+
+def enqueue(conn, recipient, message=None, payload=None, kind="text", ref_id=None,
+            dedupe_key=None, max_attempts=OUTBOX_MAX_ATTEMPTS, commit=True):
+    """
+    إضافة رسالة واحدة إلى الـ outbox وإرجاع معرفها
+    (None إذا كانت مكررة حسب dedupe_key)
+    """
+    if payload is None:
+        payload = text_payload(recipient, message)
+    cursor = conn.cursor()
+    cursor.execute('''
+        INSERT INTO message_outbox (recipient, payload, kind, ref_id, dedupe_key, max_attempts)
+        VALUES (%s, %s, %s, %s, %s, %s)
+        ON CONFLICT (dedupe_key) DO NOTHING
+        RETURNING id
+    ''', (recipient, json.dumps(payload, ensure_ascii=False), kind, ref_id, dedupe_key, max_attempts))
+    row = cursor.fetchone()
+    cursor.close()
+    if commit:
+        conn.commit()
+    return row[0] if row else None
+
+
+def enqueue_jobs(conn, jobs, dedupe_suffix=None, commit=True):
+    """
+    إدراج جماعي لقائمة ReminderJob بجملة واحدة
+    dedupe_suffix (مثل تاريخ اليوم) يمنع تكرار نفس التذكير في نفس اليوم
+    يعيد عدد الرسائل المضافة فعلاً
+    """
+    if not jobs:
+        return 0
+    rows = []
+    for job in jobs:
+        dedupe_key = None
+        if dedupe_suffix is not None and job.ref_id is not None:
+            dedupe_key = f"{job.kind}:{job.ref_id}:{dedupe_suffix}"
+        payload = job.payload or text_payload(job.recipient, job.message)
+        rows.append((job.recipient, json.dumps(payload, ensure_ascii=False), job.kind,
+                     job.ref_id, dedupe_key, OUTBOX_MAX_ATTEMPTS))
+    cursor = conn.cursor()
+    inserted = execute_values(cursor, '''
+        INSERT INTO message_outbox (recipient, payload, kind, ref_id, dedupe_key, max_attempts)
+        VALUES %s
+        ON CONFLICT (dedupe_key) DO NOTHING
+        RETURNING id
+    ''', rows, page_size=500, fetch=True)
+    cursor.close()
+    if commit:
+        conn.commit()
+    return len(inserted)
+
+
+class OutboxSender:
+    """
+    بديل متزامن لـ WhatsAppAPI بنفس واجهة send_message
+    (لـ MessageProcessor وأي كود قديم): يكتب في الـ outbox بدلاً من الإرسال
+    """
+
+    def send_message(self, recipient, message):
+        from app.db.database import db_connection
+        try:
+            with db_connection() as conn:
+                outbox_id = enqueue(conn, recipient, message)
+            return {"status": "queued", "outbox_id": outbox_id}
+        except Exception as e:
+            logger.error(f"❌ فشل إضافة الرسالة إلى outbox: {e}")
+            return {"status": "error", "message": str(e)}
+
+
+# ---------- الاستلام وتحديث النتائج ----------
+
+def claim_batch(conn, batch_size=OUTBOX_BATCH_SIZE, lease_seconds=OUTBOX_LEASE_SECONDS):
+    """استلام دفعة مستحقة (أو عالقة بعد انتهاء مهلتها) دون التعارض مع عمّال آخرين"""
+    cursor = conn.cursor()
+    cursor.execute('''
+        UPDATE message_outbox o
+        SET status = 'sending',
+            attempts = o.attempts + 1,
+            locked_until = NOW() + make_interval(secs => %s)
+        WHERE o.id IN (
+            SELECT id FROM message_outbox
+            WHERE (status = 'pending' AND next_attempt_at <= NOW())
+               OR (status = 'sending' AND locked_until < NOW())
+            ORDER BY next_attempt_at
+            LIMIT %s
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING o.id, o.recipient, o.payload, o.kind, o.attempts, o.max_attempts
+    ''', (lease_seconds, batch_size))
+    rows = cursor.fetchall()
+    cursor.close()
+    conn.commit()
+    return rows
+
+
+def extend_lease(conn, ids, lease_seconds=OUTBOX_LEASE_SECONDS):
+    """تمديد مهلة صفوف ما زالت قيد الإرسال لدى هذا العامل حتى لا يستلمها عامل آخر"""
+    cursor = conn.cursor()
+    cursor.execute('''
+        UPDATE message_outbox
+        SET locked_until = NOW() + make_interval(secs => %s)
+        WHERE id = ANY(%s) AND status = 'sending'
+    ''', (lease_seconds, list(ids)))
+    cursor.close()
+    conn.commit()
+
+
+def backoff_seconds(attempts, base=OUTBOX_BACKOFF_BASE, cap=OUTBOX_BACKOFF_MAX):
+    """تأخير تصاعدي مع عشوائية (full jitter) حتى لا تعود كل الرسائل معاً"""
+    return random.uniform(base, min(cap, base * 2 ** (attempts - 1)))
+
+
+def record_results(conn, outcomes):
+    """
+    تحديث نتائج الدفعة بجملة واحدة
+    outcomes: [(id, status, delay_seconds, error, provider_message_id)]
+    """
+    if not outcomes:
+        return
+    cursor = conn.cursor()
+    execute_values(cursor, '''
+        UPDATE message_outbox o
+        SET status = v.status,
+            next_attempt_at = NOW() + make_interval(secs => v.delay),
+            last_error = v.error,
+            provider_message_id = COALESCE(v.provider_id, o.provider_message_id),
+            sent_at = CASE WHEN v.status = 'sent' THEN NOW() ELSE o.sent_at END,
+            locked_until = NULL
+        FROM (VALUES %s) AS v(id, status, delay, error, provider_id)
+        WHERE o.id = v.id
+    ''', outcomes, template="(%s::BIGINT, %s, %s::FLOAT8, %s, %s)")
+    cursor.close()
+    conn.commit()
+
+
+def outbox_stats(conn):
+    cursor = conn.cursor()
+    cursor.execute("SELECT status, COUNT(*) FROM message_outbox GROUP BY status")
+    counts = dict(cursor.fetchall())
+    cursor.execute('''
+        SELECT EXTRACT(EPOCH FROM NOW() - MIN(created_at))
+        FROM message_outbox WHERE status = 'pending'
+    ''')
+    oldest = cursor.fetchone()[0]
+    cursor.close()
+    return {"counts": counts, "oldest_pending_seconds": float(oldest) if oldest else 0.0}
+
+
+def _outcome(row, job):
+    outbox_id, _, _, _, attempts, max_attempts = row
+    result = job.result or {"status": "error", "message": "no result"}
+    if result.get("status") == "success":
+        messages = (result.get("data") or {}).get("messages") or [{}]
+        return (outbox_id, "sent", 0, None, messages[0].get("id"))
+    error = str(result.get("message"))[:1000]
+    if attempts >= max_attempts or not is_retryable(result):
+        return (outbox_id, "dead", 0, error, None)
+    return (outbox_id, "pending", backoff_seconds(attempts), error, None)
+
+
+# ---------- العمّال ----------
+
+class OutboxWorker:
+    """عامل خلفية: استلام ← إرسال متوازٍ ← تسجيل النتائج"""
+
+    def __init__(self, dispatcher, name="outbox", batch_size=OUTBOX_BATCH_SIZE,
+                 poll_interval=OUTBOX_POLL_INTERVAL, lease_seconds=OUTBOX_LEASE_SECONDS):
+        self.dispatcher = dispatcher
+        self.name = name
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+
+    async def _renew_lease(self, ids):
+        """
+        الانتظار على حد الرقم أو الحساب قد يتجاوز مهلة الاستلام؛ بدون التمديد
+        يستلم عامل آخر الصفوف 'sending' وتُرسل الرسالة مرتين
+        """
+        interval = max(1.0, self.lease_seconds / 3)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await run_db(extend_lease, ids, self.lease_seconds)
+            except Exception as e:
+                logger.error(f"❌ {self.name}: فشل تمديد مهلة الدفعة: {e}")
+
+    async def run_once(self):
+        rows = await run_db(claim_batch, self.batch_size, self.lease_seconds)
+        if not rows:
+            return 0
+        jobs = [
+            ReminderJob(recipient=recipient, message=None, kind=kind, ref_id=outbox_id,
+                        payload=payload if isinstance(payload, dict) else json.loads(payload))
+            for outbox_id, recipient, payload, kind, _, _ in rows
+        ]
+        # إعادة المحاولة تتم عبر الجدول (next_attempt_at) وليس في الذاكرة
+        renewer = asyncio.create_task(self._renew_lease([row[0] for row in rows]))
+        try:
+            await self.dispatcher.dispatch(jobs, batch_size=len(jobs), max_retries=0)
+        finally:
+            renewer.cancel()
+            await asyncio.gather(renewer, return_exceptions=True)
+        outcomes = [_outcome(row, job) for row, job in zip(rows, jobs)]
+        await run_db(record_results, outcomes)
+
+        dead = sum(1 for o in outcomes if o[1] == "dead")
+        if dead:
+            logger.warning(f"⚠️ {self.name}: {dead} رسالة نُقلت إلى dead")
+        return len(rows)
+
+    async def run(self):
+        while True:
+            try:
+                processed = await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"❌ خطأ في عامل {self.name}: {e}")
+                processed = 0
+            # عند وجود عمل متراكم نكمل مباشرة، وإلا ننتظر
+            if processed < self.batch_size:
+                await asyncio.sleep(self.poll_interval)
+
+
+def start_outbox_workers(count=OUTBOX_WORKERS):
+    """
+    تشغيل العمّال كمهام asyncio وإرجاعها (للإيقاف عند الإغلاق)
+
+    بدون بيانات اعتماد Meta يفشل التشغيل بدل أن تتراكم الرسائل في الجدول دون مرسل؛
+    العملية التي تكتب في الـ outbox فقط (والإرسال في عملية أخرى) تضبط OUTBOX_WORKERS=0
+    """
+    if count <= 0:
+        logger.info("ℹ️ عمّال outbox معطلون (OUTBOX_WORKERS=0)")
+        return []
+    from app.services.reminder_dispatch import get_reminder_dispatcher
+    try:
+        dispatcher = get_reminder_dispatcher()
+    except RuntimeError as e:
+        logger.error(f"❌ تعذر تشغيل عمّال outbox: {e}")
+        raise RuntimeError(
+            f"عمّال outbox لا يعملون والرسائل ستتراكم دون إرسال: {e} "
+            "(اضبط بيانات اعتماد Meta أو OUTBOX_WORKERS=0 إذا كان الإرسال في عملية أخرى)"
+        ) from e
+    return [
+        asyncio.create_task(OutboxWorker(dispatcher, name=f"outbox-{i + 1}").run())
+        for i in range(count)
+    ]
@@ -0,0 +1,190 @@
+"""
+صيانة الجداول المقسمة شهرياً: analytics_events و ai_agent_logs
+================================================================
+- ensure_partitions: نقل صفوف الجدول الافتراضي إلى أشهرها ثم إنشاء جداول الأشهر
+  القادمة مسبقاً (absorb_default_partition / ensure_monthly_partitions في SQL)
+- compact_expired_partitions: لكل شهر أقدم من مدة الاحتفاظ يُلخّص الشهر في
+  aggregated_metrics (عدد الصفوف لكل نوع حدث) ثم DETACH + DROP للجدول الفرعي،
+  كل شهر في معاملة مستقلة. لا يوجد DELETE صف بصف ولا VACUUM بعده.
+
+أشهر analytics_events لا تُحذف قبل أن يتجاوزها تجميع rollups (rollup_state)،
+حتى لا تضيع أحداث لم تُضف إلى العدّادات بعد.
+
+مدة الاحتفاظ بالأشهر من المتغيرات:
+    ANALYTICS_EVENTS_RETENTION_MONTHS (افتراضي 12)
+    AI_AGENT_LOGS_RETENTION_MONTHS (افتراضي 3)
+"""
+
+import os
+import re
+import logging
+from dataclasses import dataclass
+from datetime import date
+
+from app.services.rollups import ROLLUP_NAME, run_rollup
+
+logger = logging.getLogger(__name__)
+
+PARTITION_MONTHS_AHEAD = int(os.getenv("PARTITION_MONTHS_AHEAD", "2"))
+
+
+@dataclass
+class PartitionedTable:
+    name: str
+    retention_months: int
+    summary_metric: str
+    # تعبير SQL لبُعد التلخيص
+    dimension_sql: str
+    rolled_up: bool = False
+
+
+PARTITIONED_TABLES = [
+    PartitionedTable(
+        name="analytics_events",
+        retention_months=int(os.getenv("ANALYTICS_EVENTS_RETENTION_MONTHS", "12")),
+        summary_metric="archived_events",
+        dimension_sql="event_type",
+        rolled_up=True,
+    ),
+    PartitionedTable(
+        name="ai_agent_logs",
+        retention_months=int(os.getenv("AI_AGENT_LOGS_RETENTION_MONTHS", "3")),
+        summary_metric="archived_agent_logs",
+        dimension_sql="event_type || ':' || COALESCE(severity, '')",
+    ),
+]
+
+
+def _shift_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def ensure_partitions(conn, months_ahead=PARTITION_MONTHS_AHEAD) -> dict:
+    """
+    إنشاء الأشهر الحالية والقادمة لكل جدول مقسم؛ يعيد عدد الجداول المنشأة لكل جدول
+    صفوف الجدول الافتراضي تُنقل أولاً إلى أشهرها (absorb_default_partition) فتشملها
+    مدة الاحتفاظ، ولا يرفض Postgres إنشاء شهر فيه صفوف في الجدول الافتراضي.
+    كل جدول في معاملة مستقلة: فشل جدول يُسجّل ولا يوقف البقية ولا التلخيص بعده
+    """
+    created = {}
+    for table in PARTITIONED_TABLES:
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT absorb_default_partition(%s)", (table.name,))
+            absorbed = cursor.fetchone()[0]
+            cursor.execute("SELECT ensure_monthly_partitions(%s, %s)", (table.name, months_ahead))
+            created[table.name] = absorbed + cursor.fetchone()[0]
+            conn.commit()
+            if absorbed:
+                logger.info(f"📦 {table.name}: نقل صفوف الجدول الافتراضي إلى {absorbed} شهر")
+        except Exception as e:
+            conn.rollback()
+            created[table.name] = None
+            logger.error(f"❌ {table.name}: فشل إنشاء الأشهر: {e}")
+        finally:
+            cursor.close()
+    return created
+
+
+def monthly_partitions(conn, table_name):
+    """[(اسم الجدول الفرعي، أول يوم في الشهر)] مرتبة من الأقدم (دون الجدول الافتراضي)"""
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT child.relname
+        FROM pg_inherits i
+        JOIN pg_class parent ON parent.oid = i.inhparent
+        JOIN pg_class child ON child.oid = i.inhrelid
+        WHERE parent.relname = %s
+    ''', (table_name,))
+    names = [row[0] for row in cursor.fetchall()]
+    cursor.close()
+
+    pattern = re.compile(rf"^{re.escape(table_name)}_(\d{{4}})(\d{{2}})$")
+    partitions = []
+    for name in names:
+        match = pattern.match(name)
+        if match:
+            partitions.append((name, date(int(match.group(1)), int(match.group(2)), 1)))
+    return sorted(partitions, key=lambda item: item[1])
+
+
+def _rolled_up_past(cursor, partition):
+    """هل تجاوزت علامة rollups (last_xact_id, last_event_id) كل أحداث هذا الشهر؟"""
+    cursor.execute("SELECT last_xact_id, last_event_id FROM rollup_state WHERE name = %s", (ROLLUP_NAME,))
+    row = cursor.fetchone()
+    if row is None:
+        cursor.execute(f'SELECT NOT EXISTS (SELECT 1 FROM "{partition}")')
+        return cursor.fetchone()[0]
+    cursor.execute(f'''
+        SELECT NOT EXISTS (
+            SELECT 1 FROM "{partition}" WHERE (xact_id, id) > (%s::xid8, %s)
+        )
+    ''', row)
+    return cursor.fetchone()[0]
+
+
+def compact_partition(conn, table: PartitionedTable, partition, month) -> int:
+    """تلخيص شهر في aggregated_metrics ثم فصله وحذفه؛ يعيد عدد الصفوف الملخصة"""
+    cursor = conn.cursor()
+    try:
+        if table.rolled_up and not _rolled_up_past(cursor, partition):
+            conn.rollback()
+            logger.warning(f"⏳ {partition}: لم يكتمل تجميع أحداثه بعد، تأجيل الحذف")
+            return -1
+
+        cursor.execute(f'''
+            INSERT INTO aggregated_metrics (metric_type, period, bucket_start, dimension, value, details, generated_at)
+            SELECT %s, 'month', %s::timestamp AT TIME ZONE 'UTC', {table.dimension_sql}, COUNT(*),
+                   jsonb_build_object('partition', %s, 'first', MIN(timestamp), 'last', MAX(timestamp)),
+                   NOW()
+            FROM "{partition}"
+            GROUP BY {table.dimension_sql}
+            ON CONFLICT (metric_type, period, bucket_start, dimension) WHERE bucket_start IS NOT NULL
+            DO UPDATE SET value = EXCLUDED.value, details = EXCLUDED.details, generated_at = EXCLUDED.generated_at
+            RETURNING value
+        ''', (table.summary_metric, month, partition))
+        rows = int(sum(row[0] for row in cursor.fetchall()))
+
+        cursor.execute(f'ALTER TABLE "{table.name}" DETACH PARTITION "{partition}"')
+        cursor.execute(f'DROP TABLE "{partition}"')
+        conn.commit()
+        logger.info(f"🗜️ {partition}: تلخيص {rows} صف ثم حذف الشهر")
+        return rows
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def compact_expired_partitions(conn, today=None) -> dict:
+    """تلخيص وحذف كل الأشهر الأقدم من مدة الاحتفاظ لكل جدول (فشل جدول لا يوقف الآخر)"""
+    current_month = (today or date.today()).replace(day=1)
+    dropped = {}
+    for table in PARTITIONED_TABLES:
+        cutoff = _shift_months(current_month, -table.retention_months)
+        dropped[table.name] = []
+        try:
+            for partition, month in monthly_partitions(conn, table.name):
+                if month >= cutoff:
+                    break
+                if compact_partition(conn, table, partition, month) >= 0:
+                    dropped[table.name].append(partition)
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"❌ {table.name}: فشل تلخيص الأشهر المنتهية: {e}")
+    return dropped
+
+
+def run_partition_maintenance(conn) -> dict:
+    """الأشهر القادمة + تجميع الأحداث الجديدة + تلخيص وحذف الأشهر المنتهية"""
+    created = ensure_partitions(conn)
+    # آخر الأحداث تُجمّع قبل أن يُحذف شهرها؛ فشل التجميع لا يوقف ai_agent_logs
+    # (compact_partition يتحقق من العلامة قبل حذف أي شهر من analytics_events)
+    try:
+        run_rollup(conn)
+    except Exception as e:
+        logger.error(f"❌ فشل تجميع الأحداث قبل الصيانة: {e}")
+    dropped = compact_expired_partitions(conn)
+    return {"created": created, "dropped": dropped}
@@ -5,7 +5,7 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.abspath(__file__)) + '/..')
 
-from app.db.database import get_connection
+from app.db.database import db_connection
 
 class MockWhatsAppClient:
     def send_message(self, to, message):
@@ -32,9 +32,8 @@ def run_daily_collection():
 def check_overdue_payments():
     """التحقق من المدفوعات المتأخرة"""
     print("💰 جاري فحص المدفوعات المتأخرة...")
-    conn = get_connection()
-    if conn:
-        try:
+    try:
+        with db_connection() as conn:
             cursor = conn.cursor()
             query = """
             SELECT p.*, t.phone, t.name 
@@ -50,12 +49,10 @@ def check_overdue_payments():
                 print(f"⚠️  دفعة متأخرة: {payment}")
             
             cursor.close()
-            conn.close()
             return True
-        except Exception as e:
-            print(f"❌ خطأ في التحقق من المدفوعات: {e}")
-            return False
-    return False
+    except Exception as e:
+        print(f"❌ خطأ في التحقق من المدفوعات: {e}")
+        return False
 
 if __name__ == "__main__":
     run_daily_collection()
@@ -0,0 +1,196 @@
+"""
+توليد جدول دفعات العقود دفعة واحدة
+
+كل الأقساط تُحسب في الذاكرة أولاً ثم تُكتب بجملة INSERT واحدة (execute_values)
+بدلاً من INSERT لكل شهر. يدعم:
+- التكرار: monthly / quarterly / semi_annual / annual، أو عدد أشهر صريح
+- يوم استحقاق مخصص من الشهر (payment_day)، ويُقص لآخر الشهر عند الحاجة (31 ← 28/29/30)
+- إعادة التوليد الجماعية للعقود القائمة مع الإبقاء على الأقساط المدفوعة
+"""
+
+import calendar
+import logging
+from datetime import date, datetime
+from decimal import Decimal
+
+from psycopg2.extras import execute_values
+
+logger = logging.getLogger(__name__)
+
+FREQUENCY_MONTHS = {
+    'monthly': 1,
+    'quarterly': 3,
+    'semi_annual': 6,
+    'semi-annual': 6,
+    'semiannual': 6,
+    'annual': 12,
+    'yearly': 12,
+}
+
+INSERT_PAGE_SIZE = 1000
+
+
+def frequency_months(frequency):
+    """عدد الأشهر لكل قسط؛ القيم غير المعروفة تعامل كشهري"""
+    if isinstance(frequency, int):
+        return max(1, frequency)
+    if isinstance(frequency, str) and frequency.strip().isdigit():
+        return max(1, int(frequency))
+    return FREQUENCY_MONTHS.get((frequency or 'monthly').strip().lower(), 1)
+
+
+def is_known_frequency(frequency):
+    """التكرار معروف (monthly / quarterly ...) أو عدد أشهر صريح"""
+    if isinstance(frequency, int):
+        return frequency >= 1
+    value = str(frequency or '').strip().lower()
+    return value in FREQUENCY_MONTHS or (value.isdigit() and int(value) >= 1)
+
+
+def _as_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value), '%Y-%m-%d').date()
+
+
+def _add_months(day, months, day_of_month=None):
+    """إضافة أشهر مع قص اليوم لطول الشهر الهدف"""
+    index = day.month - 1 + months
+    year, month = day.year + index // 12, index % 12 + 1
+    wanted = day_of_month or day.day
+    return date(year, month, min(wanted, calendar.monthrange(year, month)[1]))
+
+
+def compute_installments(start_date, end_date, monthly_rent, frequency='monthly', payment_day=None):
+    """
+    حساب الأقساط: [(due_date, amount)]
+    كل شهر يبدأ قبل end_date يُحتسب، وتُجمع الأشهر في أقساط حسب التكرار
+    (القسط الأخير قد يغطي أشهراً أقل). الاستحقاق في أول الشهر افتراضياً
+    """
+    start = _as_date(start_date)
+    end = _as_date(end_date)
+    rent = Decimal(str(monthly_rent or 0))
+    step = frequency_months(frequency)
+    due_day = payment_day or 1
+
+    months = max(0, (end.year - start.year) * 12 + end.month - start.month)
+    if _add_months(start, months) < end:
+        months += 1
+
+    installments = []
+    for offset in range(0, months, step):
+        covered = min(step, months - offset)
+        installments.append((_add_months(start, offset, due_day), rent * covered))
+    return installments
+
+
+def insert_installments(cursor, rows):
+    """كتابة الأقساط بجملة واحدة: rows = [(contract_id, amount, due_date)]"""
+    if not rows:
+        return 0
+    execute_values(cursor, '''
+        INSERT INTO contract_payments (contract_id, amount, due_date, payment_type, status)
+        VALUES %s
+    ''', rows, template="(%s, %s, %s, 'rent', 'pending')", page_size=INSERT_PAGE_SIZE)
+    return len(rows)
+
+
+def create_payment_schedule(cursor, contract_id, contract_data):
+    """جدول دفعات عقد جديد (داخل معاملة إنشاء العقد)"""
+    installments = compute_installments(
+        contract_data['start_date'],
+        contract_data['end_date'],
+        contract_data.get('monthly_rent'),
+        contract_data.get('payment_frequency', 'monthly'),
+        contract_data.get('payment_day'),
+    )
+    return insert_installments(cursor, [
+        (contract_id, amount, due_date) for due_date, amount in installments
+    ])
+
+
+def create_payment_schedules(cursor, contracts):
+    """
+    جداول دفعات لعدة عقود بجملة واحدة
+    contracts: [(contract_id, contract_data)]
+    """
+    rows = []
+    for contract_id, contract_data in contracts:
+        for due_date, amount in compute_installments(
+            contract_data['start_date'],
+            contract_data['end_date'],
+            contract_data.get('monthly_rent'),
+            contract_data.get('payment_frequency', 'monthly'),
+            contract_data.get('payment_day'),
+        ):
+            rows.append((contract_id, amount, due_date))
+    return insert_installments(cursor, rows)
+
+
+def regenerate_payment_schedules(conn, contract_ids=None, frequency=None, payment_day=None, commit=True):
+    """
+    إعادة توليد جداول الدفعات للعقود القائمة (كلها أو contract_ids)
+    - الأقساط المعلقة غير المدفوعة تُحذف بجملة واحدة
+    - الأقساط المدفوعة تبقى، ولا يُولد قسط بنفس تاريخ استحقاقها
+    - frequency يتجاوز قيمة العقد إذا مُرر ويُحفظ في contracts.payment_frequency
+      حتى تطابق الأقساط ما يعرضه العقد
+    - payment_day يطبق على هذه الإعادة فقط (يوم الاستحقاق ليس عموداً في contracts)
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute('''
+            SELECT id, start_date, end_date, monthly_rent, payment_frequency
+            FROM contracts
+            WHERE contract_type = 'rental'
+              AND monthly_rent > 0
+              AND (%s::INT[] IS NULL OR id = ANY(%s::INT[]))
+        ''', (contract_ids, contract_ids))
+        contracts = cursor.fetchall()
+        ids = [row[0] for row in contracts]
+        if not ids:
+            return {"contracts": 0, "deleted": 0, "inserted": 0}
+
+        if frequency:
+            cursor.execute('''
+                UPDATE contracts
+                SET payment_frequency = %s, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ANY(%s) AND payment_frequency IS DISTINCT FROM %s
+            ''', (frequency, ids, frequency))
+
+        cursor.execute('''
+            DELETE FROM contract_payments
+            WHERE contract_id = ANY(%s)
+              AND payment_type = 'rent'
+              AND status = 'pending'
+              AND payment_date IS NULL
+        ''', (ids,))
+        deleted = cursor.rowcount
+
+        cursor.execute('''
+            SELECT contract_id, due_date FROM contract_payments
+            WHERE contract_id = ANY(%s) AND payment_type = 'rent'
+        ''', (ids,))
+        kept = set(cursor.fetchall())
+
+        rows = []
+        for contract_id, start_date, end_date, monthly_rent, contract_frequency in contracts:
+            for due_date, amount in compute_installments(
+                start_date, end_date, monthly_rent,
+                frequency or contract_frequency, payment_day,
+            ):
+                if (contract_id, due_date) not in kept:
+                    rows.append((contract_id, amount, due_date))
+        inserted = insert_installments(cursor, rows)
+
+        if commit:
+            conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+    logger.info(f"📅 إعادة توليد جداول {len(ids)} عقد: حذف {deleted}، إضافة {inserted}")
+    return {"contracts": len(ids), "deleted": deleted, "inserted": inserted}
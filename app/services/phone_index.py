@@ -0,0 +1,274 @@
+"""
+فهرس أرقام الهواتف في الذاكرة (رقم ← مستأجر)
+
+مسار الـ webhook يحتاج معرفة المرسل في كل رسالة واردة. بدلاً من استعلام
+tenants/contracts لكل رسالة، نحتفظ بفهرس مطبّع بصيغة E.164:
+- يُحمّل مسبقاً عند بدء التطبيق (warm_phone_indexes)
+- يُبطل عند الكتابة على المستأجرين والعقود (invalidate / invalidate_where)
+- محدود الحجم مع إخراج الأقل استخداماً (LRU)
+- صلاحية محدودة لكل مدخل (TTL) لأن الإبطال محلي لكل عملية
+- الأرقام غير المعروفة تُخزن كنتيجة سلبية لمدة قصيرة حتى لا تضرب قاعدة البيانات في كل رسالة
+"""
+
+import os
+import re
+import time
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# رمز الدولة الافتراضي للأرقام المحلية (عُمان)
+DEFAULT_COUNTRY_CODE = os.getenv("PHONE_DEFAULT_COUNTRY_CODE", "968")
+LOCAL_NUMBER_LENGTH = int(os.getenv("PHONE_LOCAL_NUMBER_LENGTH", "8"))
+
+_NON_DIGITS = re.compile(r"\D")
+_MISSING = object()
+
+
+def normalize_phone(phone):
+    """
+    تطبيع رقم الهاتف إلى صيغة E.164 (+96891234567)
+    يقبل: +968 9123 4567 / 0096891234567 / 96891234567 / 91234567 / 091234567
+    """
+    if not phone:
+        return None
+    digits = _NON_DIGITS.sub("", str(phone))
+    if digits.startswith("00"):
+        digits = digits[2:]
+    elif digits.startswith("0") and len(digits) == LOCAL_NUMBER_LENGTH + 1:
+        digits = digits[1:]
+    if len(digits) == LOCAL_NUMBER_LENGTH:
+        digits = DEFAULT_COUNTRY_CODE + digits
+    if not 8 <= len(digits) <= 15:
+        return None
+    return "+" + digits
+
+
+def valid_phone_sql(column):
+    """
+    نفس شرط normalize_phone كتعبير SQL (هل يُطبّع الرقم إلى E.164 صالح؟)
+    لاستبعاد الأرقام غير الصالحة في الاستعلام نفسه بدلاً من تخطيها بعد الاستلام
+    """
+    digits = f"regexp_replace({column}, '[^0-9]', '', 'g')"
+    local = (f"CASE WHEN left({digits}, 2) = '00' THEN substr({digits}, 3) "
+             f"WHEN left({digits}, 1) = '0' AND length({digits}) = {LOCAL_NUMBER_LENGTH + 1} "
+             f"THEN substr({digits}, 2) ELSE {digits} END")
+    return (f"(length({local}) + CASE WHEN length({local}) = {LOCAL_NUMBER_LENGTH} "
+            f"THEN {len(DEFAULT_COUNTRY_CODE)} ELSE 0 END BETWEEN 8 AND 15)")
+
+
+def phone_variants(e164):
+    """الصيغ الرقمية المحتملة للرقم كما قد تكون مخزنة (للبحث في قاعدة البيانات)"""
+    digits = e164.lstrip("+")
+    variants = [digits]
+    if digits.startswith(DEFAULT_COUNTRY_CODE):
+        variants.append(digits[len(DEFAULT_COUNTRY_CODE):])
+    return variants
+
+
+class PhoneIndex:
+    """ذاكرة LRU آمنة للخيوط: رقم E.164 ← قيمة (أو None لرقم غير معروف)"""
+
+    def __init__(self, name, maxsize=10000, ttl=900, miss_ttl=60):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.miss_ttl = miss_ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _lookup(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return _MISSING
+        value, expires_at = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return _MISSING
+        self._entries.move_to_end(key)
+        return value
+
+    def _store(self, key, value):
+        ttl = self.ttl if value is not None else self.miss_ttl
+        self._entries[key] = (value, time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, phone, loader=None):
+        """
+        جلب القيمة من الفهرس، وعند عدم وجودها استدعاء loader(e164)
+        وتخزين النتيجة (بما فيها None). بدون loader يعيد None عند عدم الوجود.
+        """
+        key = normalize_phone(phone)
+        if key is None:
+            return None
+
+        with self._lock:
+            value = self._lookup(key)
+            if value is not _MISSING:
+                self.hits += 1
+                return value
+            self.misses += 1
+
+        if loader is None:
+            return None
+
+        # التحميل خارج القفل حتى لا تنتظر الخيوط الأخرى قاعدة البيانات
+        value = loader(key)
+        with self._lock:
+            self._store(key, value)
+        return value
+
+    def put(self, phone, value):
+        key = normalize_phone(phone)
+        if key is None:
+            return
+        with self._lock:
+            self._store(key, value)
+
+    def warm(self, items):
+        """تحميل مسبق من أزواج (رقم، قيمة)؛ يتوقف عند امتلاء الفهرس"""
+        count = 0
+        with self._lock:
+            for phone, value in items:
+                key = normalize_phone(phone)
+                if key is None:
+                    continue
+                self._store(key, value)
+                count += 1
+                if count >= self.maxsize:
+                    break
+        logger.info(f"📇 تم تحميل {count} رقم في فهرس {self.name}")
+        return count
+
+    def invalidate(self, phone):
+        key = normalize_phone(phone)
+        if key is None:
+            return
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def invalidate_where(self, predicate):
+        """إبطال كل المدخلات التي تحقق الشرط (للكتابات التي لا نعرف فيها الرقم، مثل الحذف بالمعرف)"""
+        with self._lock:
+            stale = [k for k, (value, _) in self._entries.items()
+                     if value is not None and predicate(value)]
+            for key in stale:
+                del self._entries[key]
+        return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+_maxsize = int(os.getenv("PHONE_INDEX_MAX_SIZE", "10000"))
+_ttl = int(os.getenv("PHONE_INDEX_TTL", "900"))
+
+# جدول tenants: رقم ← {'id', 'language_preference'}
+tenant_index = PhoneIndex("tenants", maxsize=_maxsize, ttl=_ttl)
+# جدول contracts (ContractsManager): رقم ← {'id', 'tenant_name', 'tenant_phone', 'contract_ids'}
+contract_phone_index = PhoneIndex("contracts", maxsize=_maxsize, ttl=_ttl)
+
+
+def load_tenant_by_phone(conn, e164):
+    """بحث المستأجر في قاعدة البيانات بكل صيغ الرقم المحتملة"""
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT id, language_preference FROM tenants
+        WHERE regexp_replace(phone, '[^0-9]', '', 'g') = ANY(%s)
+        LIMIT 1
+    """, (phone_variants(e164),))
+    row = cursor.fetchone()
+    cursor.close()
+    if not row:
+        return None
+    return {"id": row[0], "language_preference": row[1] or "ar"}
+
+
+def load_contract_tenant_by_phone(conn, e164):
+    """بحث عقود الرقم في جدول contracts (الأحدث أولاً)"""
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT id, tenant_name, tenant_phone FROM contracts
+        WHERE regexp_replace(tenant_phone, '[^0-9]', '', 'g') = ANY(%s)
+        ORDER BY created_at DESC
+    """, (phone_variants(e164),))
+    rows = cursor.fetchall()
+    cursor.close()
+    if not rows:
+        return None
+    first = rows[0]
+    return {
+        "id": first[0],
+        "tenant_name": first[1],
+        "tenant_phone": first[2],
+        "contract_ids": [row[0] for row in rows],
+    }
+
+
+def warm_phone_indexes(conn):
+    """تحميل الفهارس عند بدء التطبيق"""
+    cursor = conn.cursor()
+
+    cursor.execute("""
+        SELECT phone, id, language_preference FROM tenants
+        ORDER BY created_at DESC LIMIT %s
+    """, (tenant_index.maxsize,))
+    # الأحدث يُضاف أخيراً فيكون آخر من يُخرج من الـ LRU
+    tenant_index.warm(
+        (phone, {"id": tenant_id, "language_preference": lang or "ar"})
+        for phone, tenant_id, lang in reversed(cursor.fetchall())
+    )
+
+    # أرقام أحدث العقود فقط (بحد سعة الفهرس)، ثم كل عقود هذه الأرقام عبر فهرس
+    # الأرقام حتى لا يُخزن رقم بقائمة عقود ناقصة
+    cursor.execute("""
+        SELECT tenant_phone FROM contracts
+        WHERE tenant_phone IS NOT NULL AND tenant_phone <> ''
+        ORDER BY created_at DESC LIMIT %s
+    """, (contract_phone_index.maxsize,))
+    variants = set()
+    for (tenant_phone,) in cursor.fetchall():
+        key = normalize_phone(tenant_phone)
+        if key is not None:
+            variants.update(phone_variants(key))
+
+    # الصفوف مرتبة من الأقدم للأحدث حتى يكون أول عقد في القائمة هو الأحدث
+    cursor.execute("""
+        SELECT id, tenant_name, tenant_phone FROM contracts
+        WHERE regexp_replace(tenant_phone, '[^0-9]', '', 'g') = ANY(%s)
+        ORDER BY created_at ASC
+    """, (list(variants),))
+    grouped = OrderedDict()
+    for contract_id, tenant_name, tenant_phone in cursor.fetchall():
+        key = normalize_phone(tenant_phone)
+        if key is None:
+            continue
+        entry = grouped.pop(key, None)
+        if entry is None:
+            entry = {"contract_ids": []}
+        entry.update(id=contract_id, tenant_name=tenant_name, tenant_phone=tenant_phone)
+        entry["contract_ids"].insert(0, contract_id)
+        grouped[key] = entry
+    # الأحدث استخداماً في نهاية الـ LRU
+    contract_phone_index.warm(list(grouped.items())[-contract_phone_index.maxsize:])
+
+    cursor.close()
@@ -0,0 +1,292 @@
+"""
+محرك الإرسال الجماعي للتذكيرات (عقود ومدفوعات)
+
+- مهام تذكير الدفعات تُبنى باستعلام واحد يجلب أرقام المستأجرين مع الدفعات
+  (مهام تذكير العقود يبنيها reminder_scheduler من contract_reminders)
+- القوالب تُجهز مرة واحدة لكل الدفعة قبل بدء الإرسال
+- الإرسال عبر عمّال متوازين مع محدد Token Bucket:
+    * على مستوى الحساب: رسائل/ثانية حسب فئة الـ throughput في WhatsApp Cloud API
+    * على مستوى الرقم: فاصل أدنى بين رسالتين لنفس المستلم (pair rate limit)
+- إعادة المحاولة مع تأخير تصاعدي للأخطاء المؤقتة (429 / 5xx / أخطاء الشبكة)
+- تقرير لكل دفعة: الإرسال، الفشل، عدد المحاولات، والمعدل الفعلي
+"""
+
+import os
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from app.services.phone_index import normalize_phone
+from app.utils.metrics import metrics
+from app.templates.contract_reminders import ContractTemplates
+from templates.payment_templates import get_template as get_payment_template
+
+logger = logging.getLogger(__name__)
+
+# فئة الحساب الافتراضية في Cloud API هي 80 رسالة/ثانية (تصل إلى 1000 بعد الترقية)
+ACCOUNT_MPS = float(os.getenv("WHATSAPP_ACCOUNT_MPS", "80"))
+# حد الزوج: رسالة واحدة كل 6 ثوان تقريباً لنفس المستلم
+RECIPIENT_INTERVAL = float(os.getenv("WHATSAPP_RECIPIENT_INTERVAL", "6"))
+DISPATCH_WORKERS = int(os.getenv("REMINDER_DISPATCH_WORKERS", "16"))
+DISPATCH_BATCH_SIZE = int(os.getenv("REMINDER_DISPATCH_BATCH_SIZE", "500"))
+MAX_RETRIES = int(os.getenv("REMINDER_MAX_RETRIES", "3"))
+
+DISPATCH_MESSAGES = metrics.counter(
+    "reminder_dispatch_messages_total", "رسائل التذكير حسب النتيجة (sent/failed/retried)", ["result"]
+)
+DISPATCH_BATCH_LATENCY = metrics.histogram(
+    "reminder_dispatch_batch_duration_seconds", "زمن إرسال دفعة تذكيرات",
+    buckets=(0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+)
+
+CONTRACT_TEMPLATES = {
+    '90_days': ContractTemplates.contract_90_days_reminder,
+    '60_days': ContractTemplates.contract_60_days_reminder,
+    '30_days': ContractTemplates.contract_30_days_reminder,
+    '7_days': ContractTemplates.contract_7_days_reminder,
+}
+
+
+class TokenBucket:
+    """Token Bucket غير حاجب: rate توكن/ثانية بسعة capacity"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, tokens=1):
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
+
+
+class RecipientLimiter:
+    """Token Bucket لكل رقم، محدود العدد (LRU) حتى لا يكبر بلا حدود"""
+
+    def __init__(self, interval, max_keys=100000):
+        self.rate = 1.0 / interval if interval > 0 else None
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+
+    async def acquire(self, recipient):
+        if self.rate is None:
+            return
+        bucket = self._buckets.get(recipient)
+        if bucket is None:
+            bucket = TokenBucket(self.rate, capacity=1)
+            self._buckets[recipient] = bucket
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(recipient)
+        await bucket.acquire()
+
+
+@dataclass
+class ReminderJob:
+    recipient: str
+    message: str
+    kind: str
+    ref_id: Optional[int] = None
+    attempts: int = 0
+    # payload جاهز لـ Graph API (من outbox)؛ بدونه تُرسل message كنص
+    payload: Optional[dict] = None
+    # نتيجة آخر محاولة كما أعادها عميل واتساب
+    result: Optional[dict] = None
+
+
+@dataclass
+class BatchReport:
+    batch: int
+    total: int
+    sent: int = 0
+    failed: int = 0
+    retries: int = 0
+    elapsed: float = 0.0
+    failures: List[dict] = field(default_factory=list)
+
+    @property
+    def throughput(self):
+        return round(self.sent / self.elapsed, 2) if self.elapsed else 0.0
+
+    def to_dict(self):
+        return {
+            "batch": self.batch,
+            "total": self.total,
+            "sent": self.sent,
+            "failed": self.failed,
+            "retries": self.retries,
+            "elapsed_seconds": round(self.elapsed, 3),
+            "throughput_per_second": self.throughput,
+            "failures": self.failures,
+        }
+
+
+# ---------- تجهيز الدفعات (استعلام واحد + قوالب جماعية) ----------
+
+def build_payment_reminder_jobs(conn, days_ahead=3):
+    """تذكيرات الدفعات المستحقة خلال days_ahead يوم والمتأخرة، باستعلام واحد"""
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT p.id, p.amount, p.due_date, p.due_date < CURRENT_DATE AS overdue,
+               t.phone, t.language_preference
+        FROM payments p
+        JOIN contracts c ON c.id = p.contract_id
+        JOIN tenants t ON t.id = c.tenant_id
+        WHERE p.status::TEXT IN ('pending', 'overdue')
+          AND p.due_date <= CURRENT_DATE + %s
+          AND t.phone IS NOT NULL
+        ORDER BY p.due_date
+    ''', (days_ahead,))
+    rows = cursor.fetchall()
+    cursor.close()
+
+    jobs = []
+    for payment_id, amount, due_date, overdue, phone, lang in rows:
+        recipient = normalize_phone(phone)
+        if not recipient:
+            continue
+        key = 'overdue' if overdue else 'reminder'
+        jobs.append(ReminderJob(
+            recipient=recipient,
+            message=get_payment_template(lang or 'ar', key, {
+                'payment_id': payment_id,
+                'amount': amount,
+                'due_date': due_date,
+            }),
+            kind=f"payment_{key}",
+            ref_id=payment_id,
+        ))
+    return jobs
+
+
+# ---------- الإرسال ----------
+
+def is_retryable(result):
+    code = result.get("code")
+    return code is None or code == 429 or code >= 500
+
+
+class ReminderDispatcher:
+    """إرسال دفعات من ReminderJob عبر عميل واتساب غير حاجب مع حدود المعدل"""
+
+    def __init__(self, client, account_mps=ACCOUNT_MPS, recipient_interval=RECIPIENT_INTERVAL,
+                 workers=DISPATCH_WORKERS, max_retries=MAX_RETRIES, retry_backoff=1.0):
+        self.client = client
+        self.account_limiter = TokenBucket(account_mps)
+        self.recipient_limiter = RecipientLimiter(recipient_interval)
+        self.workers = workers
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+
+    async def _send(self, job, report, max_retries):
+        while True:
+            await self.recipient_limiter.acquire(job.recipient)
+            await self.account_limiter.acquire()
+            job.attempts += 1
+            if job.payload is not None:
+                result = await self.client.send_payload(job.payload)
+            else:
+                result = await self.client.send_message(job.recipient, job.message)
+            job.result = result
+
+            if result.get("status") == "success":
+                report.sent += 1
+                return
+            if job.attempts > max_retries or not is_retryable(result):
+                report.failed += 1
+                report.failures.append({
+                    "ref_id": job.ref_id,
+                    "kind": job.kind,
+                    "recipient": job.recipient,
+                    "attempts": job.attempts,
+                    "error": result.get("message"),
+                })
+                return
+            report.retries += 1
+            await asyncio.sleep(self.retry_backoff * 2 ** (job.attempts - 1))
+
+    async def _run_batch(self, number, jobs, max_retries):
+        report = BatchReport(batch=number, total=len(jobs))
+        queue = asyncio.Queue()
+        for job in jobs:
+            queue.put_nowait(job)
+
+        async def worker():
+            while True:
+                try:
+                    job = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                try:
+                    await self._send(job, report, max_retries)
+                except Exception as e:
+                    job.result = {"status": "error", "message": str(e)}
+                    report.failed += 1
+                    report.failures.append({"ref_id": job.ref_id, "kind": job.kind,
+                                            "recipient": job.recipient, "error": str(e)})
+
+        started = time.monotonic()
+        await asyncio.gather(*(worker() for _ in range(min(self.workers, len(jobs)) or 1)))
+        report.elapsed = time.monotonic() - started
+        DISPATCH_BATCH_LATENCY.observe(report.elapsed)
+        DISPATCH_MESSAGES.labels("sent").inc(report.sent)
+        DISPATCH_MESSAGES.labels("failed").inc(report.failed)
+        DISPATCH_MESSAGES.labels("retried").inc(report.retries)
+        logger.info(f"📤 دفعة {number}: أُرسل {report.sent}/{report.total}، فشل {report.failed}، "
+                    f"إعادة {report.retries}، {report.throughput} رسالة/ث")
+        return report
+
+    async def dispatch(self, jobs, batch_size=DISPATCH_BATCH_SIZE, max_retries=None):
+        """
+        إرسال كل الرسائل على دفعات، ويعيد تقريراً لكل دفعة
+        max_retries=0 يعطل إعادة المحاولة داخل الذاكرة (عندما يتولاها outbox)
+        """
+        if max_retries is None:
+            max_retries = self.max_retries
+        reports = []
+        for number, start in enumerate(range(0, len(jobs), batch_size), start=1):
+            reports.append(await self._run_batch(number, jobs[start:start + batch_size], max_retries))
+        return reports
+
+
+def summarize_reports(reports):
+    """ملخص إجمالي لتقارير الدفعات"""
+    sent = sum(r.sent for r in reports)
+    elapsed = sum(r.elapsed for r in reports)
+    return {
+        "total": sum(r.total for r in reports),
+        "sent": sent,
+        "failed": sum(r.failed for r in reports),
+        "retries": sum(r.retries for r in reports),
+        "elapsed_seconds": round(elapsed, 3),
+        "throughput_per_second": round(sent / elapsed, 2) if elapsed else 0.0,
+        "batches": [r.to_dict() for r in reports],
+    }
+
+
+_dispatcher = None
+
+
+def get_reminder_dispatcher():
+    """موزع مشترك حتى تكون حدود المعدل على مستوى العملية وليس لكل طلب"""
+    global _dispatcher
+    if _dispatcher is None:
+        from app.services.whatsapp_api import get_async_whatsapp_client
+        _dispatcher = ReminderDispatcher(get_async_whatsapp_client())
+    return _dispatcher
@@ -0,0 +1,208 @@
+"""
+جدولة تذكيرات تجديد العقود فوق جدول contract_reminders
+
+contract_reminders هو مصدر الحقيقة: كل صف تذكير بتاريخ محدد لعقد محدد.
+- الملء (backfill): جملة INSERT ... SELECT واحدة تولد الصفوف الناقصة لكل العقود
+  النشطة من إزاحات contracts.renewal_reminders (ON CONFLICT يتجاهل الموجود)
+- "ما المستحق الآن": استعلام واحد على الفهرس الجزئي (reminder_date) WHERE is_sent = FALSE
+- الاستلام: UPDATE ... RETURNING مع FOR UPDATE SKIP LOCKED يعلّم الصفوف كمرسلة
+  ويضيف الرسائل إلى outbox في نفس المعاملة، فلا يُرسل التذكير مرتين ولا يضيع
+"""
+
+import os
+import json
+import logging
+from datetime import date
+
+from app.services.phone_index import normalize_phone, valid_phone_sql
+from app.services.reminder_dispatch import ReminderJob, CONTRACT_TEMPLATES
+from app.services.outbox import enqueue_jobs
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_OFFSETS = [90, 60, 30, 7]
+# تذكير فات موعده بأكثر من هذا لا يُرسل (مثلاً بعد توقف الخدمة لفترة طويلة)
+REMINDER_GRACE_DAYS = int(os.getenv("REMINDER_GRACE_DAYS", "3"))
+REMINDER_CLAIM_LIMIT = int(os.getenv("REMINDER_CLAIM_LIMIT", "1000"))
+
+
+def period_for(days_left, offsets=DEFAULT_OFFSETS):
+    """أقرب فترة قالب تغطي الأيام المتبقية: 88 ← '90_days'، 6 ← '7_days'"""
+    for offset in sorted(offsets):
+        if days_left <= offset:
+            return f"{offset}_days"
+    return f"{max(offsets)}_days"
+
+
+# ---------- الملء الجماعي ----------
+
+def backfill_contract_reminders(conn, contract_ids=None, commit=True, grace_days=REMINDER_GRACE_DAYS):
+    """
+    إنشاء صفوف التذكير الناقصة بجملة واحدة لكل العقود النشطة
+    (أو لعقود محددة عبر contract_ids). يعيد عدد الصفوف المضافة
+    التذكير الذي فات موعده ضمن grace_days يُنشأ أيضاً (بنفس حد _DUE_FILTER)
+    فعقد أُضيف قبل انتهائه بـ 5 أيام يحصل على تذكير الـ 7 أيام في الفحص التالي
+    """
+    cursor = conn.cursor()
+    cursor.execute('''
+        INSERT INTO contract_reminders (contract_id, reminder_type, reminder_date, message)
+        SELECT c.id,
+               CASE WHEN o.days <= 7 THEN 'expiry_urgent' ELSE 'expiry_warning' END,
+               c.end_date - o.days,
+               'تنبيه: ينتهي العقد خلال ' || o.days || ' يوم'
+        FROM contracts c
+        CROSS JOIN LATERAL (
+            SELECT DISTINCT (elem->>'days')::INT AS days
+            FROM jsonb_array_elements(COALESCE(c.renewal_reminders, %s::JSONB)) AS elem
+            WHERE elem ? 'days'
+        ) o
+        WHERE c.status = 'active'
+          AND c.end_date - o.days > CURRENT_DATE - %s
+          AND (%s::INT[] IS NULL OR c.id = ANY(%s::INT[]))
+        ON CONFLICT (contract_id, reminder_date) DO NOTHING
+    ''', (
+        json.dumps([{"days": d} for d in DEFAULT_OFFSETS]),
+        grace_days,
+        list(contract_ids) if contract_ids is not None else None,
+        list(contract_ids) if contract_ids is not None else None,
+    ))
+    inserted = cursor.rowcount
+    cursor.close()
+    if commit:
+        conn.commit()
+    return inserted
+
+
+# ---------- المستحق الآن ----------
+
+# رقم المستأجر غير الصالح يُستبعد هنا (لا يُعلَّم التذكير كمرسل وهو لم يُرسل)،
+# وإذا صُحح الرقم ضمن مهلة التأخير يُرسل في الفحص التالي
+_DUE_FILTER = f'''
+    r.is_sent = FALSE
+    AND r.reminder_date <= CURRENT_DATE
+    AND r.reminder_date > CURRENT_DATE - %s
+    AND c.status = 'active'
+    AND t.phone IS NOT NULL
+    AND {valid_phone_sql("t.phone")}
+'''
+
+
+def due_reminders(conn, grace_days=REMINDER_GRACE_DAYS, limit=REMINDER_CLAIM_LIMIT):
+    """معاينة التذكيرات المستحقة دون تعليمها كمرسلة"""
+    cursor = conn.cursor()
+    cursor.execute(f'''
+        SELECT r.id, r.contract_id, r.reminder_type, r.reminder_date,
+               c.end_date, c.end_date - CURRENT_DATE AS days_left, t.name, t.phone
+        FROM contract_reminders r
+        JOIN contracts c ON c.id = r.contract_id
+        JOIN tenants t ON t.id = c.tenant_id
+        WHERE {_DUE_FILTER}
+        ORDER BY r.reminder_date
+        LIMIT %s
+    ''', (grace_days, limit))
+    rows = cursor.fetchall()
+    cursor.close()
+    return rows
+
+
+def claim_due_reminders(conn, grace_days=REMINDER_GRACE_DAYS, limit=REMINDER_CLAIM_LIMIT):
+    """
+    تعليم المستحق كمرسل وإرجاعه بجملة واحدة (بدون commit)
+    آمن مع عدة عمليات: الصفوف المقفلة لدى عملية أخرى تُتخطى
+    """
+    cursor = conn.cursor()
+    cursor.execute(f'''
+        WITH claimed AS (
+            UPDATE contract_reminders cr
+            SET is_sent = TRUE, sent_at = NOW()
+            WHERE cr.id IN (
+                SELECT r.id
+                FROM contract_reminders r
+                JOIN contracts c ON c.id = r.contract_id
+                JOIN tenants t ON t.id = c.tenant_id
+                WHERE {_DUE_FILTER}
+                ORDER BY r.reminder_date
+                LIMIT %s
+                FOR UPDATE OF r SKIP LOCKED
+            )
+            RETURNING cr.id, cr.contract_id, cr.reminder_type, cr.reminder_date
+        )
+        SELECT cl.id, cl.contract_id, cl.reminder_type, cl.reminder_date,
+               c.end_date, c.end_date - CURRENT_DATE AS days_left, t.name, t.phone
+        FROM claimed cl
+        JOIN contracts c ON c.id = cl.contract_id
+        JOIN tenants t ON t.id = c.tenant_id
+    ''', (grace_days, limit))
+    rows = cursor.fetchall()
+    cursor.close()
+    return rows
+
+
+def _release_reminders(conn, reminder_ids):
+    cursor = conn.cursor()
+    cursor.execute(
+        "UPDATE contract_reminders SET is_sent = FALSE, sent_at = NULL WHERE id = ANY(%s)",
+        (list(reminder_ids),)
+    )
+    cursor.close()
+    logger.warning(f"⚠️ {len(reminder_ids)} تذكير مستحق دون رقم صالح، لم يُرسل")
+
+
+def build_jobs(rows):
+    """تحويل صفوف التذكير إلى رسائل جاهزة (القالب حسب الأيام المتبقية)"""
+    jobs = []
+    for reminder_id, contract_id, _, _, end_date, days_left, name, phone in rows:
+        recipient = normalize_phone(phone)
+        if not recipient:
+            continue
+        period = period_for(days_left)
+        jobs.append(ReminderJob(
+            recipient=recipient,
+            message=CONTRACT_TEMPLATES[period](name, end_date, days_left),
+            kind=f"contract_{period}",
+            ref_id=reminder_id,
+        ))
+    return jobs
+
+
+def group_by_period(rows):
+    """نفس شكل نتيجة SmartReminder.check_contract_reminders القديمة"""
+    reminders = {f"{offset}_days": [] for offset in DEFAULT_OFFSETS}
+    for _, contract_id, _, _, end_date, days_left, name, _ in rows:
+        reminders.setdefault(period_for(days_left), []).append({
+            'name': name,
+            'end_date': end_date,
+            'days_left': days_left,
+            'contract_id': contract_id
+        })
+    return reminders
+
+
+def schedule_due_reminders(conn, grace_days=REMINDER_GRACE_DAYS, limit=REMINDER_CLAIM_LIMIT,
+                           backfill=True):
+    """
+    دورة كاملة: ملء الناقص ← استلام المستحق ← إضافته إلى outbox
+    الاستلام والإضافة في معاملة واحدة: إما الاثنان أو لا شيء
+    """
+    backfilled = backfill_contract_reminders(conn, grace_days=grace_days) if backfill else 0
+    try:
+        rows = claim_due_reminders(conn, grace_days, limit)
+        jobs = build_jobs(rows)
+        queued = enqueue_jobs(conn, jobs, dedupe_suffix=date.today().isoformat(), commit=False)
+        unsent = {row[0] for row in rows} - {job.ref_id for job in jobs}
+        if unsent:
+            # احتياط: ما لم يتحول إلى رسالة لا يبقى معلّماً كمرسل
+            _release_reminders(conn, unsent)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    if rows:
+        logger.info(f"🔔 تمت جدولة {queued} تذكير عقد من {len(rows)} مستحق")
+    return {
+        "backfilled": backfilled,
+        "claimed": len(rows),
+        "queued": queued,
+        "skipped": len(rows) - len(jobs),
+    }
@@ -0,0 +1,196 @@
+"""
+تجميع تراكمي لأحداث analytics_events في عدّادات aggregated_metrics
+==================================================================
+كل تشغيل يقرأ الأحداث بعد آخر علامة مُجمّعة فقط ويضيف أعدادها إلى عدّادات
+الساعة واليوم والشهر بـ upsert واحد لكل دفعة، ثم يحرّك العلامة في نفس المعاملة
+(فلا يُحسب حدث مرتين ولا يضيع عند الخطأ).
+
+العلامة هي الزوج (rollup_state.last_xact_id, last_event_id) بترتيب
+(analytics_events.xact_id, id)، والتجميع يتوقف عند أقدم معاملة ما زالت مفتوحة
+(pg_snapshot_xmin): أحداث ما قبلها نهائية، وأي حدث يُكتب لاحقاً يحمل xact_id
+أكبر. id وحده لا يكفي: يُحجز قبل الـ COMMIT، و timestamp بداية المعاملة، فحدث من
+معاملة طويلة يظهر بعد أن تتجاوزه العلامة (ترحيل 20251101000000_rollup_xact_watermark).
+analytics_events مقسم شهرياً: قراءة الدفعة تُحدّ أيضاً بأقدم timestamp بين أحداثها
+(MIN) ليقرأ الاستعلام الأشهر التي فيها أحداث الدفعة فقط.
+
+القراءة (timeseries) من العدّادات مباشرة مع ملء الفترات الفارغة بصفر.
+"""
+
+import os
+import logging
+from datetime import datetime, timedelta
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_NAME = "analytics_events"
+ROLLUP_BATCH_SIZE = int(os.getenv("ROLLUP_BATCH_SIZE", "50000"))
+ROLLUP_TIMEZONE = os.getenv("ROLLUP_TIMEZONE", "Asia/Muscat")
+ROLLUP_PERIODS = ("hour", "day", "month")
+TIMESERIES_MAX_POINTS = 2000
+
+# نوع الحدث -> (اسم المقياس، مفتاح البُعد في details أو None)
+ROLLUP_EVENTS = {
+    "maintenance_create": ("maintenance_requests", "category"),
+    "message_sent": ("messages_sent", "kind"),
+    "payment_overdue": ("payments_overdue", None),
+}
+
+_PERIOD_STEP = {
+    "hour": timedelta(hours=1),
+    "day": timedelta(days=1),
+}
+
+
+def _mapping_values():
+    placeholders = ", ".join(["(%s, %s, %s)"] * len(ROLLUP_EVENTS))
+    params = []
+    for event_type, (metric_type, dimension_key) in ROLLUP_EVENTS.items():
+        params.extend([event_type, metric_type, dimension_key])
+    return placeholders, params
+
+
+def _fold_batch(cursor, after, upto, oldest_ts):
+    """after / upto: (xact_id, id) بداية الدفعة (غير شاملة) ونهايتها (شاملة)"""
+    placeholders, mapping_params = _mapping_values()
+    cursor.execute(f'''
+        WITH mapping (event_type, metric_type, dimension_key) AS (
+            VALUES {placeholders}
+        ),
+        events AS (
+            SELECT m.metric_type,
+                   COALESCE(e.details ->> m.dimension_key, '') AS dimension,
+                   e.timestamp AT TIME ZONE %s AS local_ts
+            FROM analytics_events e
+            JOIN mapping m ON m.event_type = e.event_type
+            WHERE (e.xact_id, e.id) > (%s::xid8, %s)
+              AND (e.xact_id, e.id) <= (%s::xid8, %s)
+              AND e.timestamp >= %s
+        )
+        INSERT INTO aggregated_metrics (metric_type, period, bucket_start, dimension, value, generated_at)
+        SELECT ev.metric_type, p.period,
+               date_trunc(p.period, ev.local_ts) AT TIME ZONE %s,
+               ev.dimension, COUNT(*), NOW()
+        FROM events ev
+        CROSS JOIN unnest(%s::text[]) AS p(period)
+        GROUP BY 1, 2, 3, 4
+        ON CONFLICT (metric_type, period, bucket_start, dimension) WHERE bucket_start IS NOT NULL
+        DO UPDATE SET value = aggregated_metrics.value + EXCLUDED.value,
+                      generated_at = EXCLUDED.generated_at
+    ''', mapping_params + [ROLLUP_TIMEZONE, *after, *upto, oldest_ts,
+                         ROLLUP_TIMEZONE, list(ROLLUP_PERIODS)])
+    return cursor.rowcount
+
+
+def run_rollup(conn, batch_size=ROLLUP_BATCH_SIZE, max_batches=100) -> dict:
+    """تجميع الأحداث النهائية الجديدة حتى اللحاق بالجدول؛ كل دفعة معاملة مستقلة"""
+    cursor = conn.cursor()
+    cursor.execute(
+        "INSERT INTO rollup_state (name) VALUES (%s) ON CONFLICT (name) DO NOTHING", (ROLLUP_NAME,)
+    )
+    conn.commit()
+
+    events = buckets = batches = 0
+    last = (None, None)
+    try:
+        while batches < max_batches:
+            # قفل صف الحالة يمنع تشغيلين متزامنين من عدّ نفس الأحداث
+            cursor.execute(
+                "SELECT last_xact_id, last_event_id FROM rollup_state WHERE name = %s FOR UPDATE",
+                (ROLLUP_NAME,)
+            )
+            last = cursor.fetchone()
+            # أحداث المعاملات الأقدم من أقدم معاملة مفتوحة فقط؛ MIN(timestamp)
+            # يحد قراءة _fold_batch بأقدم حدث في الدفعة
+            cursor.execute('''
+                SELECT COUNT(*), MIN(timestamp), MAX(timestamp),
+                       (array_agg(xact_id ORDER BY xact_id DESC, id DESC))[1],
+                       (array_agg(id ORDER BY xact_id DESC, id DESC))[1]
+                FROM (
+                    SELECT xact_id, id, timestamp FROM analytics_events
+                    WHERE (xact_id, id) > (%s::xid8, %s)
+                      AND xact_id < pg_snapshot_xmin(pg_current_snapshot())
+                    ORDER BY xact_id, id
+                    LIMIT %s
+                ) batch
+            ''', (*last, batch_size))
+            count, oldest_at, upto_at, upto_xact, upto_id = cursor.fetchone()
+            if not count:
+                conn.rollback()
+                break
+
+            upto = (upto_xact, upto_id)
+            buckets += _fold_batch(cursor, last, upto, oldest_at)
+            cursor.execute('''
+                UPDATE rollup_state
+                SET last_xact_id = %s::xid8,
+                    last_event_id = %s,
+                    last_event_at = GREATEST(last_event_at, %s),
+                    updated_at = NOW()
+                WHERE name = %s
+            ''', (upto_xact, upto_id, upto_at, ROLLUP_NAME))
+            conn.commit()
+            events += count
+            batches += 1
+            last = upto
+            if count < batch_size:
+                break
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+    if events:
+        logger.info(f"📈 تجميع الأحداث: {events} حدث في {batches} دفعة ({buckets} عدّاد)، "
+                    f"آخر علامة ({last[0]}, {last[1]})")
+    return {"events": events, "batches": batches, "buckets": buckets,
+            "last_xact_id": last[0], "last_event_id": last[1]}
+
+
+def metric_timeseries(conn, metric_type, period="day", start: Optional[datetime] = None,
+                      end: Optional[datetime] = None, dimension: Optional[str] = None) -> list:
+    """سلسلة زمنية من العدّادات: [{bucket, value}] أو [{bucket, dimension, value}] عند التفصيل بالبعد"""
+    if period not in ROLLUP_PERIODS:
+        raise ValueError(f"الفترة يجب أن تكون واحدة من {', '.join(ROLLUP_PERIODS)}")
+    end = end or datetime.now()
+    start = start or end - {"hour": timedelta(days=2), "day": timedelta(days=30), "month": timedelta(days=365)}[period]
+    step = _PERIOD_STEP.get(period, timedelta(days=31))
+    if (end - start) / step > TIMESERIES_MAX_POINTS:
+        raise ValueError(f"النطاق أكبر من {TIMESERIES_MAX_POINTS} نقطة لهذه الفترة")
+
+    # dimension="*" يفصّل السلسلة حسب البعد (مثلاً فئة الصيانة)
+    by_dimension = dimension == "*"
+    params = [ROLLUP_TIMEZONE, period, start, period, end, f"1 {period}", metric_type, period]
+    dimension_filter = ""
+    if dimension and not by_dimension:
+        dimension_filter = "AND m.dimension = %s"
+        params.append(dimension)
+
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f'''
+            WITH series AS (
+                SELECT g AT TIME ZONE %s AS bucket
+                FROM generate_series(
+                    date_trunc(%s, %s::timestamp),
+                    date_trunc(%s, %s::timestamp),
+                    %s::interval
+                ) g
+            )
+            SELECT s.bucket, {"m.dimension," if by_dimension else ""} COALESCE(SUM(m.value), 0)
+            FROM series s
+            LEFT JOIN aggregated_metrics m
+                   ON m.bucket_start = s.bucket
+                  AND m.metric_type = %s AND m.period = %s {dimension_filter}
+            GROUP BY s.bucket {", m.dimension" if by_dimension else ""}
+            ORDER BY s.bucket
+        ''', params)
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+
+    if by_dimension:
+        return [{"bucket": bucket, "dimension": dim, "value": float(value)}
+                for bucket, dim, value in rows if dim is not None or value]
+    return [{"bucket": bucket, "value": float(value)} for bucket, value in rows]
@@ -0,0 +1,143 @@
+"""
+بحث العقود والمستأجرين: مفهرس، مرتب حسب الصلة، ومقسم لصفحات
+
+بدلاً من LIKE '%term%' على أربعة أعمدة (مسح كامل للجدول ولا يتعرف على
+أشكال الكتابة العربية) يبحث هنا في عمود search_doc المولد:
+- النص مطبّع بـ ar_normalize عند الفهرسة وعند الاستعلام (نفس normalize_text)
+- فهرس GIN بالـ trigrams يخدم LIKE '%...%' و word_similarity (<%)
+- الترتيب: تطابق رقم العقد تماماً أولاً، ثم word_similarity تنازلياً
+- الصفحات بالمؤشر على (score, id) بنفس ترميز app/db/pagination
+
+المصطلح الذي يبدو رقم هاتف (+968 9123-4567) يُبحث بأرقامه فقط.
+ar_normalize وأعمدة search_doc وفهارسها في supabase/migrations/20251026000000_arabic_search.sql.
+"""
+
+import re
+from typing import Optional
+
+from app.db.pagination import Page, clamp_page_size, decode_cursor, encode_cursor
+
+SEARCH_MIN_LENGTH = 2
+_PHONE_LIKE = re.compile(r"^[\d\s+\-()]+$")
+
+def prepare_term(term):
+    """تنظيف المصطلح؛ رقم الهاتف يتحول لأرقامه فقط. None إذا كان أقصر من الحد الأدنى"""
+    term = " ".join((term or "").split())
+    if _PHONE_LIKE.match(term):
+        digits = re.sub(r"\D", "", term)
+        if len(digits) >= 3:
+            return digits
+    return term if len(term) >= SEARCH_MIN_LENGTH else None
+
+
+def match_condition(column="search_doc"):
+    """شرط المطابقة المفهرس (معاملان: المصطلح مرتين)"""
+    return (f"({column} LIKE '%%' || ar_normalize(%s) || '%%' "
+            f"OR ar_normalize(%s) <%% {column})")
+
+
+_contracts_search_doc = None
+
+
+def contracts_have_search_doc(conn):
+    """
+    هل لجدول contracts عمود search_doc؟ الترحيل يضيفه فقط لصيغة ContractsManager
+    (رقم العقد واسم المستأجر في العقد)، لا للمخطط الأساسي. النتيجة محفوظة للعملية
+    """
+    global _contracts_search_doc
+    if _contracts_search_doc is None:
+        cur = conn.cursor()
+        try:
+            cur.execute('''
+                SELECT EXISTS (
+                    SELECT 1 FROM information_schema.columns
+                    WHERE table_schema = ANY(current_schemas(false))
+                      AND table_name = 'contracts' AND column_name = 'search_doc'
+                )
+            ''')
+            _contracts_search_doc = cur.fetchone()[0]
+        finally:
+            cur.close()
+    return _contracts_search_doc
+
+
+def contract_match_condition(conn, term, column="c.id"):
+    """
+    شرط "العقد يطابق المصطلح" لقوائم العقود: اسم المستأجر وهاتفه من tenants دائماً،
+    ورقم العقد والعنوان من search_doc العقد إذا وُجد. UNION بدلاً من OR عبر
+    الجدولين حتى يستخدم كل جزء فهرس trigram الخاص به. يعيد (sql, params)
+    """
+    branches = [f'''SELECT ct.id FROM contracts ct JOIN tenants tt ON tt.id = ct.tenant_id
+                WHERE {match_condition('tt.search_doc')}''']
+    params = [term, term]
+    if contracts_have_search_doc(conn):
+        branches.insert(0, f"SELECT id FROM contracts WHERE {match_condition('search_doc')}")
+        params = [term, term] + params
+    return f"{column} IN (\n    " + "\n    UNION\n    ".join(branches) + "\n)", params
+
+
+def _ranked_page(conn, inner_sql, params, cursor, page_size):
+    page_size = clamp_page_size(page_size)
+    after = decode_cursor(cursor, 2)
+    sql = f"SELECT * FROM ({inner_sql}) s"
+    params = list(params)
+    if after is not None:
+        sql += " WHERE (s.score, s.id) < (%s, %s)"
+        params.extend(after)
+    sql += " ORDER BY s.score DESC, s.id DESC LIMIT %s"
+    params.append(page_size + 1)
+
+    cur = conn.cursor()
+    try:
+        cur.execute(sql, params)
+        rows = cur.fetchall()
+        columns = [col.name for col in cur.description]
+    finally:
+        cur.close()
+
+    items = [dict(zip(columns, row)) for row in rows]
+    next_cursor = None
+    if len(items) > page_size:
+        items = items[:page_size]
+        next_cursor = encode_cursor([items[-1]["score"], items[-1]["id"]])
+    return Page(items=items, page_size=page_size, next_cursor=next_cursor)
+
+
+def search_contracts(conn, term, cursor: Optional[str] = None, page_size: Optional[int] = None,
+                     status: Optional[str] = None) -> Page:
+    """بحث العقود برقم العقد أو اسم المستأجر أو الهاتف أو العنوان"""
+    term = prepare_term(term)
+    if term is None:
+        return Page(items=[], page_size=clamp_page_size(page_size))
+
+    conditions = [match_condition("c.search_doc")]
+    params = [term, term, term, term]
+    if status:
+        conditions.append("c.status = %s")
+        params.append(status)
+
+    inner_sql = f'''
+        SELECT c.id, c.contract_number, c.tenant_name, c.tenant_phone, c.property_address,
+               c.status, c.start_date, c.end_date, c.monthly_rent,
+               (c.end_date - CURRENT_DATE) AS days_remaining,
+               ((CASE WHEN c.contract_number = %s THEN 2 ELSE 0 END)
+                + word_similarity(ar_normalize(%s), c.search_doc))::FLOAT8 AS score
+        FROM contracts c
+        WHERE {" AND ".join(conditions)}
+    '''
+    return _ranked_page(conn, inner_sql, params, cursor, page_size)
+
+
+def search_tenants(conn, term, cursor: Optional[str] = None, page_size: Optional[int] = None) -> Page:
+    """بحث المستأجرين بالاسم أو أي جزء من رقم الهاتف"""
+    term = prepare_term(term)
+    if term is None:
+        return Page(items=[], page_size=clamp_page_size(page_size))
+
+    inner_sql = f'''
+        SELECT t.id, t.name, t.phone, t.created_at,
+               word_similarity(ar_normalize(%s), t.search_doc)::FLOAT8 AS score
+        FROM tenants t
+        WHERE {match_condition("t.search_doc")}
+    '''
+    return _ranked_page(conn, inner_sql, [term, term, term], cursor, page_size)
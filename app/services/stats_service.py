@@ -0,0 +1,66 @@
+"""
+إحصائيات الداشبورد من جدول dashboard_stats
+
+الجدول يُحدّث تراكمياً عبر Triggers (انظر migration dashboard_stats)،
+فالقراءة هنا صفوف قليلة بمفتاح أساسي بدلاً من COUNT/SUM على الجداول الأساسية.
+التصحيح الدوري (refresh_dashboard_stats) يعيد الحساب الكامل ويحدّث
+المفاتيح المعتمدة على التاريخ مثل contracts_expiring_30.
+"""
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+# حالات العقار التي تُعتبر مشغولة (نفسها في calculate_occupancy_rate، migration occupancy_rate_definition)
+OCCUPIED_STATUSES = ("occupied", "rented")
+# حالات الدفعة التي تُعتبر مستلمة ('paid' في enum الجدول، 'completed' من الداشبورد)
+RECEIVED_STATUSES = ("completed", "paid")
+
+
+def _as_number(value):
+    """تحويل NUMERIC إلى int إن كان عدداً صحيحاً"""
+    if value is None:
+        return 0
+    if value == int(value):
+        return int(value)
+    return float(value)
+
+
+def load_dashboard_stats(conn) -> dict:
+    """قراءة كل الإحصائيات مع القيم المشتقة"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT key, value FROM dashboard_stats")
+    raw = {key: _as_number(value) for key, value in cursor.fetchall()}
+    cursor.close()
+
+    properties_count = raw.get("properties_count", 0)
+    occupied = sum(raw.get(f"properties_status_{s}", 0) for s in OCCUPIED_STATUSES)
+
+    return {
+        "clients_count": raw.get("clients_count", 0),
+        "tenants_count": raw.get("tenants_count", 0),
+        "properties_count": properties_count,
+        "contracts_count": raw.get("contracts_count", 0),
+        "payments_count": raw.get("payments_count", 0),
+        "contracts_active": raw.get("contracts_status_active", 0),
+        "contracts_expired": raw.get("contracts_status_expired", 0),
+        "contracts_expiring_30": raw.get("contracts_expiring_30", 0),
+        "properties_occupied": occupied,
+        "properties_by_status": {
+            key[len("properties_status_"):]: value
+            for key, value in raw.items() if key.startswith("properties_status_")
+        },
+        "occupancy_rate": round(occupied * 100 / properties_count, 1) if properties_count else 0,
+        "total_received": sum(raw.get(f"payments_amount_{s}", 0) for s in RECEIVED_STATUSES),
+        "total_pending": raw.get("payments_amount_pending", 0),
+        "total_overdue": raw.get("payments_amount_overdue", 0),
+    }
+
+
+def refresh_dashboard_stats(conn):
+    """إعادة الحساب الكامل من الجداول الأساسية"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT refresh_dashboard_stats()")
+    cursor.close()
+    conn.commit()
+    logger.info("✅ تم تصحيح إحصائيات الداشبورد")
@@ -0,0 +1,205 @@
+"""
+استقبال Webhook واتساب: تأكيد فوري ثم معالجة في الخلفية
+
+Meta تعيد إرسال الـ webhook إذا تأخر الرد، فالمعالجة داخل الطلب تسبب
+رسائل مكررة. هنا مسار الطلب يتحقق من التوقيع والشكل ويضع الحمولة الخام في
+طابور محدود ويعود بـ 200 فوراً؛ والمستهلكون في الخلفية:
+- يفككون كل entry/change/message في الحمولة ويعالجونها بالتوازي
+- يتجاهلون المكرر حسب معرف رسالة واتساب (wamid) عبر مخزن TTL محدود الحجم
+"""
+
+import os
+import hmac
+import time
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict
+
+from app.db.async_db import run_blocking
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+WEBHOOK_QUEUE_SIZE = int(os.getenv("WEBHOOK_QUEUE_SIZE", "10000"))
+WEBHOOK_CONSUMERS = int(os.getenv("WEBHOOK_CONSUMERS", "4"))
+WEBHOOK_DEDUPE_TTL = int(os.getenv("WEBHOOK_DEDUPE_TTL", "86400"))
+WEBHOOK_DEDUPE_MAX = int(os.getenv("WEBHOOK_DEDUPE_MAX", "100000"))
+# إذا عُرّف يتم التحقق من X-Hub-Signature-256 لكل طلب
+META_APP_SECRET = os.getenv("META_APP_SECRET")
+
+
+def verify_signature(raw_body, signature_header, secret=META_APP_SECRET):
+    """التحقق من توقيع HMAC-SHA256 من Meta (يُتجاوز إذا لم يُعرّف السر)"""
+    if not secret:
+        return True
+    if not signature_header or not signature_header.startswith("sha256="):
+        return False
+    expected = hmac.new(secret.encode(), raw_body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature_header[len("sha256="):])
+
+
+def is_valid_payload(body):
+    return (
+        isinstance(body, dict)
+        and body.get("object") == "whatsapp_business_account"
+        and isinstance(body.get("entry"), list)
+    )
+
+
+def iter_messages(body):
+    """كل الرسائل الواردة في الحمولة: (message, value)"""
+    for entry in body.get("entry") or []:
+        for change in entry.get("changes") or []:
+            value = change.get("value") or {}
+            for message in value.get("messages") or []:
+                yield message, value
+
+
+class IdempotencyStore:
+    """مخزن معرفات تمت معالجتها مع صلاحية (TTL) وحد أقصى للحجم"""
+
+    def __init__(self, ttl=WEBHOOK_DEDUPE_TTL, maxsize=WEBHOOK_DEDUPE_MAX):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._seen = OrderedDict()
+
+    def _expire(self, now):
+        # الأقدم في البداية، فالتوقف عند أول مدخل غير منتهٍ كافٍ
+        while self._seen:
+            key, expires_at = next(iter(self._seen.items()))
+            if expires_at > now:
+                break
+            del self._seen[key]
+
+    def add_if_new(self, key):
+        """True إذا كان المعرف جديداً (وتم تسجيله)، False إذا كان مكرراً"""
+        now = time.monotonic()
+        self._expire(now)
+        if key in self._seen:
+            return False
+        self._seen[key] = now + self.ttl
+        if len(self._seen) > self.maxsize:
+            self._seen.popitem(last=False)
+        return True
+
+    def forget(self, key):
+        self._seen.pop(key, None)
+
+    def __len__(self):
+        return len(self._seen)
+
+
+def handle_inbound_message(message, value):
+    """المعالجة الافتراضية لرسالة واردة (متزامنة، تعمل في executor)"""
+    from app.services.message_processor import MessageProcessor
+
+    if message.get("type") != "text":
+        logger.info(f"📎 رسالة من نوع {message.get('type')} من {message.get('from')}")
+        return None
+    result = MessageProcessor().process(
+        message["text"]["body"], message["from"], message_id=message.get("id")
+    )
+    # فشل إضافة الرد إلى outbox يُعامل كفشل معالجة: يُحسب في failed ويُنسى
+    # مفتاح التكرار فتُعالج الرسالة من جديد عندما تعيد Meta إرسالها
+    if result.get("whatsapp_status") == "error":
+        raise RuntimeError(f"تعذر إضافة الرد على {message.get('id')} إلى outbox")
+    return result
+
+
+class WebhookIngestor:
+    """طابور محدود + مستهلكون في الخلفية"""
+
+    def __init__(self, handler=handle_inbound_message, queue_size=WEBHOOK_QUEUE_SIZE,
+                 consumers=WEBHOOK_CONSUMERS, dedupe=None):
+        self.handler = handler
+        self.queue_size = queue_size
+        self.consumers = consumers
+        self.dedupe = dedupe or IdempotencyStore()
+        self._queue = None
+        self._tasks = []
+        self.stats = {
+            "received": 0,
+            "rejected": 0,
+            "messages": 0,
+            "duplicates": 0,
+            "processed": 0,
+            "failed": 0,
+        }
+
+    def start(self):
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._tasks = [asyncio.create_task(self._consume()) for _ in range(self.consumers)]
+
+    async def stop(self, drain_timeout=5):
+        """إيقاف المستهلكين بعد محاولة تفريغ الطابور"""
+        if self._queue is not None:
+            try:
+                await asyncio.wait_for(self._queue.join(), drain_timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"⚠️ إيقاف webhook مع {self._queue.qsize()} حمولة غير معالجة")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, body):
+        """وضع الحمولة في الطابور دون انتظار؛ False إذا كان ممتلئاً أو غير مشغل"""
+        if self._queue is None:
+            return False
+        try:
+            self._queue.put_nowait(body)
+        except asyncio.QueueFull:
+            self.stats["rejected"] += 1
+            return False
+        self.stats["received"] += 1
+        return True
+
+    async def _process_message(self, message, value):
+        message_id = message.get("id")
+        if message_id and not self.dedupe.add_if_new(message_id):
+            self.stats["duplicates"] += 1
+            return
+        self.stats["messages"] += 1
+        try:
+            await run_blocking(self.handler, message, value)
+            self.stats["processed"] += 1
+        except Exception as e:
+            self.stats["failed"] += 1
+            # السماح بإعادة المعالجة إذا أعادت Meta الإرسال
+            if message_id:
+                self.dedupe.forget(message_id)
+            logger.error(f"❌ خطأ في معالجة رسالة {message_id}: {e}")
+
+    async def _consume(self):
+        while True:
+            body = await self._queue.get()
+            try:
+                await asyncio.gather(*(
+                    self._process_message(message, value)
+                    for message, value in iter_messages(body)
+                ))
+            except Exception as e:
+                logger.error(f"❌ خطأ في معالجة حمولة webhook: {e}")
+            finally:
+                self._queue.task_done()
+
+    def snapshot(self):
+        return {
+            **self.stats,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "queue_size": self.queue_size,
+            "dedupe_entries": len(self.dedupe),
+        }
+
+
+ingestor = WebhookIngestor()
+
+metrics.callback("webhook_queue_depth", "حمولات webhook في الطابور",
+                 lambda: ingestor.snapshot()["queue_depth"])
+metrics.callback("webhook_queue_size", "سعة طابور webhook", lambda: ingestor.queue_size)
+metrics.callback(
+    "webhook_events_total", "أحداث استقبال webhook حسب النوع",
+    lambda: {(key,): value for key, value in ingestor.stats.items()},
+    labelnames=["event"], kind="counter"
+)
@@ -1,45 +1,191 @@
 import requests
+import httpx
+import asyncio
 import logging
 import os
+import time
+
+from app.utils.metrics import metrics
+from app.utils.request_timing import record_phase
 
 logger = logging.getLogger(__name__)
 
+SEND_LATENCY = metrics.histogram(
+    "whatsapp_send_duration_seconds", "زمن طلب الإرسال إلى Graph API حسب النتيجة", ["client", "outcome"]
+)
+SEND_ERRORS = metrics.counter("whatsapp_send_errors_total", "أخطاء الإرسال حسب رمز HTTP", ["code"])
+
+
+def _record_send(client, started, status_code=None, transport_error=False):
+    if transport_error:
+        outcome, code = "transport_error", "none"
+    elif status_code == 200:
+        outcome, code = "success", None
+    else:
+        outcome, code = "http_error", str(status_code)
+    elapsed = time.perf_counter() - started
+    SEND_LATENCY.labels(client, outcome).observe(elapsed)
+    record_phase("external_http", elapsed)
+    if code is not None:
+        SEND_ERRORS.labels(code).inc()
+
+# عنوان Graph API قابل للتغيير لتوجيه الإرسال إلى خادم محاكاة محلي (app.py)
+GRAPH_BASE_URL = os.getenv("WHATSAPP_API_BASE_URL", "https://graph.facebook.com")
+GRAPH_API_VERSION = os.getenv("WHATSAPP_API_VERSION", "v17.0")
+
+# مهلة الاتصال منفصلة عن مهلة القراءة: فشل الاتصال يجب أن يظهر بسرعة
+CONNECT_TIMEOUT = float(os.getenv("WHATSAPP_CONNECT_TIMEOUT", "3"))
+READ_TIMEOUT = float(os.getenv("WHATSAPP_READ_TIMEOUT", "10"))
+MAX_CONCURRENCY = int(os.getenv("WHATSAPP_MAX_CONCURRENCY", "20"))
+
+
+def _messages_url(phone_number_id, base_url=None):
+    return f"{(base_url or GRAPH_BASE_URL).rstrip('/')}/{GRAPH_API_VERSION}/{phone_number_id}/messages"
+
+
+def _text_payload(recipient, message):
+    return {
+        "messaging_product": "whatsapp",
+        "to": recipient,
+        "type": "text",
+        "text": {"body": message}
+    }
+
+
 class WhatsAppAPI:
-    """فئة للتعامل مع API واتساب"""
-    
-    def __init__(self, access_token, phone_number_id):
+    """فئة للتعامل مع API واتساب (متزامنة، مع جلسة HTTP دائمة)"""
+
+    def __init__(self, access_token, phone_number_id, base_url=None):
         self.access_token = access_token
         self.phone_number_id = phone_number_id
-        self.base_url = f"https://graph.facebook.com/v17.0/{phone_number_id}/messages"
+        self.base_url = _messages_url(phone_number_id, base_url)
         self.headers = {
             'Authorization': f'Bearer {access_token}',
             'Content-Type': 'application/json'
         }
-    
+        # جلسة واحدة تعيد استخدام اتصالات TCP/TLS بدلاً من اتصال جديد لكل رسالة
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=MAX_CONCURRENCY)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update(self.headers)
+
     def send_message(self, recipient, message):
         """إرسال رسالة نصية"""
+        started = time.perf_counter()
         try:
-            payload = {
-                "messaging_product": "whatsapp",
-                "to": recipient,
-                "type": "text",
-                "text": {"body": message}
-            }
-            
-            response = requests.post(
+            response = self.session.post(
                 self.base_url,
-                json=payload,
-                headers=self.headers,
-                timeout=10
+                json=_text_payload(recipient, message),
+                timeout=(CONNECT_TIMEOUT, READ_TIMEOUT)
             )
-            
+            _record_send("sync", started, response.status_code)
+
             if response.status_code == 200:
                 logger.info(f"تم إرسال رسالة إلى {recipient}: {message}")
                 return {"status": "success", "data": response.json()}
             else:
                 logger.error(f"فشل إرسال الرسالة: {response.status_code} - {response.text}")
                 return {"status": "error", "message": response.text}
-                
+
         except requests.exceptions.RequestException as e:
+            _record_send("sync", started, transport_error=True)
             logger.error(f"خطأ في الاتصال بـ WhatsApp API: {str(e)}")
-            return {"status": "error", "message": str(e)}
\ No newline at end of file
+            return {"status": "error", "message": str(e)}
+
+    def close(self):
+        self.session.close()
+
+
+class AsyncWhatsAppAPI:
+    """
+    عميل واتساب غير حاجب
+    - اتصال HTTP دائم مع مجمع keep-alive (httpx.AsyncClient)
+    - حد أقصى للطلبات المتزامنة (max_concurrency)
+    - مهلة اتصال ومهلة قراءة منفصلتان
+    - send_many للإرسال الجماعي
+    """
+
+    def __init__(self, access_token, phone_number_id, base_url=None,
+                 max_concurrency=MAX_CONCURRENCY, connect_timeout=CONNECT_TIMEOUT,
+                 read_timeout=READ_TIMEOUT, transport=None):
+        self.phone_number_id = phone_number_id
+        self.url = _messages_url(phone_number_id, base_url)
+        self.max_concurrency = max_concurrency
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._client = httpx.AsyncClient(
+            headers={
+                'Authorization': f'Bearer {access_token}',
+                'Content-Type': 'application/json'
+            },
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout, pool=read_timeout),
+            limits=httpx.Limits(
+                max_connections=max_concurrency,
+                max_keepalive_connections=max_concurrency,
+                keepalive_expiry=60
+            ),
+            transport=transport
+        )
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+    async def aclose(self):
+        await self._client.aclose()
+
+    async def send_payload(self, payload):
+        """إرسال payload جاهز (نص، قالب، ...) إلى Graph API"""
+        recipient = payload.get("to")
+        async with self._semaphore:
+            started = time.perf_counter()
+            try:
+                response = await self._client.post(self.url, json=payload)
+            except httpx.HTTPError as e:
+                _record_send("async", started, transport_error=True)
+                logger.error(f"خطأ في الاتصال بـ WhatsApp API: {str(e)}")
+                return {"status": "error", "message": str(e) or e.__class__.__name__}
+            _record_send("async", started, response.status_code)
+
+        if response.status_code == 200:
+            logger.info(f"تم إرسال رسالة إلى {recipient}")
+            return {"status": "success", "data": response.json()}
+        logger.error(f"فشل إرسال الرسالة: {response.status_code} - {response.text}")
+        return {"status": "error", "code": response.status_code, "message": response.text}
+
+    async def send_message(self, recipient, message):
+        """إرسال رسالة نصية"""
+        return await self.send_payload(_text_payload(recipient, message))
+
+    async def send_many(self, messages):
+        """
+        إرسال جماعي: messages قائمة أزواج (رقم، نص)
+        يعيد النتائج بنفس الترتيب؛ التزامن محدود بـ max_concurrency
+        """
+        return await asyncio.gather(*(
+            self.send_message(recipient, message) for recipient, message in messages
+        ))
+
+
+_async_client = None
+
+
+def get_async_whatsapp_client():
+    """عميل واتساب غير حاجب مشترك على مستوى العملية (يُنشأ عند أول استخدام)"""
+    global _async_client
+    if _async_client is None:
+        access_token = os.getenv("META_ACCESS_TOKEN")
+        phone_number_id = os.getenv("META_PHONE_ID")
+        if not access_token or not phone_number_id:
+            raise RuntimeError("META_ACCESS_TOKEN و META_PHONE_ID غير معرّفين")
+        _async_client = AsyncWhatsAppAPI(access_token, phone_number_id)
+    return _async_client
+
+
+async def close_async_whatsapp_client():
+    global _async_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
@@ -0,0 +1,391 @@
+"""
+سجل مقاييس داخل العملية بصيغة Prometheus النصية (GET /metrics)
+==============================================================
+- Counter / Histogram بقيم مجزأة لكل خيط (thread-local shards): الكتابة
+  في المسار الساخن زيادة عنصر في قائمة الخيط نفسه دون أي قفل، والجمع
+  عبر الخيوط يتم فقط عند القراءة (scrape).
+- Histogram بحدود دلاء ثابتة مسبقاً؛ observe = bisect + زيادتان.
+- Gauge عادي (set/inc) أو بدالة تُستدعى عند القراءة (مثل حالة المجمع وعمق الطابور).
+
+الاستخدام:
+    REQUESTS = metrics.counter("app_requests_total", "عدد الطلبات", ["route"])
+    REQUESTS.labels("/health").inc()
+    LATENCY = metrics.histogram("app_latency_seconds", "الزمن", ["route"])
+    LATENCY.labels("/health").observe(0.012)
+"""
+
+import math
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from app.db.instrumentation import add_query_observer, query_text
+from app.db.database import peek_pool
+
+# حدود الدلاء الافتراضية بالثواني (من 1ms إلى 10s)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class _Shards:
+    """قيم مجزأة لكل خيط: الكتابة بلا قفل، والقراءة تجمع كل الأجزاء"""
+
+    __slots__ = ("_size", "_local", "_all")
+
+    def __init__(self, size):
+        self._size = size
+        self._local = threading.local()
+        self._all: List[List[float]] = []
+
+    def local(self) -> List[float]:
+        shard = getattr(self._local, "values", None)
+        if shard is None:
+            shard = self._local.values = [0.0] * self._size
+            # list.append ذري في CPython
+            self._all.append(shard)
+        return shard
+
+    def totals(self) -> List[float]:
+        totals = [0.0] * self._size
+        for shard in list(self._all):
+            for index, value in enumerate(shard):
+                totals[index] += value
+        return totals
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if value == int(value):
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name, documentation, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        if not self.labelnames:
+            self._default = self.labels()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name}: عدد قيم التصنيفات لا يطابق {self.labelnames}")
+            child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def expose(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class _CounterChild:
+    __slots__ = ("_shards",)
+
+    def __init__(self):
+        self._shards = _Shards(1)
+
+    def inc(self, amount=1.0):
+        self._shards.local()[0] += amount
+
+    def value(self):
+        return self._shards.totals()[0]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1.0):
+        self._default.inc(amount)
+
+    def samples(self):
+        for key, child in list(self._children.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(child.value())}"
+
+
+class _HistogramChild:
+    __slots__ = ("_bounds", "_shards")
+
+    def __init__(self, bounds):
+        self._bounds = bounds
+        # الدلاء + (+Inf) + المجموع
+        self._shards = _Shards(len(bounds) + 2)
+
+    def observe(self, value):
+        shard = self._shards.local()
+        shard[bisect_left(self._bounds, value)] += 1
+        shard[-1] += value
+
+    def time(self):
+        return _Timer(self)
+
+    def snapshot(self):
+        totals = self._shards.totals()
+        return totals[:-1], totals[-1]
+
+
+class _Timer:
+    __slots__ = ("_child", "_started")
+
+    def __init__(self, child):
+        self._child = child
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._child.observe(time.perf_counter() - self._started)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames: Sequence[str] = (), buckets=DEFAULT_BUCKETS):
+        self.bounds = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.bounds)
+
+    def observe(self, value):
+        self._default.observe(value)
+
+    def time(self):
+        return self._default.time()
+
+    def samples(self):
+        uppers = self.bounds + (math.inf,)
+        for key, child in list(self._children.items()):
+            counts, total = child.snapshot()
+            cumulative = 0.0
+            for upper, count in zip(uppers, counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, ("le", _format_value(upper)))
+                yield f"{self.name}_bucket{labels} {_format_value(cumulative)}"
+            labels = _format_labels(self.labelnames, key)
+            yield f"{self.name}_sum{labels} {_format_value(total)}"
+            yield f"{self.name}_count{labels} {_format_value(cumulative)}"
+
+
+class _GaugeChild:
+    __slots__ = ("_value",)
+
+    def __init__(self):
+        self._value = 0.0
+
+    def set(self, value):
+        self._value = float(value)
+
+    def inc(self, amount=1.0):
+        self._value += amount
+
+    def dec(self, amount=1.0):
+        self._value -= amount
+
+    def value(self):
+        return self._value
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value):
+        self._default.set(value)
+
+    def inc(self, amount=1.0):
+        self._default.inc(amount)
+
+    def dec(self, amount=1.0):
+        self._default.dec(amount)
+
+    def samples(self):
+        for key, child in list(self._children.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(child.value())}"
+
+
+class CallbackMetric(_Metric):
+    """قيم تُحسب عند القراءة: الدالة تعيد رقماً أو {(قيم التصنيفات): رقم}"""
+
+    def __init__(self, name, documentation, callback: Callable, labelnames: Sequence[str] = (),
+                 kind="gauge"):
+        self.kind = kind
+        self._callback = callback
+        self.labelnames = tuple(labelnames)
+        self.name = name
+        self.documentation = documentation
+
+    def samples(self):
+        try:
+            values = self._callback()
+        except Exception:
+            return
+        if values is None:
+            return
+        if not isinstance(values, dict):
+            values = {(): values}
+        for key, value in values.items():
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        # التسجيل مرة واحدة عند الاستيراد؛ إعادة التسجيل تعيد المقياس الموجود
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, documentation, labelnames=()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge(self, name, documentation, labelnames=()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def callback(self, name, documentation, callback, labelnames=(), kind="gauge") -> CallbackMetric:
+        return self._register(CallbackMetric(name, documentation, callback, labelnames, kind))
+
+    def get(self, name) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def expose(self) -> str:
+        return "\n".join(metric.expose() for metric in list(self._metrics.values())) + "\n"
+
+
+metrics = MetricsRegistry()
+
+
+# ---------- مقاييس HTTP ----------
+
+HTTP_LATENCY = metrics.histogram(
+    "http_request_duration_seconds", "زمن معالجة الطلب حسب المسار", ["method", "route", "status"]
+)
+HTTP_IN_FLIGHT = metrics.gauge("http_requests_in_flight", "الطلبات قيد المعالجة")
+
+
+def _route_template(scope):
+    route = scope.get("route")
+    path = getattr(route, "path", None)
+    # المسارات غير المعروفة تُجمع في تصنيف واحد حتى لا تنفجر التصنيفات
+    return path or "<unmatched>"
+
+
+class MetricsMiddleware:
+    """Middleware بصيغة ASGI خام (أخف من BaseHTTPMiddleware ولا يخزن الاستجابة)"""
+
+    def __init__(self, app, exclude=("/metrics",)):
+        self.app = app
+        self.exclude = set(exclude)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope.get("path") in self.exclude:
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            HTTP_LATENCY.labels(scope["method"], _route_template(scope), status).observe(
+                time.perf_counter() - started
+            )
+
+
+# ---------- مقاييس قاعدة البيانات ----------
+
+DB_QUERY_LATENCY = metrics.histogram(
+    "db_query_duration_seconds", "زمن الاستعلام حسب نوع العملية", ["operation"]
+)
+DB_QUERY_ERRORS = metrics.counter("db_query_errors_total", "الاستعلامات الفاشلة", ["operation"])
+
+_OPERATIONS = {"SELECT", "INSERT", "UPDATE", "DELETE", "WITH", "COPY", "CREATE", "ALTER",
+               "DROP", "BEGIN", "COMMIT", "ROLLBACK", "DECLARE", "FETCH", "CLOSE"}
+
+
+def query_operation(query) -> str:
+    text = query_text(query).lstrip(" \t\r\n(")
+    verb = text[:10].split(None, 1)[0].upper() if text else ""
+    return verb if verb in _OPERATIONS else "OTHER"
+
+
+def _observe_query(query, duration, error, rows):
+    operation = query_operation(query)
+    DB_QUERY_LATENCY.labels(operation).observe(duration)
+    if error is not None:
+        DB_QUERY_ERRORS.labels(operation).inc()
+
+
+add_query_observer(_observe_query)
+
+
+def _pool_stats():
+    pool = peek_pool()
+    if pool is None:
+        return None
+    return pool.stats()
+
+
+def _pool_gauge(key):
+    def read():
+        stats = _pool_stats()
+        return stats[key] if stats else None
+    return read
+
+
+metrics.callback("db_pool_connections_in_use", "اتصالات المجمع المستخدمة", _pool_gauge("in_use"))
+metrics.callback("db_pool_connections_idle", "اتصالات المجمع الخاملة", _pool_gauge("idle"))
+metrics.callback("db_pool_connections_total", "كل اتصالات المجمع", _pool_gauge("total"))
+metrics.callback("db_pool_max_size", "الحد الأقصى للمجمع", _pool_gauge("max_size"))
+metrics.callback("db_pool_waiting", "الخيوط المنتظرة لاتصال", _pool_gauge("waiting"))
+metrics.callback("db_pool_checkouts_total", "مرات سحب اتصال", _pool_gauge("checkouts"), kind="counter")
+metrics.callback("db_pool_timeouts_total", "انتهاء مهلة السحب", _pool_gauge("timeouts"), kind="counter")
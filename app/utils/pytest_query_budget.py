@@ -0,0 +1,106 @@
+"""
+إضافة pytest: حد أقصى لعدد الاستعلامات في كل طلب HTTP
+=======================================================
+تفشل الاختبار إذا نفذ أي طلب أثناءه (عبر TestClient على app.main.app أو أي
+تطبيق يستخدم RequestTimingMiddleware) استعلامات أكثر من الحد المسموح لمساره.
+
+التفعيل:
+    pytest -p app.utils.pytest_query_budget
+أو في conftest.py:
+    pytest_plugins = ["app.utils.pytest_query_budget"]
+
+الحدود في pytest.ini (المفتاح "METHOD route" أو route فقط، بقالب المسار):
+    [pytest]
+    query_budget = 20
+    query_budgets =
+        GET /dashboard/contracts/ = 4
+        /api/tenants/{tenant_id} = 3
+    query_budget_n_plus_one = true
+
+أو لاختبار واحد:
+    @pytest.mark.query_budget(5)
+    @pytest.mark.query_budget(routes={"GET /dashboard/": 6})
+
+--query-budget=N يغيّر الحد الافتراضي من سطر الأوامر (0 = بلا حد).
+"""
+
+from typing import Dict, Optional
+
+import pytest
+
+from app.db.query_stats import query_stats
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("query_budget", "حد الاستعلامات لكل طلب")
+    group.addoption("--query-budget", type=int, default=None,
+                    help="الحد الافتراضي لعدد الاستعلامات في الطلب الواحد (0 = بلا حد)")
+    parser.addini("query_budget", "الحد الافتراضي لعدد الاستعلامات في الطلب الواحد", default="0")
+    parser.addini("query_budgets", "حدود لكل مسار: 'METHOD route = N' أو 'route = N'",
+                  type="linelist", default=[])
+    parser.addini("query_budget_n_plus_one", "إفشال الاختبار عند اكتشاف N+1",
+                  type="bool", default=False)
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        "markers",
+        "query_budget(limit=None, routes=None, n_plus_one=None): حد الاستعلامات لكل طلب في هذا الاختبار",
+    )
+
+
+def _parse_budgets(lines) -> Dict[str, int]:
+    budgets = {}
+    for line in lines:
+        if "=" not in line:
+            raise pytest.UsageError(f"query_budgets: سطر غير صالح '{line}' (المطلوب route = N)")
+        key, value = line.rsplit("=", 1)
+        budgets[key.strip()] = int(value)
+    return budgets
+
+
+def _budget_for(budgets: Dict[str, int], default: int, method: str, route: str) -> Optional[int]:
+    for key in (f"{method} {route}", route):
+        if key in budgets:
+            return budgets[key]
+    return default or None
+
+
+@pytest.hookimpl(wrapper=True)
+def pytest_runtest_call(item):
+    config = item.config
+    default = config.getoption("--query-budget")
+    if default is None:
+        default = int(config.getini("query_budget") or 0)
+    budgets = _parse_budgets(config.getini("query_budgets"))
+    fail_n_plus_one = config.getini("query_budget_n_plus_one")
+
+    marker = item.get_closest_marker("query_budget")
+    if marker is not None:
+        if marker.args:
+            default = marker.args[0]
+        if "limit" in marker.kwargs:
+            default = marker.kwargs["limit"]
+        budgets.update(marker.kwargs.get("routes") or {})
+        if marker.kwargs.get("n_plus_one") is not None:
+            fail_n_plus_one = marker.kwargs["n_plus_one"]
+
+    violations = []
+
+    def check(method, route, queries, findings):
+        limit = _budget_for(budgets, default, method, route)
+        if limit is not None and queries > limit:
+            violations.append(f"{method} {route}: {queries} استعلام (الحد {limit})")
+        if fail_n_plus_one:
+            for finding in findings:
+                violations.append(f"{method} {route}: N+1 {finding['calls']}× {finding['sql']}")
+
+    query_stats.add_request_listener(check)
+    try:
+        result = yield
+    finally:
+        query_stats.remove_request_listener(check)
+
+    if violations:
+        pytest.fail("تجاوز حد الاستعلامات:\n  " + "\n  ".join(violations), pytrace=False)
+    return result
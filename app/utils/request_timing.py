@@ -0,0 +1,250 @@
+"""
+توزيع زمن كل طلب على مراحله + سجل الطلبات البطيئة
+==================================================
+RequestTimingMiddleware يفتح مؤقتاً لكل طلب HTTP (في contextvar يصل إلى
+خيوط run_db وخيوط المسارات المتزامنة) وتضيف إليه نقاط القياس زمنها:
+
+- db_connect: سحب اتصال من المجمع (database.db_connection)، ويشمل إنشاء
+  الاتصال وفحص صحته عند الحاجة
+- db_query: كل execute/executemany (مراقب في app.db.instrumentation)
+- template_render: رسم قوالب Jinja (instrument_templates)
+- external_http: طلبات WhatsApp API (whatsapp_api._record_send)
+- other: الباقي من زمن الطلب
+
+في نهاية الطلب تُمرر استعلاماته إلى app.db.query_stats (عدد الاستعلامات لكل
+مسار وكشف N+1).
+
+النتيجة تُرسل في ترويسة Server-Timing (تظهر في تبويب Network في المتصفح)،
+والطلبات الأبطأ من SLOW_REQUEST_MS تُكتب سطراً JSON في سجل دوّار
+(SLOW_REQUEST_LOG) مع المسار ومراحل الزمن وبصمات الاستعلامات.
+
+الاستعلامات من خيوط متعددة لنفس الطلب قد تتداخل زمنياً، لذلك قد يتجاوز
+مجموع المراحل زمن الطلب؛ other لا يقل عن صفر.
+"""
+
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+from typing import Dict, Optional
+
+import jinja2
+
+from app.db.instrumentation import add_query_observer, query_text
+from app.db.query_stats import query_stats
+from app.utils.sql_fingerprint import fingerprint, fingerprint_id
+
+logger = logging.getLogger(__name__)
+
+PHASES = ("db_connect", "db_query", "template_render", "external_http")
+
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "1000"))
+SLOW_REQUEST_LOG = os.getenv("SLOW_REQUEST_LOG", "logs/slow_requests.log")
+SLOW_REQUEST_LOG_BYTES = int(os.getenv("SLOW_REQUEST_LOG_BYTES", str(10 * 1024 * 1024)))
+SLOW_REQUEST_LOG_BACKUPS = int(os.getenv("SLOW_REQUEST_LOG_BACKUPS", "5"))
+# أقصى عدد بصمات تُكتب لكل طلب بطيء (الأطول زمناً أولاً)
+SLOW_REQUEST_MAX_QUERIES = 20
+
+
+class RequestTimer:
+    """أزمنة مراحل طلب واحد والاستعلامات التي نفذها"""
+
+    __slots__ = ("started", "phases", "queries", "_lock")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases: Dict[str, float] = dict.fromkeys(PHASES, 0.0)
+        # نص الاستعلام (بمعاملات %s وليس القيم) -> [العدد، الزمن، الأخطاء، الصفوف]
+        self.queries: Dict[str, list] = {}
+        self._lock = threading.Lock()
+
+    def add(self, phase: str, seconds: float):
+        with self._lock:
+            self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def add_query(self, query: str, seconds: float, failed: bool, rows=None):
+        with self._lock:
+            self.phases["db_query"] += seconds
+            entry = self.queries.get(query)
+            if entry is None:
+                entry = self.queries[query] = [0, 0.0, 0, 0]
+            entry[0] += 1
+            entry[1] += seconds
+            if failed:
+                entry[2] += 1
+            if rows:
+                entry[3] += rows
+
+    def breakdown(self, total: float) -> Dict[str, float]:
+        """المراحل بالملي ثانية مع other و total"""
+        with self._lock:
+            phases = dict(self.phases)
+        result = {name: round(seconds * 1000, 3) for name, seconds in phases.items()}
+        result["other"] = round(max(total - sum(phases.values()), 0.0) * 1000, 3)
+        result["total"] = round(total * 1000, 3)
+        return result
+
+    def query_summary(self, limit=SLOW_REQUEST_MAX_QUERIES) -> list:
+        """الاستعلامات مجمعة حسب البصمة، الأطول زمناً أولاً"""
+        with self._lock:
+            queries = list(self.queries.items())
+        grouped = {}
+        for query, (count, seconds, errors, rows) in queries:
+            fp = fingerprint(query)
+            entry = grouped.get(fp)
+            if entry is None:
+                entry = grouped[fp] = {"id": fingerprint_id(query), "sql": fp,
+                                       "calls": 0, "ms": 0.0, "errors": 0, "rows": 0}
+            entry["calls"] += count
+            entry["ms"] += seconds * 1000
+            entry["errors"] += errors
+            entry["rows"] += rows
+        summary = sorted(grouped.values(), key=lambda item: item["ms"], reverse=True)[:limit]
+        for entry in summary:
+            entry["ms"] = round(entry["ms"], 3)
+        return summary
+
+
+_current: contextvars.ContextVar[Optional[RequestTimer]] = contextvars.ContextVar(
+    "request_timer", default=None
+)
+
+
+def current_timer() -> Optional[RequestTimer]:
+    return _current.get()
+
+
+def record_phase(phase: str, seconds: float):
+    """إضافة زمن إلى مرحلة في الطلب الحالي (لا شيء خارج الطلبات)"""
+    timer = _current.get()
+    if timer is not None:
+        timer.add(phase, seconds)
+
+
+@contextmanager
+def timed_phase(phase: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_phase(phase, time.perf_counter() - started)
+
+
+def _observe_query(query, duration, error, rows):
+    timer = _current.get()
+    if timer is not None:
+        timer.add_query(query_text(query), duration, error is not None, rows)
+
+
+add_query_observer(_observe_query)
+
+
+# ---------- قوالب Jinja ----------
+
+class _TimedTemplate(jinja2.Template):
+    def render(self, *args, **kwargs):
+        with timed_phase("template_render"):
+            return super().render(*args, **kwargs)
+
+
+def instrument_templates(templates):
+    """قياس رسم قوالب Jinja2Templates (يُستدعى بعد إنشائها وقبل أول قالب)"""
+    templates.env.template_class = _TimedTemplate
+    return templates
+
+
+# ---------- سجل الطلبات البطيئة ----------
+
+_slow_logger = None
+_slow_logger_lock = threading.Lock()
+
+
+def _get_slow_logger() -> logging.Logger:
+    global _slow_logger
+    if _slow_logger is None:
+        with _slow_logger_lock:
+            if _slow_logger is None:
+                slow = logging.getLogger("slow_requests")
+                slow.setLevel(logging.INFO)
+                slow.propagate = False
+                directory = os.path.dirname(SLOW_REQUEST_LOG)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                handler = RotatingFileHandler(
+                    SLOW_REQUEST_LOG,
+                    maxBytes=SLOW_REQUEST_LOG_BYTES,
+                    backupCount=SLOW_REQUEST_LOG_BACKUPS,
+                    encoding="utf-8",
+                )
+                handler.setFormatter(logging.Formatter("%(message)s"))
+                slow.addHandler(handler)
+                _slow_logger = slow
+    return _slow_logger
+
+
+def _log_slow_request(record: dict):
+    try:
+        _get_slow_logger().info(json.dumps(record, ensure_ascii=False, default=str))
+    except Exception as e:
+        logger.error(f"❌ فشل كتابة سجل الطلبات البطيئة: {e}")
+
+
+def _server_timing(breakdown: Dict[str, float]) -> bytes:
+    return ", ".join(f"{name};dur={ms}" for name, ms in breakdown.items()).encode("latin-1")
+
+
+def _route_path(scope):
+    route = scope.get("route")
+    return getattr(route, "path", None) or "<unmatched>"
+
+
+class RequestTimingMiddleware:
+    """Middleware بصيغة ASGI خام: ترويسة Server-Timing + سجل الطلبات البطيئة"""
+
+    def __init__(self, app, slow_ms: float = SLOW_REQUEST_MS, exclude=("/metrics",)):
+        self.app = app
+        self.slow_ms = slow_ms
+        self.exclude = set(exclude)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope.get("path") in self.exclude:
+            await self.app(scope, receive, send)
+            return
+
+        timer = RequestTimer()
+        token = _current.set(timer)
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                # الترويسة تعكس الزمن حتى بداية الاستجابة
+                breakdown = timer.breakdown(time.perf_counter() - timer.started)
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", _server_timing(breakdown)))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            total = time.perf_counter() - timer.started
+            route = _route_path(scope)
+            n_plus_one = query_stats.record_request(scope["method"], route, timer)
+            if total * 1000 >= self.slow_ms:
+                _log_slow_request({
+                    "ts": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                    "method": scope["method"],
+                    "route": route,
+                    "path": scope.get("path"),
+                    "status": status,
+                    "phases_ms": timer.breakdown(total),
+                    "queries": timer.query_summary(),
+                    "n_plus_one": n_plus_one,
+                })
@@ -0,0 +1,54 @@
+"""
+بصمة استعلامات SQL
+==================
+تحويل نص الاستعلام إلى شكل ثابت لا يتغير بتغير القيم، لتجميع الاستعلامات
+المتشابهة في سجل الطلبات البطيئة والإحصائيات:
+
+    SELECT * FROM tenants WHERE id = 15 AND name = 'علي'
+    -> select * from tenants where id = ? and name = ?
+
+- القيم النصية والرقمية ومعاملات psycopg2 (%s و %(name)s و $1) تصبح ?
+- قوائم IN (...) و VALUES (...), (...) تُختصر إلى عنصر واحد
+- التعليقات تُحذف والمسافات تُوحّد والكلمات تصبح بأحرف صغيرة
+"""
+
+import hashlib
+import re
+from functools import lru_cache
+
+# النصوص والتعليقات في مرور واحد حتى لا يُقرأ -- داخل نص كتعليق
+_STRINGS_COMMENTS = re.compile(r"(?:\b[eE])?'(?:[^']|'')*'|--[^\n]*|/\*.*?\*/", re.S)
+_QUOTED_IDENT = re.compile(r'"(?:[^"]|"")*"')
+_PLACEHOLDERS = re.compile(r"%\([^)]+\)s|%s|\$\d+")
+_NUMBERS = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?\b")
+_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_ROWS = re.compile(r"(\(\?\))(?:\s*,\s*\(\?\))+")
+_SPACES = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=2048)
+def fingerprint(query: str) -> str:
+    """الشكل الثابت للاستعلام (القيم مستبدلة بـ ?)"""
+    text = _STRINGS_COMMENTS.sub(lambda m: "?" if m.group(0).endswith("'") else " ", query)
+
+    # أسماء الأعمدة بين علامات تنصيص تبقى كما هي (لا تُحوّل لأحرف صغيرة)
+    idents = []
+
+    def _keep(match):
+        idents.append(match.group(0))
+        return f"\x00i{len(idents) - 1}\x00"
+
+    text = _QUOTED_IDENT.sub(_keep, text)
+    text = _PLACEHOLDERS.sub("?", text)
+    text = _NUMBERS.sub("?", text)
+    text = _LISTS.sub("(?)", text)
+    text = _ROWS.sub(r"\1", text)
+    text = _SPACES.sub(" ", text).strip().rstrip(";").strip().lower()
+    if idents:
+        text = re.sub(r"\x00i(\d+)\x00", lambda m: idents[int(m.group(1))], text)
+    return text
+
+
+def fingerprint_id(query: str) -> str:
+    """معرّف قصير للبصمة (أول 16 حرفاً من sha1)"""
+    return hashlib.sha1(fingerprint(query).encode("utf-8")).hexdigest()[:16]
@@ -0,0 +1,78 @@
+-- أعمدة وجداول لوحة التحكم و ContractsManager غير الموجودة في supabase/migrations
+--
+-- قاعدة الإنتاج تجمع مخطط Supabase (20251009160000_setup_tables.sql) مع ما
+-- أضافته لوحة التحكم (clients، اسم العقار، تاريخ الدفع...) و ContractsManager
+-- (رقم العقد، بيانات المستأجر في العقد، contract_payments...). هذا الملف يطبق
+-- بعد setup_tables وقبل بقية الترحيلات عند بناء قاعدة اختبار من الصفر
+-- (benchmarks/dataset.py) حتى تنطبق الترحيلات وتعمل المسارات كما في الإنتاج.
+
+CREATE TABLE IF NOT EXISTS clients (
+    id SERIAL PRIMARY KEY,
+    name VARCHAR(255) NOT NULL,
+    email VARCHAR(255),
+    phone VARCHAR(50) NOT NULL,
+    address TEXT,
+    notes TEXT,
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+ALTER TABLE tenants
+    ADD COLUMN IF NOT EXISTS email VARCHAR(255),
+    ADD COLUMN IF NOT EXISTS national_id VARCHAR(50);
+
+ALTER TABLE properties
+    ADD COLUMN IF NOT EXISTS name VARCHAR(255),
+    ADD COLUMN IF NOT EXISTS type VARCHAR(50),
+    ADD COLUMN IF NOT EXISTS rent_amount DECIMAL(10,2),
+    ADD COLUMN IF NOT EXISTS client_id INT REFERENCES clients(id);
+
+ALTER TABLE payments
+    ADD COLUMN IF NOT EXISTS tenant_id INT REFERENCES tenants(id) ON DELETE SET NULL,
+    ADD COLUMN IF NOT EXISTS property_id INT REFERENCES properties(id) ON DELETE SET NULL,
+    ADD COLUMN IF NOT EXISTS payment_date DATE,
+    ADD COLUMN IF NOT EXISTS payment_method VARCHAR(50);
+
+-- أعمدة ContractsManager على جدول العقود المشترك
+ALTER TABLE contracts
+    ADD COLUMN IF NOT EXISTS contract_number TEXT UNIQUE,
+    ADD COLUMN IF NOT EXISTS owner_id INTEGER,
+    ADD COLUMN IF NOT EXISTS tenant_name TEXT,
+    ADD COLUMN IF NOT EXISTS tenant_phone TEXT,
+    ADD COLUMN IF NOT EXISTS property_address TEXT,
+    ADD COLUMN IF NOT EXISTS contract_type TEXT DEFAULT 'rental',
+    ADD COLUMN IF NOT EXISTS monthly_rent DECIMAL(10,2) DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS payment_frequency TEXT DEFAULT 'monthly',
+    ADD COLUMN IF NOT EXISTS currency TEXT DEFAULT 'OMR',
+    ADD COLUMN IF NOT EXISTS notes TEXT,
+    ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP;
+
+CREATE INDEX IF NOT EXISTS idx_contracts_phone ON contracts (tenant_phone);
+
+CREATE TABLE IF NOT EXISTS contract_renewals (
+    id SERIAL PRIMARY KEY,
+    contract_id INTEGER NOT NULL REFERENCES contracts(id),
+    old_end_date DATE NOT NULL,
+    new_end_date DATE NOT NULL,
+    old_rent DECIMAL(10,2),
+    new_rent DECIMAL(10,2),
+    renewal_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    notes TEXT,
+    created_by TEXT
+);
+
+CREATE TABLE IF NOT EXISTS contract_payments (
+    id SERIAL PRIMARY KEY,
+    contract_id INTEGER NOT NULL REFERENCES contracts(id),
+    amount DECIMAL(10,2) NOT NULL,
+    payment_date DATE,
+    due_date DATE NOT NULL,
+    payment_type TEXT DEFAULT 'rent',
+    status TEXT DEFAULT 'pending',
+    payment_method TEXT,
+    reference_number TEXT,
+    notes TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_contract_payments_status ON contract_payments (status);
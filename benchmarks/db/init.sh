@@ -0,0 +1,20 @@
+#!/bin/sh
+# تهيئة Postgres المؤقت لاختبار الحمل (benchmarks/docker-compose.yml)
+# نفس ترتيب benchmarks/dataset.py: المخطط الأساسي، ثم أعمدة لوحة التحكم و
+# ContractsManager (dashboard_schema.sql)، ثم بقية الترحيلات بترتيبها الزمني
+# حتى تطابق القاعدة الإنتاج (الفهارس، المشغلات، outbox، البحث...)
+set -e
+
+apply() {
+    echo "applying $1"
+    psql -v ON_ERROR_STOP=1 --username "$POSTGRES_USER" --dbname "$POSTGRES_DB" -f "$1"
+}
+
+apply /migrations/20251009160000_setup_tables.sql
+apply /bench/dashboard_schema.sql
+for migration in $(ls /migrations/*.sql | sort); do
+    case "$migration" in
+        */20251009160000_setup_tables.sql) continue ;;
+    esac
+    apply "$migration"
+done
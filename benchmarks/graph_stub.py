@@ -0,0 +1,16 @@
+"""
+تشغيل محاكي Graph API في app.py (الجذر) عبر uvicorn
+
+الحزمة app/ تحجب الملف app.py عند الاستيراد بالاسم (uvicorn app:app يحمّل
+الحزمة)، لذلك يُحمّل الملف هنا من مساره:
+    uvicorn benchmarks.graph_stub:app --port 8001
+"""
+
+import importlib.util
+from pathlib import Path
+
+_spec = importlib.util.spec_from_file_location("graph_stub_app", Path(__file__).resolve().parent.parent / "app.py")
+_module = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(_module)
+
+app = _module.app
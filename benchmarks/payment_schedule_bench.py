@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+مقارنة أداء توليد جداول الدفعات: INSERT لكل شهر مقابل جملة واحدة
+================================================================
+يولد N عقداً عشوائياً (12-60 شهراً، تكرارات مختلفة) ويقيس:
+  1. compute: حساب كل الأقساط في الذاكرة فقط
+  2. legacy-loop: INSERT لكل قسط (ContractsManager القديم) - على عينة من العقود
+  3. bulk: create_payment_schedules بجملة execute_values واحدة
+
+مرحلتا قاعدة البيانات تكتبان في جدول مؤقت contract_payments (TEMP يحجب الجدول
+الحقيقي داخل الجلسة) ثم ROLLBACK، فلا يتغير شيء في القاعدة.
+بدون --dsn أو DB_DSN تُنفذ مرحلة compute فقط.
+
+الاستخدام:
+    DB_DSN=postgresql://localhost/ashal python -m benchmarks.payment_schedule_bench \\
+        --contracts 10000 --legacy-sample 500
+"""
+
+import argparse
+import os
+import random
+import time
+from datetime import date, timedelta
+
+from app.services.payment_schedule import compute_installments, create_payment_schedules
+
+FREQUENCIES = ['monthly', 'monthly', 'monthly', 'quarterly', 'semi_annual', 'annual']
+
+
+def make_contracts(count, seed=7):
+    rng = random.Random(seed)
+    contracts = []
+    for contract_id in range(1, count + 1):
+        start = date(2024, 1, 1) + timedelta(days=rng.randint(0, 700))
+        months = rng.choice([12, 12, 24, 36, 60])
+        contracts.append((contract_id, {
+            'start_date': start.isoformat(),
+            'end_date': (start + timedelta(days=months * 30)).isoformat(),
+            'monthly_rent': rng.choice([150, 220, 300, 450, 800]),
+            'payment_frequency': rng.choice(FREQUENCIES),
+            'payment_day': rng.choice([None, None, 5, 31]),
+        }))
+    return contracts
+
+
+def legacy_insert(cursor, contract_id, contract_data):
+    """نفس سلوك _create_payment_schedule القديم: INSERT لكل شهر"""
+    for due_date, amount in compute_installments(
+        contract_data['start_date'], contract_data['end_date'], contract_data['monthly_rent']
+    ):
+        cursor.execute('''
+            INSERT INTO contract_payments (
+                contract_id, amount, due_date, payment_type, status
+            ) VALUES (%s, %s, %s, 'rent', 'pending')
+        ''', (contract_id, amount, due_date))
+
+
+def create_temp_table(cursor):
+    cursor.execute('''
+        CREATE TEMP TABLE contract_payments (
+            id SERIAL PRIMARY KEY,
+            contract_id INTEGER NOT NULL,
+            amount DECIMAL(10,2) NOT NULL,
+            payment_date DATE,
+            due_date DATE NOT NULL,
+            payment_type TEXT DEFAULT 'rent',
+            status TEXT DEFAULT 'pending'
+        ) ON COMMIT DROP
+    ''')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--contracts", type=int, default=10000)
+    parser.add_argument("--legacy-sample", type=int, default=500,
+                        help="عدد العقود لقياس الطريقة القديمة (يُقدّر الباقي خطياً)")
+    parser.add_argument("--dsn", default=os.getenv("DB_DSN"))
+    args = parser.parse_args()
+
+    contracts = make_contracts(args.contracts)
+
+    started = time.perf_counter()
+    total_rows = sum(
+        len(compute_installments(d['start_date'], d['end_date'], d['monthly_rent'],
+                                 d['payment_frequency'], d['payment_day']))
+        for _, d in contracts
+    )
+    compute_elapsed = time.perf_counter() - started
+    print(f"{'compute':<14} {compute_elapsed * 1000:10.1f} ms   {total_rows} قسط لـ {len(contracts)} عقد")
+
+    if not args.dsn:
+        print("⚠️ لا يوجد DB_DSN: تم تخطي مراحل قاعدة البيانات")
+        return
+
+    import psycopg2
+    conn = psycopg2.connect(args.dsn)
+    try:
+        cursor = conn.cursor()
+        create_temp_table(cursor)
+
+        sample = contracts[:args.legacy_sample]
+        legacy_rows = sum(
+            len(compute_installments(d['start_date'], d['end_date'], d['monthly_rent'])) for _, d in sample
+        )
+        started = time.perf_counter()
+        for contract_id, contract_data in sample:
+            legacy_insert(cursor, contract_id, contract_data)
+        legacy_elapsed = time.perf_counter() - started
+        projected = legacy_elapsed * len(contracts) / max(1, len(sample))
+        print(f"{'legacy-loop':<14} {legacy_elapsed * 1000:10.1f} ms   {legacy_rows} صف / {len(sample)} عقد "
+              f"(تقدير لـ {len(contracts)}: {projected:.1f} s)")
+
+        cursor.execute("TRUNCATE contract_payments")
+        started = time.perf_counter()
+        inserted = create_payment_schedules(cursor, contracts)
+        bulk_elapsed = time.perf_counter() - started
+        print(f"{'bulk':<14} {bulk_elapsed * 1000:10.1f} ms   {inserted} صف / {len(contracts)} عقد")
+        if bulk_elapsed:
+            print(f"\nالتسريع المقدر: {projected / bulk_elapsed:.1f}x")
+    finally:
+        conn.rollback()
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
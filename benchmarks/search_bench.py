@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+زمن بحث العقود: LIKE على أربعة أعمدة مقابل search_doc المطبّع + trigram
+=======================================================================
+ينشئ مخططاً مؤقتاً search_bench فيه جدول contracts بصيغة ContractsManager،
+يملؤه بـ N عقد (COPY) بأسماء عربية بأشكال كتابة مختلفة (أحمد/احمد، مؤسسة/موسسه...)
+ثم يقيس لكل مصطلح بحث:
+  1. legacy-like: استعلام ContractsManager القديم (LIKE '%term%' على 4 أعمدة)
+  2. search: app.services.search.search_contracts (صفحة أولى مرتبة)
+
+ويطبع p50/p95 بالمللي ثانية وعدد النتائج لكل طريقة (الفرق في العدد يوضح
+الأشكال العربية التي يفوتها LIKE). المخطط يُحذف في النهاية ما لم يُمرر --keep.
+
+الاستخدام:
+    DB_DSN=postgresql://localhost/ashal python -m benchmarks.search_bench --contracts 100000
+"""
+
+import argparse
+import io
+import os
+import random
+import statistics
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+import psycopg2
+
+from app.services.search import search_contracts
+
+ARABIC_SEARCH_MIGRATION = (Path(__file__).resolve().parent.parent / "supabase" / "migrations"
+                           / "20251026000000_arabic_search.sql")
+
+FIRST_NAMES = ["أحمد", "احمد", "إبراهيم", "ابراهيم", "فاطمة", "فاطمه", "مصطفى", "مصطفي",
+               "سالم", "خالد", "عائشة", "عايشه", "يوسف", "مريم", "علي", "هدى", "هدي"]
+LAST_NAMES = ["البلوشي", "الحارثي", "الرواحي", "الهنائي", "الكندي", "المعمري", "السيابي"]
+COMPANIES = ["مؤسسة النور", "موسسه النور", "شركة الأمل", "شركه الامل", "", "", "", ""]
+STREETS = ["شارع السلطان قابوس", "طريق الخوير", "حي الموالح", "الغبرة الشمالية", "روي", "القرم"]
+
+QUERIES = ["احمد", "أحمد", "فاطمة", "مصطفي", "موسسه", "الحارثي", "الخوير", "C-004213",
+           "9123", "+968 9555", "ابراهيم الكندي"]
+
+
+def generate_rows(count, seed=11):
+    rng = random.Random(seed)
+    buffer = io.StringIO()
+    for i in range(1, count + 1):
+        name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+        company = rng.choice(COMPANIES)
+        if company:
+            name = f"{company} - {name}"
+        start = date(2023, 1, 1) + timedelta(days=rng.randint(0, 1000))
+        buffer.write("\t".join([
+            f"C-{i:06d}",
+            name,
+            f"+968 9{rng.randint(0, 9999999):07d}",
+            f"{rng.choice(STREETS)}، مبنى {rng.randint(1, 400)}",
+            rng.choice(["active", "active", "active", "expired"]),
+            start.isoformat(),
+            (start + timedelta(days=365)).isoformat(),
+            str(rng.choice([150, 220, 300, 450])),
+        ]) + "\n")
+    buffer.seek(0)
+    return buffer
+
+
+def setup(conn, count):
+    cursor = conn.cursor()
+    cursor.execute("DROP SCHEMA IF EXISTS search_bench CASCADE")
+    cursor.execute("CREATE SCHEMA search_bench")
+    cursor.execute("SET search_path = search_bench, public, extensions")
+    cursor.execute('''
+        CREATE TABLE contracts (
+            id SERIAL PRIMARY KEY,
+            contract_number TEXT UNIQUE NOT NULL,
+            tenant_name TEXT,
+            tenant_phone TEXT,
+            property_address TEXT,
+            status TEXT DEFAULT 'active',
+            start_date DATE NOT NULL,
+            end_date DATE NOT NULL,
+            monthly_rent DECIMAL(10,2) DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    # الترحيل يضيف search_doc للمستأجرين أيضاً؛ جدول فارغ حتى يبقى كل شيء داخل المخطط
+    cursor.execute("CREATE TABLE tenants (id SERIAL PRIMARY KEY, name TEXT, phone TEXT)")
+    started = time.perf_counter()
+    cursor.copy_expert('''
+        COPY contracts (contract_number, tenant_name, tenant_phone, property_address,
+                        status, start_date, end_date, monthly_rent) FROM STDIN
+    ''', generate_rows(count))
+    print(f"📥 COPY {count} عقد: {time.perf_counter() - started:.2f} s")
+    conn.commit()
+
+
+def build_index(conn):
+    cursor = conn.cursor()
+    started = time.perf_counter()
+    # نفس الترحيل الذي يطبق على الإنتاج (ar_normalize + search_doc + فهرس trigram)
+    cursor.execute(ARABIC_SEARCH_MIGRATION.read_text(encoding="utf-8"))
+    cursor.execute("ANALYZE contracts")
+    conn.commit()
+    print(f"🔧 search_doc + فهرس trigram: {time.perf_counter() - started:.2f} s")
+
+
+def legacy_like(conn, term):
+    cursor = conn.cursor()
+    pattern = f"%{term}%"
+    cursor.execute('''
+        SELECT * FROM contracts
+        WHERE contract_number LIKE %s
+           OR tenant_name LIKE %s
+           OR tenant_phone LIKE %s
+           OR property_address LIKE %s
+        ORDER BY created_at DESC
+    ''', (pattern, pattern, pattern, pattern))
+    rows = cursor.fetchall()
+    cursor.close()
+    return len(rows)
+
+
+def measure(fn, repeat):
+    samples = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    p95 = samples[min(len(samples) - 1, int(round(0.95 * (len(samples) - 1))))]
+    return statistics.median(samples), p95, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--contracts", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--dsn", default=os.getenv("DB_DSN"))
+    parser.add_argument("--keep", action="store_true", help="عدم حذف المخطط search_bench")
+    args = parser.parse_args()
+
+    if not args.dsn:
+        parser.error("يجب تحديد --dsn أو DB_DSN")
+
+    conn = psycopg2.connect(args.dsn)
+    try:
+        setup(conn, args.contracts)
+
+        legacy = {term: measure(lambda: legacy_like(conn, term), args.repeat) for term in QUERIES}
+        build_index(conn)
+        # LIKE القديم لا يستفيد من الفهرس الجديد (يبحث في الأعمدة الأصلية)
+        print(f"\n{'term':<18} {'legacy p50':>11} {'p95':>8} {'hits':>7}   "
+              f"{'search p50':>11} {'p95':>8} {'page':>5}")
+        for term in QUERIES:
+            l50, l95, hits = legacy[term]
+            s50, s95, page = measure(
+                lambda: search_contracts(conn, term, page_size=args.page_size), args.repeat
+            )
+            print(f"{term:<18} {l50:>9.2f}ms {l95:>6.2f}ms {hits:>7}   "
+                  f"{s50:>9.2f}ms {s95:>6.2f}ms {len(page.items):>5}")
+
+        cursor = conn.cursor()
+        cursor.execute("SELECT COUNT(*) FROM contracts WHERE search_doc LIKE '%' || ar_normalize('احمد') || '%'")
+        print(f"\nأحمد/احمد: LIKE يجد {legacy['احمد'][2]}، البحث المطبّع يجد {cursor.fetchone()[0]}")
+    finally:
+        conn.rollback()
+        if not args.keep:
+            conn.cursor().execute("DROP SCHEMA IF EXISTS search_bench CASCADE")
+            conn.commit()
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
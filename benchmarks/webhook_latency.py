@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+اختبار حمل: زمن استجابة /webhook أثناء تشغيل لوحات تحكم ثقيلة
+=============================================================
+يقيس p50/p95/p99 لطلبات /webhook على مرحلتين:
+  1. خط الأساس: webhook فقط
+  2. تحت الحمل: webhook بالتوازي مع طلبات مستمرة لصفحات الداشبورد
+
+إذا كانت طبقة قاعدة البيانات حاجبة فإن p99 في المرحلة الثانية يقفز
+بمقدار زمن أبطأ استعلام؛ مع الطبقة غير الحاجبة يبقى ثابتاً تقريباً.
+
+الاستخدام:
+    uvicorn app.main:app --port 5001 &
+    python -m benchmarks.webhook_latency --base-url http://localhost:5001 \\
+        --requests 500 --dashboard-workers 16
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+DASHBOARD_PATHS = [
+    "/dashboard/contracts/",
+    "/dashboard/tenants/",
+    "/dashboard/properties/",
+    "/dashboard/payments/",
+    "/api/stats",
+]
+
+WEBHOOK_PAYLOAD = {
+    "object": "whatsapp_business_account",
+    "entry": [{
+        "id": "0",
+        "changes": [{
+            "field": "messages",
+            "value": {
+                "messaging_product": "whatsapp",
+                "messages": [{
+                    "from": "96891234567",
+                    "id": "wamid.bench",
+                    "type": "text",
+                    "text": {"body": "مرحبا"},
+                }],
+            },
+        }],
+    }],
+}
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def measure_webhook(client, count, rate):
+    """إرسال count طلب webhook بمعدل rate/ثانية وإرجاع الأزمنة بالملي ثانية"""
+    latencies = []
+    interval = 1.0 / rate if rate else 0
+
+    async def one():
+        started = time.perf_counter()
+        response = await client.post("/webhook", json=WEBHOOK_PAYLOAD)
+        response.raise_for_status()
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    tasks = []
+    for _ in range(count):
+        tasks.append(asyncio.create_task(one()))
+        if interval:
+            await asyncio.sleep(interval)
+    await asyncio.gather(*tasks, return_exceptions=True)
+    return latencies
+
+
+async def hammer_dashboards(client, stop, auth, counter):
+    """طلبات داشبورد متواصلة حتى إشارة التوقف"""
+    i = 0
+    while not stop.is_set():
+        path = DASHBOARD_PATHS[i % len(DASHBOARD_PATHS)]
+        i += 1
+        try:
+            await client.get(path, auth=auth)
+            counter[0] += 1
+        except httpx.HTTPError:
+            counter[1] += 1
+
+
+def summarize(label, latencies):
+    print(f"{label:<22} n={len(latencies):<6} "
+          f"p50={percentile(latencies, 50):8.2f}ms "
+          f"p95={percentile(latencies, 95):8.2f}ms "
+          f"p99={percentile(latencies, 99):8.2f}ms "
+          f"mean={statistics.fmean(latencies) if latencies else 0:8.2f}ms")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:5001")
+    parser.add_argument("--requests", type=int, default=500, help="عدد طلبات webhook في كل مرحلة")
+    parser.add_argument("--rate", type=float, default=100, help="طلبات webhook في الثانية")
+    parser.add_argument("--dashboard-workers", type=int, default=16)
+    parser.add_argument("--user", default="admin")
+    parser.add_argument("--password", default="admin123")
+    args = parser.parse_args()
+
+    limits = httpx.Limits(max_connections=args.dashboard_workers + 64)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=60, limits=limits) as client:
+        baseline = await measure_webhook(client, args.requests, args.rate)
+
+        stop = asyncio.Event()
+        counter = [0, 0]
+        auth = (args.user, args.password)
+        workers = [
+            asyncio.create_task(hammer_dashboards(client, stop, auth, counter))
+            for _ in range(args.dashboard_workers)
+        ]
+        await asyncio.sleep(1)  # السماح للحمل بالاستقرار
+        loaded = await measure_webhook(client, args.requests, args.rate)
+        stop.set()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+    summarize("webhook (baseline)", baseline)
+    summarize("webhook (dashboards)", loaded)
+    print(f"dashboard requests completed={counter[0]} failed={counter[1]}")
+    base_p99 = percentile(baseline, 99) or 1
+    print(f"p99 ratio under load: {percentile(loaded, 99) / base_p99:.2f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+اختبار حمل شامل: رسائل واتساب واردة -> /webhook -> المعالجة -> outbox -> Graph API
+===================================================================================
+يرسل حمولات webhook واقعية (نصوص عربية وإنجليزية بنوايا مختلفة، صور، تحديثات
+حالة التسليم، وإعادة إرسال مكررة كما تفعل Meta) بمعدل ثابت مستهدف، ثم ينتظر
+تفريغ طابور المعالجة وإرسال الردود إلى محاكي Graph API (app.py) ويطبع:
+
+  - الإرسال: المعدل المحقق، زمن التأكيد p50/p95/p99/max، رموز الحالة والأخطاء
+  - المعالجة: رسائل معالجة/فاشلة/مكررة ومعدلها في الثانية (من /webhook/stats)
+  - الردود: ما وصل إلى المحاكي (مرسل / 429 / 500) إذا مُرر --stub-url
+
+الحمل مفتوح الحلقة: كل طلب له موعد ثابت (البداية + i/rate) والزمن يُقاس من
+الموعد لا من لحظة الإرسال الفعلي، فتأخر الخادم لا يخفض الحمل ولا يخفي الانتظار.
+
+التشغيل مع Postgres مؤقت ومحاكي Graph API (benchmarks/docker-compose.yml):
+    docker compose -f benchmarks/docker-compose.yml up -d --build
+    python -m benchmarks.webhook_load --base-url http://localhost:5001 \\
+        --stub-url http://localhost:8001 --app-secret bench-secret --rate 200 --duration 30
+    docker compose -f benchmarks/docker-compose.yml down
+"""
+
+import argparse
+import asyncio
+import hashlib
+import hmac
+import json
+import random
+import statistics
+import time
+
+import httpx
+
+PHONE_NUMBER_ID = "109876543210"
+DISPLAY_PHONE = "96824000000"
+
+# (اللغة، النية، النص)
+MESSAGES = [
+    ("ar", "greeting", "السلام عليكم"),
+    ("ar", "greeting", "مرحبا، صباح الخير"),
+    ("ar", "payment", "ابغى اسدد ايجار هذا الشهر"),
+    ("ar", "payment", "تم التحويل البنكي للإيجار، متى يوصلني الإيصال؟"),
+    ("ar", "maintenance", "المكيف في الشقة ما يبرد، أحتاج صيانة"),
+    ("ar", "maintenance", "فيه تسريب ماء في الحمام"),
+    ("ar", "inquiry", "استفسار عن موعد انتهاء العقد"),
+    ("ar", "inquiry", "كم المبلغ المتبقي علي؟"),
+    ("ar", "other", "شكرا لكم"),
+    ("en", "greeting", "Hello"),
+    ("en", "greeting", "Hi, good evening"),
+    ("en", "payment", "I want to pay this month's rent"),
+    ("en", "maintenance", "The water heater is broken, please send maintenance"),
+    ("en", "inquiry", "When does my contract expire?"),
+    ("en", "other", "Thanks!"),
+]
+NAMES = ["أحمد البلوشي", "فاطمة الحارثي", "سالم الرواحي", "مريم الكندي", "John Smith",
+         "Priya Nair", "خالد المعمري", "Ali Hassan"]
+
+
+class PayloadFactory:
+    """حمولات بصيغة Cloud API الحقيقية مع معرفات رسائل فريدة"""
+
+    def __init__(self, senders=500, arabic_share=0.7, media_share=0.05, status_share=0.15,
+                 duplicate_share=0.02, seed=7):
+        self.random = random.Random(seed)
+        self.senders = [f"9689{self.random.randint(1000000, 9999999)}" for _ in range(senders)]
+        self.arabic_share = arabic_share
+        self.media_share = media_share
+        self.status_share = status_share
+        self.duplicate_share = duplicate_share
+        self._counter = 0
+        self._recent = []
+
+    def _wamid(self):
+        self._counter += 1
+        return f"wamid.bench.{self._counter:010d}.{self.random.getrandbits(32):08x}"
+
+    def _envelope(self, value):
+        return {
+            "object": "whatsapp_business_account",
+            "entry": [{
+                "id": "0",
+                "changes": [{
+                    "field": "messages",
+                    "value": {
+                        "messaging_product": "whatsapp",
+                        "metadata": {"display_phone_number": DISPLAY_PHONE, "phone_number_id": PHONE_NUMBER_ID},
+                        **value,
+                    },
+                }],
+            }],
+        }
+
+    def _message(self, sender):
+        timestamp = str(int(time.time()))
+        if self.random.random() < self.media_share:
+            return {
+                "from": sender, "id": self._wamid(), "timestamp": timestamp, "type": "image",
+                "image": {"mime_type": "image/jpeg", "sha256": hashlib.sha256(sender.encode()).hexdigest(),
+                          "id": str(self.random.getrandbits(48))},
+            }
+        language = "ar" if self.random.random() < self.arabic_share else "en"
+        choices = [text for lang, _intent, text in MESSAGES if lang == language]
+        return {
+            "from": sender, "id": self._wamid(), "timestamp": timestamp, "type": "text",
+            "text": {"body": self.random.choice(choices)},
+        }
+
+    def next(self):
+        """(الحمولة، النوع) حيث النوع message أو status أو duplicate"""
+        roll = self.random.random()
+        if roll < self.duplicate_share and self._recent:
+            return self.random.choice(self._recent), "duplicate"
+        if roll < self.duplicate_share + self.status_share:
+            return self._envelope({"statuses": [{
+                "id": self._wamid(), "status": self.random.choice(["sent", "delivered", "read"]),
+                "timestamp": str(int(time.time())), "recipient_id": self.random.choice(self.senders),
+            }]}), "status"
+
+        sender = self.random.choice(self.senders)
+        payload = self._envelope({
+            "contacts": [{"profile": {"name": self.random.choice(NAMES)}, "wa_id": sender}],
+            "messages": [self._message(sender)],
+        })
+        self._recent.append(payload)
+        if len(self._recent) > 200:
+            self._recent.pop(0)
+        return payload, "message"
+
+
+def sign(body: bytes, secret):
+    if not secret:
+        return {}
+    digest = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+    return {"X-Hub-Signature-256": f"sha256={digest}"}
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def latency_summary(samples):
+    return {
+        "count": len(samples),
+        "p50_ms": round(percentile(samples, 50), 3),
+        "p95_ms": round(percentile(samples, 95), 3),
+        "p99_ms": round(percentile(samples, 99), 3),
+        "max_ms": round(max(samples), 3) if samples else 0.0,
+        "mean_ms": round(statistics.fmean(samples), 3) if samples else 0.0,
+    }
+
+
+async def fetch_json(client, url):
+    try:
+        response = await client.get(url)
+        response.raise_for_status()
+        return response.json()
+    except (httpx.HTTPError, ValueError):
+        return None
+
+
+async def webhook_stats(client, base_url):
+    data = await fetch_json(client, f"{base_url}/webhook/stats")
+    return (data or {}).get("data") or {}
+
+
+async def replay(client, base_url, factory, rate, duration, secret):
+    """إرسال rate طلب/ثانية لمدة duration ثانية (حلقة مفتوحة)"""
+    total = int(rate * duration)
+    latencies, statuses, errors, kinds = [], {}, {}, {}
+
+    async def one(scheduled, body, headers):
+        try:
+            response = await client.post(f"{base_url}/webhook", content=body, headers=headers)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+        except httpx.HTTPError as e:
+            errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+            return
+        latencies.append((time.perf_counter() - scheduled) * 1000)
+
+    tasks = []
+    started = time.perf_counter()
+    for i in range(total):
+        payload, kind = factory.next()
+        kinds[kind] = kinds.get(kind, 0) + 1
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        headers = {"Content-Type": "application/json", **sign(body, secret)}
+        scheduled = started + i / rate
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(one(scheduled, body, headers)))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+
+    return {
+        "sent": total,
+        "elapsed_s": round(elapsed, 3),
+        "achieved_rps": round(total / elapsed, 2) if elapsed else 0.0,
+        "payloads": kinds,
+        "status_codes": {str(code): count for code, count in sorted(statuses.items())},
+        "transport_errors": errors,
+        "ack_latency": latency_summary(latencies),
+    }
+
+
+async def wait_for_drain(client, base_url, before, expected_messages, timeout):
+    """انتظار تفريغ طابور webhook حتى تُعالج كل الرسائل الجديدة"""
+    deadline = time.perf_counter() + timeout
+    stats = before
+    while time.perf_counter() < deadline:
+        stats = await webhook_stats(client, base_url)
+        handled = sum(stats.get(key, 0) - before.get(key, 0) for key in ("processed", "failed", "duplicates"))
+        if stats.get("queue_depth", 0) == 0 and handled >= expected_messages:
+            break
+        await asyncio.sleep(0.25)
+    return stats
+
+
+async def wait_for_replies(client, stub_url, before, expected, timeout):
+    """انتظار وصول الردود من عمّال outbox إلى المحاكي"""
+    deadline = time.perf_counter() + timeout
+    stats = before
+    while time.perf_counter() < deadline:
+        stats = await fetch_json(client, f"{stub_url}/stub/stats") or stats
+        if stats.get("sent", 0) - before.get("sent", 0) >= expected:
+            break
+        await asyncio.sleep(0.5)
+    return stats
+
+
+def delta(after, before, keys):
+    return {key: after.get(key, 0) - before.get(key, 0) for key in keys}
+
+
+def print_report(report):
+    load = report["load"]
+    ack = load["ack_latency"]
+    print(f"sent={load['sent']} in {load['elapsed_s']}s "
+          f"(target {report['target_rps']}/s, achieved {load['achieved_rps']}/s) payloads={load['payloads']}")
+    print(f"ack latency           p50={ack['p50_ms']:8.2f}ms p95={ack['p95_ms']:8.2f}ms "
+          f"p99={ack['p99_ms']:8.2f}ms max={ack['max_ms']:8.2f}ms")
+    print(f"status codes          {load['status_codes']} transport errors={load['transport_errors']}")
+    processing = report["processing"]
+    print(f"processing            {processing['counts']} "
+          f"throughput={processing['messages_per_s']}/s drained in {processing['elapsed_s']}s "
+          f"(queue depth {processing['queue_depth']})")
+    if report.get("replies"):
+        replies = report["replies"]
+        print(f"graph api (stub)      {replies['counts']} throughput={replies['sent_per_s']}/s")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:5001")
+    parser.add_argument("--stub-url", default=None, help="محاكي Graph API (app.py) لقياس الردود المرسلة")
+    parser.add_argument("--rate", type=float, default=100, help="حمولات webhook في الثانية")
+    parser.add_argument("--duration", type=float, default=30, help="مدة الإرسال بالثواني")
+    parser.add_argument("--senders", type=int, default=500, help="عدد أرقام المرسلين المختلفة")
+    parser.add_argument("--arabic-share", type=float, default=0.7)
+    parser.add_argument("--app-secret", default=None, help="META_APP_SECRET لتوقيع الحمولات")
+    parser.add_argument("--drain-timeout", type=float, default=120)
+    parser.add_argument("--connections", type=int, default=256)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", dest="json_path", default=None, help="حفظ التقرير بصيغة JSON")
+    args = parser.parse_args()
+
+    factory = PayloadFactory(senders=args.senders, arabic_share=args.arabic_share, seed=args.seed)
+    limits = httpx.Limits(max_connections=args.connections, max_keepalive_connections=args.connections)
+    async with httpx.AsyncClient(timeout=30, limits=limits) as client:
+        before = await webhook_stats(client, args.base_url)
+        stub_before = await fetch_json(client, f"{args.stub_url}/stub/stats") if args.stub_url else None
+
+        started = time.perf_counter()
+        load = await replay(client, args.base_url, factory, args.rate, args.duration, args.app_secret)
+        # رسائل جديدة أو مكررة في الحمولات المقبولة (تحديثات الحالة لا رسائل فيها)
+        expected = load["payloads"].get("message", 0) + load["payloads"].get("duplicate", 0)
+        after = await wait_for_drain(client, args.base_url, before, expected, args.drain_timeout)
+        processed_elapsed = time.perf_counter() - started
+
+        counts = delta(after, before, ("received", "rejected", "messages", "duplicates", "processed", "failed"))
+        report = {
+            "target_rps": args.rate,
+            "load": load,
+            "processing": {
+                "counts": counts,
+                "elapsed_s": round(processed_elapsed, 3),
+                "messages_per_s": round(counts["processed"] / processed_elapsed, 2) if processed_elapsed else 0.0,
+                "queue_depth": after.get("queue_depth", 0),
+            },
+        }
+
+        if stub_before is not None:
+            stub_after = await wait_for_replies(
+                client, args.stub_url, stub_before, counts["processed"], args.drain_timeout
+            )
+            replies_elapsed = time.perf_counter() - started
+            reply_counts = delta(stub_after, stub_before, ("requests", "sent", "errors", "rate_limited"))
+            report["replies"] = {
+                "counts": reply_counts,
+                "elapsed_s": round(replies_elapsed, 3),
+                "sent_per_s": round(reply_counts["sent"] / replies_elapsed, 2) if replies_elapsed else 0.0,
+            }
+
+    print_report(report)
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,13 +1,14 @@
 from typing import Dict, List
 from supabase import Client
-from datetime import datetime
-import pandas as pd
+from datetime import datetime, timedelta, timezone
 import os
 
+from app.services.analytics_jobs import CHURN_EVENT_TYPE, CHURN_WINDOW_DAYS
+
 def generate_aggregated_metrics(supabase: Client, owner_id: int, period: str = 'monthly') -> Dict:
-    query = supabase.table('properties').select('*').eq('owner_id', owner_id).execute()
-    df = pd.DataFrame(query.data)
-    occupancy = (df[df['status'] == 'occupied'].shape[0] / df.shape[0]) * 100 if not df.empty else 0
+    # النسبة تُحسب في قاعدة البيانات بدلاً من تنزيل كل عقارات المالك
+    # (لكل المالكين دفعة واحدة: app/services/analytics_jobs.compute_occupancy_metrics)
+    occupancy = float(supabase.rpc('calculate_occupancy_rate', {'owner_id_param': owner_id}).execute().data or 0)
     metrics = {'occupancy_rate': occupancy, 'generated_at': datetime.now().isoformat()}
     
     supabase.table('aggregated_metrics').insert({
@@ -27,17 +28,24 @@ def generate_aggregated_metrics(supabase: Client, owner_id: int, period: str = '
     return metrics
 
 def generate_user_insights(supabase: Client, user_id: int) -> Dict:
-    events = supabase.table('analytics_events').select('*').eq('user_id', user_id).execute()
-    df = pd.DataFrame(events.data)
+    # عدّادان بدلاً من تحميل كل أحداث المستخدم، بنفس نافذة CHURN_WINDOW_DAYS
+    # (لكل المستأجرين دفعة واحدة: app/services/analytics_jobs.compute_churn_insights)
+    since = (datetime.now(timezone.utc) - timedelta(days=CHURN_WINDOW_DAYS)).isoformat()
+    total = supabase.table('analytics_events').select('id', count='exact').eq('user_id', user_id) \
+        .gte('timestamp', since).limit(1).execute().count or 0
     
-    if df.empty:
+    if total == 0:
         return {'score': 0, 'description': 'No data'}
     
-    churn_score = df[df['event_type'] == 'payment_overdue'].shape[0] / len(df) if len(df) > 0 else 0
+    overdue = supabase.table('analytics_events').select('id', count='exact').eq('user_id', user_id) \
+        .eq('event_type', CHURN_EVENT_TYPE).gte('timestamp', since).limit(1).execute().count or 0
+    churn_score = overdue / total
     insight = {
+        'user_id': user_id,
         'insight_type': 'churn_prediction',
         'score': churn_score,
-        'description': f"Churn risk: {churn_score*100:.2f}% based on {len(df)} events"
+        'description': f"Churn risk: {churn_score*100:.2f}% based on {total} events",
+        'data_source': {'events': total, 'overdue_events': overdue, 'window_days': CHURN_WINDOW_DAYS}
     }
     
     supabase.table('user_insights').insert(insight).execute()
@@ -1,7 +1,8 @@
-import re
 from supabase import Client
 from typing import Dict
 from templates.maintenance_templates import get_template as get_maintenance_template
+from app.services.phone_index import tenant_index, phone_variants
+from app.services.intent_matcher import IntentMatcher
 
 KEYWORDS_MAP = {
     'leak': 'emergency',
@@ -13,40 +14,57 @@ KEYWORDS_MAP = {
     'ac': 'urgent',
     'تكييف': 'urgent',
     'security': 'urgent',
-    'أمن': 'urgent'
+    'أمن': 'urgent',
+    'रिसाव': 'emergency',
+    'पानी': 'emergency',
+    'बिजली': 'emergency',
+    'एसी': 'urgent',
+    'सुरक्षा': 'urgent'
 }
 
+# آلة مطابقة واحدة لكل الكلمات؛ الطوارئ أولاً عند تعدد الفئات
+MAINTENANCE_MATCHER = IntentMatcher.from_keyword_map(KEYWORDS_MAP, priorities={'emergency': 2, 'urgent': 1})
+
+def _tenant_loader(supabase: Client):
+    """تحميل المستأجر من Supabase عند عدم وجوده في فهرس الأرقام"""
+    def load(e164):
+        variants = phone_variants(e164)
+        candidates = [e164] + variants + ['+' + v for v in variants[1:]]
+        tenant_data = supabase.table('tenants').select('id, language_preference').in_('phone', candidates).limit(1).execute()
+        if not tenant_data.data:
+            return None
+        tenant = tenant_data.data[0]
+        return {'id': tenant['id'], 'language_preference': tenant.get('language_preference') or 'ar'}
+    return load
+
 def process_whatsapp_message(supabase: Client, message: str, phone: str) -> Dict:
     try:
-        tenant_data = supabase.table('tenants').select('id, language_preference').eq('phone', phone).execute()
-        if not tenant_data.data:
+        tenant = tenant_index.get(phone, _tenant_loader(supabase))
+        if not tenant:
             return {'response': 'لم يتم العثور على مستأجر بهذا الرقم', 'language': 'ar'}
         
-        tenant = tenant_data.data[0]
         lang = tenant.get('language_preference', 'ar')
-        message_lower = message.lower()
-        
-        for key, category in KEYWORDS_MAP.items():
-            if re.search(key, message_lower, re.IGNORECASE):
-                maintenance_data = {
+        category = MAINTENANCE_MATCHER.match(message)
+        if category:
+            maintenance_data = {
+                'category': category,
+                'description': message,
+                'tenant_id': tenant['id'],
+                'status': 'open'
+            }
+            result = supabase.table('maintenance_requests').insert(maintenance_data).execute()
+            if result.data:
+                ticket_id = result.data[0]['id']
+                return {
                     'category': category,
                     'description': message,
                     'tenant_id': tenant['id'],
-                    'status': 'open'
+                    'language': lang,
+                    'response': get_maintenance_template(lang, 'new_assignment', {
+                        'ticket_id': ticket_id,
+                        'issue_type': category
+                    })
                 }
-                result = supabase.table('maintenance_requests').insert(maintenance_data).execute()
-                if result.data:
-                    ticket_id = result.data[0]['id']
-                    return {
-                        'category': category,
-                        'description': message,
-                        'tenant_id': tenant['id'],
-                        'language': lang,
-                        'response': get_maintenance_template(lang, 'new_assignment', {
-                            'ticket_id': ticket_id,
-                            'issue_type': category
-                        })
-                    }
         
         return {
             'response': 'شكراً لتواصلكم. سنقوم بمعالجة طلبكم قريباً.',
@@ -0,0 +1,22 @@
+-- فهارس ترقيم صفحات الداشبورد بالمؤشر (keyset pagination)
+-- كل قائمة ترتب تنازلياً على (عمود الترتيب, id) وتطلب ما بعد آخر صف،
+-- لذا يكفي فهرس مركب بنفس الترتيب ليصبح زمن أي صفحة ثابتاً.
+
+CREATE INDEX IF NOT EXISTS idx_clients_created_id ON clients (created_at DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS idx_properties_created_id ON properties (created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_properties_status_created_id ON properties (status, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_properties_client_id ON properties (client_id);
+
+CREATE INDEX IF NOT EXISTS idx_tenants_created_id ON tenants (created_at DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS idx_contracts_start_id ON contracts (start_date DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_contracts_status_start_id ON contracts (status, start_date DESC, id DESC);
+-- يستخدمه عدد العقود لكل مستأجر في صفحة المستأجرين
+CREATE INDEX IF NOT EXISTS idx_contracts_tenant_id ON contracts (tenant_id);
+CREATE INDEX IF NOT EXISTS idx_contracts_property_id ON contracts (property_id);
+
+-- payment_date فارغ لغير المدفوع: الترتيب على COALESCE مع due_date (بنفس تعبير الاستعلام)
+CREATE INDEX IF NOT EXISTS idx_payments_date_id ON payments ((COALESCE(payment_date, due_date)) DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_payments_status_date_id ON payments (status, (COALESCE(payment_date, due_date)) DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_payments_tenant_date ON payments (tenant_id, payment_date DESC);
@@ -0,0 +1,181 @@
+-- إحصائيات الداشبورد المادية (materialized) مع تحديث تراكمي
+-- بدلاً من COUNT/SUM على الجداول الأساسية في كل تحميل صفحة، تحتفظ
+-- dashboard_stats بقيمة واحدة لكل مفتاح وتُحدّث بالفرق عبر Triggers على
+-- مستوى الجملة (statement) باستخدام transition tables، ثم تصحح دورياً
+-- عبر refresh_dashboard_stats().
+--
+-- المفاتيح:
+--   <table>_count                 عدد الصفوف (clients, tenants, properties, contracts, payments)
+--   properties_status_<status>   عدد العقارات لكل حالة
+--   contracts_status_<status>    عدد العقود لكل حالة
+--   payments_amount_<status>     مجموع مبالغ الدفعات لكل حالة
+--   contracts_expiring_30         العقود النشطة المنتهية خلال 30 يوم (تعتمد على التاريخ، تُحسب عند التصحيح فقط)
+
+CREATE TABLE IF NOT EXISTS dashboard_stats (
+    key VARCHAR(100) PRIMARY KEY,
+    value NUMERIC NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+CREATE OR REPLACE FUNCTION bump_dashboard_stat(stat_key TEXT, delta NUMERIC) RETURNS VOID AS $$
+    INSERT INTO dashboard_stats (key, value, updated_at)
+    VALUES (stat_key, delta, NOW())
+    ON CONFLICT (key) DO UPDATE
+    SET value = dashboard_stats.value + EXCLUDED.value, updated_at = NOW();
+$$ LANGUAGE sql;
+
+-- عدد الصفوف: TG_ARGV[0] = اسم المفتاح
+CREATE OR REPLACE FUNCTION track_row_count() RETURNS TRIGGER AS $$
+DECLARE
+    delta BIGINT;
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        SELECT COUNT(*) INTO delta FROM new_rows;
+    ELSE
+        SELECT -COUNT(*) INTO delta FROM old_rows;
+    END IF;
+    IF delta <> 0 THEN
+        PERFORM bump_dashboard_stat(TG_ARGV[0], delta);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- عدد الصفوف لكل حالة: TG_ARGV[0] = بادئة المفتاح (مثل contracts_status_)
+CREATE OR REPLACE FUNCTION track_status_counts() RETURNS TRIGGER AS $$
+DECLARE
+    r RECORD;
+BEGIN
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        FOR r IN SELECT COALESCE(status::TEXT, 'unknown') AS s, COUNT(*) AS n FROM new_rows GROUP BY 1 LOOP
+            PERFORM bump_dashboard_stat(TG_ARGV[0] || r.s, r.n);
+        END LOOP;
+    END IF;
+    IF TG_OP IN ('DELETE', 'UPDATE') THEN
+        FOR r IN SELECT COALESCE(status::TEXT, 'unknown') AS s, COUNT(*) AS n FROM old_rows GROUP BY 1 LOOP
+            PERFORM bump_dashboard_stat(TG_ARGV[0] || r.s, -r.n);
+        END LOOP;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- مجموع مبالغ الدفعات لكل حالة
+CREATE OR REPLACE FUNCTION track_payment_amounts() RETURNS TRIGGER AS $$
+DECLARE
+    r RECORD;
+BEGIN
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        FOR r IN SELECT COALESCE(status::TEXT, 'unknown') AS s, SUM(amount) AS total FROM new_rows GROUP BY 1 LOOP
+            PERFORM bump_dashboard_stat('payments_amount_' || r.s, COALESCE(r.total, 0));
+        END LOOP;
+    END IF;
+    IF TG_OP IN ('DELETE', 'UPDATE') THEN
+        FOR r IN SELECT COALESCE(status::TEXT, 'unknown') AS s, SUM(amount) AS total FROM old_rows GROUP BY 1 LOOP
+            PERFORM bump_dashboard_stat('payments_amount_' || r.s, -COALESCE(r.total, 0));
+        END LOOP;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Triggers (الـ transition tables لا تسمح بأكثر من حدث في Trigger واحد)
+DROP TRIGGER IF EXISTS stats_clients_ins ON clients;
+DROP TRIGGER IF EXISTS stats_clients_del ON clients;
+CREATE TRIGGER stats_clients_ins AFTER INSERT ON clients REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE track_row_count('clients_count');
+CREATE TRIGGER stats_clients_del AFTER DELETE ON clients REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE track_row_count('clients_count');
+
+DROP TRIGGER IF EXISTS stats_tenants_ins ON tenants;
+DROP TRIGGER IF EXISTS stats_tenants_del ON tenants;
+CREATE TRIGGER stats_tenants_ins AFTER INSERT ON tenants REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE track_row_count('tenants_count');
+CREATE TRIGGER stats_tenants_del AFTER DELETE ON tenants REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE track_row_count('tenants_count');
+
+DROP TRIGGER IF EXISTS stats_properties_ins ON properties;
+DROP TRIGGER IF EXISTS stats_properties_del ON properties;
+DROP TRIGGER IF EXISTS stats_properties_status_ins ON properties;
+DROP TRIGGER IF EXISTS stats_properties_status_upd ON properties;
+DROP TRIGGER IF EXISTS stats_properties_status_del ON properties;
+CREATE TRIGGER stats_properties_ins AFTER INSERT ON properties REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE track_row_count('properties_count');
+CREATE TRIGGER stats_properties_del AFTER DELETE ON properties REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE track_row_count('properties_count');
+CREATE TRIGGER stats_properties_status_ins AFTER INSERT ON properties REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE track_status_counts('properties_status_');
+CREATE TRIGGER stats_properties_status_upd AFTER UPDATE ON properties REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE track_status_counts('properties_status_');
+CREATE TRIGGER stats_properties_status_del AFTER DELETE ON properties REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE track_status_counts('properties_status_');
+
+DROP TRIGGER IF EXISTS stats_contracts_ins ON contracts;
+DROP TRIGGER IF EXISTS stats_contracts_del ON contracts;
+DROP TRIGGER IF EXISTS stats_contracts_status_ins ON contracts;
+DROP TRIGGER IF EXISTS stats_contracts_status_upd ON contracts;
+DROP TRIGGER IF EXISTS stats_contracts_status_del ON contracts;
+CREATE TRIGGER stats_contracts_ins AFTER INSERT ON contracts REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE track_row_count('contracts_count');
+CREATE TRIGGER stats_contracts_del AFTER DELETE ON contracts REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE track_row_count('contracts_count');
+CREATE TRIGGER stats_contracts_status_ins AFTER INSERT ON contracts REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE track_status_counts('contracts_status_');
+CREATE TRIGGER stats_contracts_status_upd AFTER UPDATE ON contracts REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE track_status_counts('contracts_status_');
+CREATE TRIGGER stats_contracts_status_del AFTER DELETE ON contracts REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE track_status_counts('contracts_status_');
+
+DROP TRIGGER IF EXISTS stats_payments_ins ON payments;
+DROP TRIGGER IF EXISTS stats_payments_del ON payments;
+DROP TRIGGER IF EXISTS stats_payments_amount_ins ON payments;
+DROP TRIGGER IF EXISTS stats_payments_amount_upd ON payments;
+DROP TRIGGER IF EXISTS stats_payments_amount_del ON payments;
+CREATE TRIGGER stats_payments_ins AFTER INSERT ON payments REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE track_row_count('payments_count');
+CREATE TRIGGER stats_payments_del AFTER DELETE ON payments REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE track_row_count('payments_count');
+CREATE TRIGGER stats_payments_amount_ins AFTER INSERT ON payments REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE track_payment_amounts();
+CREATE TRIGGER stats_payments_amount_upd AFTER UPDATE ON payments REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE track_payment_amounts();
+CREATE TRIGGER stats_payments_amount_del AFTER DELETE ON payments REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE track_payment_amounts();
+
+-- إعادة الحساب الكامل (التصحيح الدوري) دون قفل الجدول:
+-- القيم الصحيحة وقيم العدادات تُقرأ في نفس الجملة (نفس الـ snapshot)، ثم يُضاف
+-- الفرق (fresh - snapshot) لكل مفتاح بنفس upsert التراكمي الذي تستخدمه Triggers.
+-- فروق المعاملات التي تُثبَّت أثناء العدّ تبقى محفوظة لأنها تُضاف فوق القيمة
+-- الحالية، ولا ينتظر الكتّاب إلا قفل الصفوف القصير عند تطبيق الفروق في النهاية.
+CREATE OR REPLACE FUNCTION refresh_dashboard_stats() RETURNS VOID AS $$
+    INSERT INTO dashboard_stats AS d (key, value, updated_at)
+    SELECT COALESCE(fresh.key, snapshot.key),
+           COALESCE(fresh.value, 0) - COALESCE(snapshot.value, 0),
+           NOW()
+    FROM (
+        SELECT 'clients_count' AS key, COUNT(*)::NUMERIC AS value FROM clients
+        UNION ALL SELECT 'tenants_count', COUNT(*) FROM tenants
+        UNION ALL SELECT 'properties_count', COUNT(*) FROM properties
+        UNION ALL SELECT 'contracts_count', COUNT(*) FROM contracts
+        UNION ALL SELECT 'payments_count', COUNT(*) FROM payments
+        UNION ALL
+        SELECT 'properties_status_' || COALESCE(status::TEXT, 'unknown'), COUNT(*)
+        FROM properties GROUP BY 1
+        UNION ALL
+        SELECT 'contracts_status_' || COALESCE(status::TEXT, 'unknown'), COUNT(*)
+        FROM contracts GROUP BY 1
+        UNION ALL
+        SELECT 'payments_amount_' || COALESCE(status::TEXT, 'unknown'), COALESCE(SUM(amount), 0)
+        FROM payments GROUP BY 1
+        UNION ALL
+        SELECT 'contracts_expiring_30', COUNT(*) FROM contracts
+        WHERE status = 'active' AND end_date BETWEEN CURRENT_DATE AND CURRENT_DATE + 30
+    ) fresh
+    FULL JOIN dashboard_stats snapshot ON snapshot.key = fresh.key
+    WHERE COALESCE(fresh.value, 0) IS DISTINCT FROM COALESCE(snapshot.value, 0)
+       OR snapshot.key IS NULL
+    ON CONFLICT (key) DO UPDATE
+    SET value = d.value + EXCLUDED.value, updated_at = EXCLUDED.updated_at;
+$$ LANGUAGE sql;
+
+SELECT refresh_dashboard_stats();
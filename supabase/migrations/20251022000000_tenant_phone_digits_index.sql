@@ -0,0 +1,17 @@
+-- فهرس على الأرقام فقط من phone لبحث المستأجر بأي صيغة للرقم
+-- (يُستخدم عند عدم وجود الرقم في فهرس الذاكرة app/services/phone_index.py)
+CREATE INDEX IF NOT EXISTS idx_tenants_phone_digits
+    ON tenants ((regexp_replace(phone, '[^0-9]', '', 'g')));
+
+-- نفس الفهرس على contracts.tenant_phone إذا كان الجدول بصيغة ContractsManager
+-- (load_contract_tenant_by_phone يبحث بالأرقام فقط)
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM information_schema.columns
+        WHERE table_name = 'contracts' AND column_name = 'tenant_phone'
+    ) THEN
+        EXECUTE 'CREATE INDEX IF NOT EXISTS idx_contracts_phone_digits
+                 ON contracts ((regexp_replace(tenant_phone, ''[^0-9]'', '''', ''g'')))';
+    END IF;
+END $$;
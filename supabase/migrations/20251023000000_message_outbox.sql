@@ -0,0 +1,32 @@
+-- صندوق الرسائل الصادرة (outbox)
+-- كل رسالة واتساب صادرة تُكتب هنا أولاً، ثم يرسلها عمّال الخلفية
+-- (app/services/outbox.py) مع إعادة المحاولة بتأخير تصاعدي ونقل الفاشلة نهائياً إلى 'dead'.
+--
+-- الحالات: pending ← sending ← sent | pending (إعادة) | dead
+-- الصفوف العالقة في 'sending' بعد انتهاء locked_until (توقف العامل) تُستلم من جديد.
+
+CREATE TABLE IF NOT EXISTS message_outbox (
+    id BIGSERIAL PRIMARY KEY,
+    recipient VARCHAR(32) NOT NULL,
+    payload JSONB NOT NULL,
+    kind VARCHAR(50) NOT NULL DEFAULT 'text',
+    ref_id BIGINT,
+    dedupe_key VARCHAR(200) UNIQUE,
+    status VARCHAR(20) NOT NULL DEFAULT 'pending',
+    attempts INT NOT NULL DEFAULT 0,
+    max_attempts INT NOT NULL DEFAULT 5,
+    next_attempt_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    locked_until TIMESTAMPTZ,
+    last_error TEXT,
+    provider_message_id VARCHAR(200),
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    sent_at TIMESTAMPTZ
+);
+
+-- الاستلام: الصفوف المستحقة فقط (فهرس جزئي صغير)
+CREATE INDEX IF NOT EXISTS idx_outbox_pending_due
+    ON message_outbox (next_attempt_at) WHERE status = 'pending';
+CREATE INDEX IF NOT EXISTS idx_outbox_sending_lease
+    ON message_outbox (locked_until) WHERE status = 'sending';
+CREATE INDEX IF NOT EXISTS idx_outbox_dead
+    ON message_outbox (created_at DESC) WHERE status = 'dead';
@@ -0,0 +1,40 @@
+-- جدول تذكيرات العقود كمصدر وحيد لما يجب إرساله
+-- الصفوف تُنشأ جماعياً من contracts.renewal_reminders (إزاحات بالأيام قبل end_date)
+-- ومن ContractsManager عند إنشاء العقد، ويستلمها app/services/reminder_scheduler.py
+-- باستعلام واحد على (reminder_date) للصفوف غير المرسلة.
+
+CREATE TABLE IF NOT EXISTS contract_reminders (
+    id SERIAL PRIMARY KEY,
+    contract_id INTEGER NOT NULL REFERENCES contracts(id) ON DELETE CASCADE,
+    reminder_type TEXT NOT NULL,
+    reminder_date DATE NOT NULL,
+    message TEXT,
+    is_sent BOOLEAN DEFAULT FALSE,
+    sent_at TIMESTAMP,
+    phone_number TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- جداول ContractsManager القديمة لا تحتوي على الإزاحات
+ALTER TABLE contracts
+    ADD COLUMN IF NOT EXISTS renewal_reminders JSONB
+    DEFAULT '[{"days":90}, {"days":60}, {"days":30}, {"days":7}]'::JSONB;
+
+-- is_sent بدون NULL حتى يطابق الفهرس الجزئي شرط الاستعلام
+UPDATE contract_reminders SET is_sent = FALSE WHERE is_sent IS NULL;
+ALTER TABLE contract_reminders ALTER COLUMN is_sent SET DEFAULT FALSE;
+ALTER TABLE contract_reminders ALTER COLUMN is_sent SET NOT NULL;
+
+-- تذكير واحد لكل عقد في اليوم (الملء الجماعي يعتمد على ON CONFLICT)
+DELETE FROM contract_reminders a
+USING contract_reminders b
+WHERE a.id > b.id
+  AND a.contract_id = b.contract_id
+  AND a.reminder_date = b.reminder_date;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_contract_reminders_contract_date
+    ON contract_reminders (contract_id, reminder_date);
+
+-- "ما المستحق الآن": الصفوف غير المرسلة فقط مرتبة بالتاريخ
+CREATE INDEX IF NOT EXISTS idx_contract_reminders_due
+    ON contract_reminders (reminder_date) WHERE is_sent = FALSE;
@@ -0,0 +1,19 @@
+-- نموذج القراءة للعقود: الأيام المتبقية وحالة قرب الانتهاء تُحسب في SQL
+-- الأعمدة المخزنة days_remaining / is_expiring (من ContractsManager) كانت تتقادم
+-- لأنها تُكتب مرة واحدة عند الإنشاء، فتُحذف ويحل محلها العرض contracts_view.
+
+DROP VIEW IF EXISTS contracts_view;
+
+ALTER TABLE contracts
+    DROP COLUMN IF EXISTS days_remaining,
+    DROP COLUMN IF EXISTS is_expiring;
+
+CREATE OR REPLACE VIEW contracts_view AS
+SELECT c.*,
+       (c.end_date - CURRENT_DATE) AS days_remaining,
+       (c.end_date - CURRENT_DATE) <= 30 AS is_expiring
+FROM contracts c;
+
+-- "تنتهي خلال N يوم": مسح نطاق على end_date للعقود النشطة فقط
+CREATE INDEX IF NOT EXISTS idx_contracts_active_end_date
+    ON contracts (end_date) WHERE status = 'active';
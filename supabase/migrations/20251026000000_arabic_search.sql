@@ -0,0 +1,61 @@
+-- بحث عربي مفهرس للعقود والمستأجرين (pg_trgm)
+--
+-- ar_normalize: نفس تطبيع app/services/intent_matcher.normalize_text
+--   أحرف صغيرة، حذف التشكيل والتطويل، أ/إ/آ/ٱ ← ا ، ى/ئ ← ي ، ة ← ه ، ؤ ← و
+-- يطبق عند الفهرسة (عمود search_doc المولد) وعند الاستعلام (ar_normalize(%s))
+-- فتتطابق "مؤسسة" و"موسسه" و"أحمد" و"احمد".
+--
+-- search_doc يضم الحقول النصية المطبعة + أرقام الهاتف فقط، وعليه فهرس GIN
+-- بالـ trigrams يخدم LIKE '%...%' ومعامل word_similarity (<%) معاً.
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE OR REPLACE FUNCTION ar_normalize(input TEXT)
+RETURNS TEXT
+LANGUAGE sql IMMUTABLE STRICT PARALLEL SAFE
+AS $$
+    SELECT translate(
+        regexp_replace(lower(input), '[\u064B-\u065F\u0670\u06D6-\u06ED\u0640]', '', 'g'),
+        'أإآٱىئةؤ',
+        'ااااييهو'
+    )
+$$;
+
+-- المستأجرون: الاسم + أرقام الهاتف
+ALTER TABLE tenants ADD COLUMN IF NOT EXISTS search_doc TEXT
+    GENERATED ALWAYS AS (
+        ar_normalize(coalesce(name, '')) || ' ' || regexp_replace(coalesce(phone, ''), '[^0-9]', '', 'g')
+    ) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_tenants_search_trgm
+    ON tenants USING gin (search_doc gin_trgm_ops);
+
+-- العقود: فقط إذا كان الجدول بصيغة ContractsManager (رقم العقد واسم المستأجر والعنوان فيه)
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM information_schema.columns
+        WHERE table_name = 'contracts' AND column_name = 'tenant_name'
+    ) THEN
+        EXECUTE $ddl$
+            ALTER TABLE contracts ADD COLUMN IF NOT EXISTS search_doc TEXT
+                GENERATED ALWAYS AS (
+                    ar_normalize(
+                        coalesce(contract_number, '') || ' ' ||
+                        coalesce(tenant_name, '') || ' ' ||
+                        coalesce(property_address, '')
+                    ) || ' ' || regexp_replace(coalesce(tenant_phone, ''), '[^0-9]', '', 'g')
+                ) STORED
+        $ddl$;
+        EXECUTE 'CREATE INDEX IF NOT EXISTS idx_contracts_search_trgm
+                 ON contracts USING gin (search_doc gin_trgm_ops)';
+
+        -- contracts_view مبني على c.* فيعاد إنشاؤه ليشمل العمود الجديد
+        EXECUTE 'DROP VIEW IF EXISTS contracts_view';
+        EXECUTE 'CREATE VIEW contracts_view AS
+                 SELECT c.*,
+                        (c.end_date - CURRENT_DATE) AS days_remaining,
+                        (c.end_date - CURRENT_DATE) <= 30 AS is_expiring
+                 FROM contracts c';
+    END IF;
+END $$;
@@ -0,0 +1,4 @@
+-- فهارس التصدير بالتدفق (app/services/exports.py)
+-- تصدير مالك واحد: العقارات بـ client_id (idx_properties_client_id موجود)
+-- ثم مدفوعات كل عقار بترتيب التاريخ، فلا يُمسح جدول المدفوعات كاملاً.
+CREATE INDEX IF NOT EXISTS idx_payments_property_date ON payments (property_id, payment_date, id);
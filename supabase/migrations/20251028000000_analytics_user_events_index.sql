@@ -0,0 +1,4 @@
+-- عدّادات أحداث مستخدم واحد (services/analytics_manager.generate_user_insights)
+-- تُخدم من الفهرس بدلاً من مسح analytics_events. المهمة الدورية لكل المستأجرين
+-- (app/services/analytics_jobs) تمسح الجدول مرة واحدة بـ GROUP BY ولا تحتاجه.
+CREATE INDEX IF NOT EXISTS idx_analytics_events_user_type ON analytics_events (user_id, event_type);
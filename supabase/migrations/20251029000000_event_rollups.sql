@@ -0,0 +1,61 @@
+-- تجميع تراكمي لأحداث analytics_events في aggregated_metrics (app/services/rollups.py)
+--
+-- rollup_state يحفظ آخر analytics_events.id تم تجميعه (high-water mark)،
+-- فكل تشغيل يقرأ الأحداث الجديدة فقط ويضيف أعدادها إلى عدّادات
+-- الساعة/اليوم/الشهر بدلاً من إعادة مسح جدول الأحداث.
+
+CREATE TABLE IF NOT EXISTS rollup_state (
+    name VARCHAR(50) PRIMARY KEY,
+    last_event_id BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+-- صف العدّاد: (metric_type, period = hour|day|month, bucket_start, dimension)
+ALTER TABLE aggregated_metrics ADD COLUMN IF NOT EXISTS bucket_start TIMESTAMPTZ;
+ALTER TABLE aggregated_metrics ADD COLUMN IF NOT EXISTS dimension VARCHAR(100) NOT NULL DEFAULT '';
+
+-- مفتاح الـ upsert وفي نفس الوقت فهرس قراءة السلاسل الزمنية بنطاق تاريخ
+CREATE UNIQUE INDEX IF NOT EXISTS idx_aggregated_metrics_rollup
+    ON aggregated_metrics (metric_type, period, bucket_start, dimension)
+    WHERE bucket_start IS NOT NULL;
+
+-- مصادر الأحداث (على نمط log_maintenance_event)
+
+-- دفعة أصبحت متأخرة
+CREATE OR REPLACE FUNCTION log_payment_overdue_event() RETURNS TRIGGER AS $$
+BEGIN
+   IF TG_OP = 'INSERT' OR OLD.status IS DISTINCT FROM NEW.status THEN
+      INSERT INTO analytics_events (event_type, user_id, details, timestamp)
+      SELECT 'payment_overdue', c.tenant_id,
+             jsonb_build_object('payment_id', NEW.id, 'contract_id', NEW.contract_id, 'amount', NEW.amount),
+             NOW()
+      FROM contracts c WHERE c.id = NEW.contract_id;
+   END IF;
+   RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS log_payment_overdue ON payments;
+CREATE TRIGGER log_payment_overdue
+AFTER INSERT OR UPDATE OF status ON payments
+FOR EACH ROW
+WHEN (NEW.status = 'overdue')
+EXECUTE PROCEDURE log_payment_overdue_event();
+
+-- رسالة واتساب أُرسلت من صندوق الإرسال
+CREATE OR REPLACE FUNCTION log_message_sent_event() RETURNS TRIGGER AS $$
+BEGIN
+   IF OLD.status IS DISTINCT FROM 'sent' THEN
+      INSERT INTO analytics_events (event_type, details, timestamp)
+      VALUES ('message_sent', jsonb_build_object('kind', NEW.kind, 'outbox_id', NEW.id), NOW());
+   END IF;
+   RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS log_message_sent ON message_outbox;
+CREATE TRIGGER log_message_sent
+AFTER UPDATE OF status ON message_outbox
+FOR EACH ROW
+WHEN (NEW.status = 'sent')
+EXECUTE PROCEDURE log_message_sent_event();
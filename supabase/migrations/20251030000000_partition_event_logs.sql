@@ -0,0 +1,129 @@
+-- تقسيم analytics_events و ai_agent_logs شهرياً حسب timestamp مع حذف القديم
+--
+-- كل شهر جدول فرعي باسم <الجدول>_YYYYMM (حدود الشهر بتوقيت UTC) + جدول
+-- <الجدول>_default يلتقط أي صف خارج الأشهر المنشأة.
+-- ensure_monthly_partitions ينشئ الأشهر القادمة مسبقاً (يستدعيه
+-- app/services/partitions.py دورياً)، والحذف يتم بـ DETACH + DROP للجدول
+-- الفرعي كاملاً بعد تلخيصه في aggregated_metrics بدلاً من DELETE صف بصف.
+-- الاستعلامات التي تحدد نطاق timestamp تقرأ الأشهر المعنية فقط (partition pruning).
+
+CREATE OR REPLACE FUNCTION create_monthly_partitions(parent TEXT, from_month DATE, to_month DATE)
+RETURNS INT AS $$
+DECLARE
+   m DATE;
+   part TEXT;
+   created INT := 0;
+BEGIN
+   FOR m IN
+      SELECT generate_series(date_trunc('month', from_month), date_trunc('month', to_month), INTERVAL '1 month')::DATE
+   LOOP
+      part := format('%s_%s', parent, to_char(m, 'YYYYMM'));
+      IF to_regclass(part) IS NULL THEN
+         EXECUTE format(
+            'CREATE TABLE %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+            part, parent,
+            m::TIMESTAMP AT TIME ZONE 'UTC',
+            (m + INTERVAL '1 month')::TIMESTAMP AT TIME ZONE 'UTC'
+         );
+         created := created + 1;
+      END IF;
+   END LOOP;
+   RETURN created;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION ensure_monthly_partitions(parent TEXT, months_ahead INT DEFAULT 2)
+RETURNS INT AS $$
+   SELECT create_monthly_partitions(
+      parent,
+      (NOW() AT TIME ZONE 'UTC')::DATE,
+      ((NOW() AT TIME ZONE 'UTC') + make_interval(months => months_ahead))::DATE
+   );
+$$ LANGUAGE sql;
+
+-- analytics_events
+DO $$
+DECLARE
+   oldest TIMESTAMPTZ;
+BEGIN
+   IF EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'analytics_events'::regclass) THEN
+      RETURN;
+   END IF;
+
+   ALTER TABLE analytics_events RENAME TO analytics_events_unpartitioned;
+   -- التسلسل يبقى للجدول الجديد (لا يُحذف مع الجدول القديم)
+   ALTER SEQUENCE analytics_events_id_seq OWNED BY NONE;
+
+   CREATE TABLE analytics_events (
+       id INT NOT NULL DEFAULT nextval('analytics_events_id_seq'),
+       event_type VARCHAR(50) NOT NULL,
+       user_id INT REFERENCES tenants(id) ON DELETE SET NULL,
+       details JSONB NOT NULL,
+       timestamp TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+       ip_address INET,
+       session_id UUID,
+       PRIMARY KEY (id, timestamp)
+   ) PARTITION BY RANGE (timestamp);
+   ALTER SEQUENCE analytics_events_id_seq OWNED BY analytics_events.id;
+   CREATE TABLE analytics_events_default PARTITION OF analytics_events DEFAULT;
+
+   SELECT MIN(timestamp) INTO oldest FROM analytics_events_unpartitioned;
+   PERFORM create_monthly_partitions(
+      'analytics_events',
+      COALESCE((oldest AT TIME ZONE 'UTC')::DATE, CURRENT_DATE),
+      (CURRENT_DATE + INTERVAL '2 months')::DATE
+   );
+
+   INSERT INTO analytics_events (id, event_type, user_id, details, timestamp, ip_address, session_id)
+   SELECT id, event_type, user_id, details, COALESCE(timestamp, NOW()), ip_address, session_id
+   FROM analytics_events_unpartitioned;
+
+   DROP TABLE analytics_events_unpartitioned;
+END $$;
+
+CREATE INDEX IF NOT EXISTS idx_analytics_events_type_ts ON analytics_events (event_type, timestamp);
+CREATE INDEX IF NOT EXISTS idx_analytics_events_user_type ON analytics_events (user_id, event_type);
+-- القراءة التراكمية بعد آخر id مُجمّع (app/services/rollups.py)
+CREATE INDEX IF NOT EXISTS idx_analytics_events_id ON analytics_events (id);
+
+-- ai_agent_logs
+DO $$
+DECLARE
+   oldest TIMESTAMPTZ;
+BEGIN
+   IF EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'ai_agent_logs'::regclass) THEN
+      RETURN;
+   END IF;
+
+   ALTER TABLE ai_agent_logs RENAME TO ai_agent_logs_unpartitioned;
+   ALTER SEQUENCE ai_agent_logs_id_seq OWNED BY NONE;
+
+   CREATE TABLE ai_agent_logs (
+       id INT NOT NULL DEFAULT nextval('ai_agent_logs_id_seq'),
+       event_type VARCHAR(50) NOT NULL,
+       details JSONB NOT NULL,
+       timestamp TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+       severity VARCHAR(20) DEFAULT 'low',
+       PRIMARY KEY (id, timestamp)
+   ) PARTITION BY RANGE (timestamp);
+   ALTER SEQUENCE ai_agent_logs_id_seq OWNED BY ai_agent_logs.id;
+   CREATE TABLE ai_agent_logs_default PARTITION OF ai_agent_logs DEFAULT;
+
+   SELECT MIN(timestamp) INTO oldest FROM ai_agent_logs_unpartitioned;
+   PERFORM create_monthly_partitions(
+      'ai_agent_logs',
+      COALESCE((oldest AT TIME ZONE 'UTC')::DATE, CURRENT_DATE),
+      (CURRENT_DATE + INTERVAL '2 months')::DATE
+   );
+
+   INSERT INTO ai_agent_logs (id, event_type, details, timestamp, severity)
+   SELECT id, event_type, details, COALESCE(timestamp, NOW()), severity
+   FROM ai_agent_logs_unpartitioned;
+
+   DROP TABLE ai_agent_logs_unpartitioned;
+END $$;
+
+CREATE INDEX IF NOT EXISTS idx_ai_agent_logs_type_ts ON ai_agent_logs (event_type, timestamp);
+
+-- آخر timestamp مُجمّع (للمتابعة فقط؛ ما يُجمّع تحدده العلامة last_event_id، ثم (last_xact_id, last_event_id) منذ 20251101000000)
+ALTER TABLE rollup_state ADD COLUMN IF NOT EXISTS last_event_at TIMESTAMPTZ;
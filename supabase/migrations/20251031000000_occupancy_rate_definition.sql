@@ -0,0 +1,14 @@
+-- تعريف واحد لنسبة الإشغال في aggregated_metrics (metric_type = 'occupancy_rate')
+--
+-- المهمة الجماعية (app/services/analytics_jobs.compute_occupancy_metrics) وإحصائيات
+-- الداشبورد تعتبر 'occupied' و 'rented' مشغولاً (stats_service.OCCUPIED_STATUSES)،
+-- بينما كانت الدالة تعدّ 'occupied' فقط وبلا تقريب. نفس الحالات ونفس التقريب هنا.
+
+CREATE OR REPLACE FUNCTION calculate_occupancy_rate(owner_id_param INT) RETURNS NUMERIC AS $$
+   SELECT COALESCE(
+      ROUND(100.0 * COUNT(*) FILTER (WHERE status IN ('occupied', 'rented')) / NULLIF(COUNT(*), 0), 2),
+      0
+   )
+   FROM properties
+   WHERE owner_id = owner_id_param;
+$$ LANGUAGE sql STABLE SECURITY DEFINER;
@@ -0,0 +1,23 @@
+-- علامة تجميع rollups بحسب معاملة الحدث بدلاً من id + مهلة زمنية
+--
+-- id يُحجز عند INSERT و timestamp هو NOW() أي بداية المعاملة، فحدث من معاملة
+-- طويلة (مثل UPDATE payments جماعي يطلق log_payment_overdue_event) قد يظهر بعد
+-- أن تجاوزت العلامة id الخاص به فلا يُجمّع أبداً.
+-- xact_id = معرّف المعاملة التي كتبت الحدث. كل حدث xact_id له أقل من
+-- pg_snapshot_xmin(pg_current_snapshot()) نهائي (مُثبّت أو ملغى) وأي حدث قادم
+-- سيحمل xact_id أكبر، فالتجميع بترتيب (xact_id, id) حتى هذا الحد لا يُسقط حدثاً
+-- ولا يعدّه مرتين (app/services/rollups.py).
+--
+-- الصفوف الموجودة تأخذ القيمة الثابتة '1' (أصغر من أي معاملة حقيقية) دون إعادة
+-- كتابة الجدول، و rollup_state.last_xact_id يبدأ بـ '1' أيضاً فيتابع التجميع من
+-- last_event_id الحالي للصفوف القديمة ثم كل ما كُتب بعد الترحيل.
+
+ALTER TABLE analytics_events ADD COLUMN IF NOT EXISTS xact_id xid8 NOT NULL DEFAULT '1';
+ALTER TABLE analytics_events ALTER COLUMN xact_id SET DEFAULT pg_current_xact_id();
+
+CREATE INDEX IF NOT EXISTS idx_analytics_events_xact ON analytics_events (xact_id, id);
+
+ALTER TABLE rollup_state ADD COLUMN IF NOT EXISTS last_xact_id xid8 NOT NULL DEFAULT '1';
+
+COMMENT ON COLUMN rollup_state.last_event_id IS
+    'آخر id مُجمّع ضمن last_xact_id؛ العلامة هي الزوج (last_xact_id, last_event_id)';
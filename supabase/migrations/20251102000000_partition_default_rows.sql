@@ -0,0 +1,94 @@
+-- صفوف الجدول الافتراضي (<الجدول>_default) في الجداول المقسمة شهرياً
+--
+-- الصف الذي لا يجد شهره يذهب إلى الجدول الافتراضي. إذا أُنشئ شهره لاحقاً
+-- بـ CREATE TABLE ... PARTITION OF يرفضه Postgres (قيد الجدول الافتراضي)،
+-- فتتوقف صيانة الجداول، وصفوف الجدول الافتراضي نفسها لا تُلخّص ولا تُحذف أبداً.
+--
+-- create_monthly_partitions: إذا كان في الجدول الافتراضي صفوف من الشهر الجديد
+--   يُنشأ الشهر جدولاً مستقلاً، تُنقل إليه الصفوف (DELETE ... RETURNING)، ثم
+--   يُلحق بـ ATTACH PARTITION، كل ذلك في نفس المعاملة.
+-- absorb_default_partition: ينشئ الأشهر الناقصة لكل صفوف الجدول الافتراضي فتنتقل
+--   إليها، ومن ثم تشملها مدة الاحتفاظ والتلخيص كبقية الأشهر
+--   (app/services/partitions.py يستدعيه قبل ensure_monthly_partitions).
+
+CREATE OR REPLACE FUNCTION default_partition_of(parent TEXT)
+RETURNS TEXT AS $$
+   SELECT c.relname::TEXT
+   FROM pg_inherits i
+   JOIN pg_class c ON c.oid = i.inhrelid
+   WHERE i.inhparent = parent::regclass
+     AND pg_get_expr(c.relpartbound, c.oid) = 'DEFAULT';
+$$ LANGUAGE sql STABLE;
+
+CREATE OR REPLACE FUNCTION create_monthly_partitions(parent TEXT, from_month DATE, to_month DATE)
+RETURNS INT AS $$
+DECLARE
+   m DATE;
+   part TEXT;
+   lower_bound TIMESTAMPTZ;
+   upper_bound TIMESTAMPTZ;
+   default_part TEXT := default_partition_of(parent);
+   has_rows BOOLEAN;
+   created INT := 0;
+BEGIN
+   FOR m IN
+      SELECT generate_series(date_trunc('month', from_month), date_trunc('month', to_month), INTERVAL '1 month')::DATE
+   LOOP
+      part := format('%s_%s', parent, to_char(m, 'YYYYMM'));
+      IF to_regclass(part) IS NOT NULL THEN
+         CONTINUE;
+      END IF;
+      lower_bound := m::TIMESTAMP AT TIME ZONE 'UTC';
+      upper_bound := (m + INTERVAL '1 month')::TIMESTAMP AT TIME ZONE 'UTC';
+
+      has_rows := FALSE;
+      IF default_part IS NOT NULL THEN
+         EXECUTE format('SELECT EXISTS (SELECT 1 FROM %I WHERE timestamp >= %L AND timestamp < %L)',
+                        default_part, lower_bound, upper_bound)
+            INTO has_rows;
+      END IF;
+
+      IF has_rows THEN
+         EXECUTE format('CREATE TABLE %I (LIKE %I INCLUDING DEFAULTS)', part, parent);
+         -- القيد يغني ATTACH عن مسح الجدول الجديد للتحقق من حدوده
+         EXECUTE format('ALTER TABLE %I ADD CONSTRAINT %I CHECK (timestamp >= %L AND timestamp < %L)',
+                        part, part || '_bounds', lower_bound, upper_bound);
+         EXECUTE format(
+            'WITH moved AS (DELETE FROM %I WHERE timestamp >= %L AND timestamp < %L RETURNING *)
+             INSERT INTO %I SELECT * FROM moved',
+            default_part, lower_bound, upper_bound, part
+         );
+         EXECUTE format('ALTER TABLE %I ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                        parent, part, lower_bound, upper_bound);
+         EXECUTE format('ALTER TABLE %I DROP CONSTRAINT %I', part, part || '_bounds');
+      ELSE
+         EXECUTE format(
+            'CREATE TABLE %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+            part, parent, lower_bound, upper_bound
+         );
+      END IF;
+      created := created + 1;
+   END LOOP;
+   RETURN created;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION absorb_default_partition(parent TEXT)
+RETURNS INT AS $$
+DECLARE
+   default_part TEXT := default_partition_of(parent);
+   m DATE;
+   created INT := 0;
+BEGIN
+   IF default_part IS NULL THEN
+      RETURN 0;
+   END IF;
+   FOR m IN EXECUTE format(
+      'SELECT DISTINCT date_trunc(''month'', timestamp AT TIME ZONE ''UTC'')::DATE FROM %I ORDER BY 1',
+      default_part
+   ) LOOP
+      created := created + create_monthly_partitions(parent, m, m);
+   END LOOP;
+   RETURN created;
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,2 @@
+# pytester لاختبار إضافة حد الاستعلامات (app.utils.pytest_query_budget) في جلسة pytest منفصلة
+pytest_plugins = ["pytester"]
@@ -0,0 +1,89 @@
+import io
+import json
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+from app.services.contract_import import RowError, iter_csv_rows, iter_json_rows, validate_row
+
+VALID = {
+    "contract_number": " C-1 ",
+    "start_date": "2025-01-01",
+    "end_date": "2026-01-01T00:00:00",
+    "monthly_rent": "250.500",
+    "payment_frequency": "Quarterly",
+    "payment_day": "5",
+    "tenant_name": "  أحمد  ",
+    "notes": "",
+}
+
+
+def test_validate_row_normalizes_values_and_fills_defaults():
+    data, errors = validate_row(VALID)
+    assert errors == []
+    assert data["contract_number"] == "C-1"
+    assert (data["start_date"], data["end_date"]) == (date(2025, 1, 1), date(2026, 1, 1))
+    assert data["monthly_rent"] == Decimal("250.500")
+    assert data["payment_frequency"] == "quarterly"
+    assert data["payment_day"] == 5
+    assert data["tenant_name"] == "أحمد"
+    assert data["notes"] == ""
+    assert data["contract_type"] == "rental"
+    assert data["commission_rate"] == Decimal("5.0")
+
+
+def test_validate_row_requires_key_fields():
+    data, errors = validate_row({"contract_number": "  ", "start_date": "2025-01-01"})
+    assert data is None
+    assert errors == ["الحقل contract_number مطلوب", "الحقل end_date مطلوب"]
+
+
+@pytest.mark.parametrize("override, message", [
+    ({"end_date": "2024-12-31"}, "تاريخ الانتهاء يجب أن يكون بعد تاريخ البداية"),
+    ({"start_date": "01/01/2025"}, "صيغة التاريخ يجب أن تكون YYYY-MM-DD"),
+    ({"monthly_rent": "-1"}, "الحقل monthly_rent لا يقبل قيمة سالبة"),
+    ({"deposit_amount": "abc"}, "الحقل deposit_amount يجب أن يكون رقماً"),
+    ({"tenant_id": "x"}, "الحقل tenant_id يجب أن يكون عدداً صحيحاً"),
+    ({"payment_day": "32"}, "payment_day يجب أن يكون بين 1 و 31"),
+    ({"payment_day": "first"}, "الحقل payment_day يجب أن يكون عدداً صحيحاً"),
+    ({"payment_frequency": "weekly"}, "تكرار الدفع غير معروف: weekly"),
+])
+def test_validate_row_rejects_bad_values(override, message):
+    data, errors = validate_row({**VALID, **override})
+    assert data is None
+    assert errors == [message]
+
+
+def test_validate_row_accepts_month_count_frequency():
+    data, errors = validate_row({**VALID, "payment_frequency": "2"})
+    assert errors == [] and data["payment_frequency"] == "2"
+
+
+def test_iter_csv_rows_handles_bom_and_header_spaces():
+    raw = "﻿contract_number, start_date ,end_date\nC-1,2025-01-01,2026-01-01\n".encode("utf-8")
+    assert list(iter_csv_rows(io.BytesIO(raw))) == [
+        {"contract_number": "C-1", "start_date": "2025-01-01", "end_date": "2026-01-01"},
+    ]
+
+
+def test_iter_json_rows_reads_arrays():
+    raw = json.dumps([{"contract_number": "C-1"}, {"contract_number": "C-2"}]).encode("utf-8")
+    assert list(iter_json_rows(io.BytesIO(b"  \n" + raw))) == [
+        {"contract_number": "C-1"}, {"contract_number": "C-2"},
+    ]
+
+
+def test_iter_json_rows_rejects_oversized_arrays():
+    raw = json.dumps([{"contract_number": f"C-{i}"} for i in range(100)]).encode("utf-8")
+    with pytest.raises(ValueError):
+        list(iter_json_rows(io.BytesIO(raw), max_array_bytes=100))
+
+
+def test_iter_json_rows_turns_bad_ndjson_lines_into_row_errors():
+    raw = '{"contract_number": "C-1"}\n\n{"contract_number": \n{"contract_number": "C-3"}\n'
+    rows = list(iter_json_rows(io.StringIO(raw)))
+    assert rows[0] == {"contract_number": "C-1"}
+    assert isinstance(rows[1], RowError) and rows[1].message.startswith("سطر JSON غير صالح")
+    assert rows[2] == {"contract_number": "C-3"}
+    assert len(rows) == 3
@@ -0,0 +1,51 @@
+import io
+import json
+import zipfile
+from datetime import date
+from decimal import Decimal
+
+from app.services import exports
+from app.services.exports import write_csv, write_ndjson, write_xlsx
+
+COLUMNS = ["id", "tenant", "amount", "due_date"]
+ROWS = [
+    (1, "أحمد, الحارثي", Decimal("120.500"), date(2025, 1, 1)),
+    (2, None, Decimal("80"), date(2025, 2, 1)),
+]
+
+
+def test_csv_has_bom_header_and_quoted_cells():
+    data = b"".join(write_csv(COLUMNS, iter(ROWS))).decode("utf-8")
+    assert data.startswith("\ufeffid,tenant,amount,due_date\r\n")
+    assert data.splitlines()[1:] == ["1,\"أحمد, الحارثي\",120.500,2025-01-01", "2,,80,2025-02-01"]
+
+
+def test_ndjson_serializes_decimals_and_dates():
+    lines = b"".join(write_ndjson(COLUMNS, iter(ROWS))).decode("utf-8").splitlines()
+    assert [json.loads(line) for line in lines] == [
+        {"id": 1, "tenant": "أحمد, الحارثي", "amount": "120.500", "due_date": "2025-01-01"},
+        {"id": 2, "tenant": None, "amount": "80", "due_date": "2025-02-01"},
+    ]
+
+
+def test_writers_stream_in_chunks():
+    chunks = list(exports._buffered((b"y" * 40 for _ in range(20)), chunk_bytes=256))
+    assert [len(chunk) for chunk in chunks] == [280, 280, 240]
+
+    rows = ((i, "x" * 50, Decimal(i), date(2025, 1, 1)) for i in range(5000))
+    chunks = list(write_csv(COLUMNS, rows))
+    assert len(chunks) > 1
+    assert all(len(chunk) >= exports.EXPORT_CHUNK_BYTES for chunk in chunks[:-1])
+
+
+def test_xlsx_is_a_valid_workbook():
+    data = b"".join(write_xlsx(COLUMNS, iter(ROWS), sheet_name="payments"))
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        assert archive.testzip() is None
+        assert {"[Content_Types].xml", "xl/workbook.xml", "xl/worksheets/sheet1.xml"} <= set(archive.namelist())
+        assert 'name="payments"' in archive.read("xl/workbook.xml").decode("utf-8")
+        sheet = archive.read("xl/worksheets/sheet1.xml").decode("utf-8")
+    assert sheet.count("<row>") == 3
+    assert "<c><v>120.500</v></c>" in sheet
+    assert "أحمد, الحارثي" in sheet
+    assert "<c/>" in sheet
@@ -0,0 +1,38 @@
+from app.services.intent_matcher import MESSAGE_INTENTS, IntentMatcher, normalize_text
+
+
+def test_normalize_text_folds_arabic_letter_forms():
+    assert normalize_text("إيجارٌ") == "ايجار"
+    assert normalize_text("مَدرسةٌ على") == "مدرسه علي"
+    assert normalize_text("HELLO") == "hello"
+    assert normalize_text(None) == ""
+
+
+def test_arabic_keywords_match_inside_words_and_with_diacritics():
+    assert MESSAGE_INTENTS.match("أريد السداد بالتحويل") == "payment"
+    assert MESSAGE_INTENTS.match("المكيف يحتاج صيانـــة") == "maintenance"
+    assert MESSAGE_INTENTS.match("أُريد إصلاح الباب") == "maintenance"
+
+
+def test_higher_priority_intent_wins():
+    # payment قبل greeting في الجدول
+    assert MESSAGE_INTENTS.match("السلام عليكم، متى موعد الدفع؟") == "payment"
+    assert MESSAGE_INTENTS.intents("مرحبا عندي مشكلة في الدفع") == ["payment", "maintenance", "greeting"]
+
+
+def test_latin_keywords_respect_word_boundaries():
+    assert MESSAGE_INTENTS.match("the sink is leaking, please repair") == "maintenance"
+    assert MESSAGE_INTENTS.match("my account details") == "inquiry"
+    assert MESSAGE_INTENTS.match("Good Morning!") == "greeting"
+    assert MESSAGE_INTENTS.match("prepay") is None
+
+
+def test_no_match_returns_none():
+    assert MESSAGE_INTENTS.match("شكرا جزيلا") is None
+    assert MESSAGE_INTENTS.match("") is None
+
+
+def test_short_latin_keyword_must_be_whole_word():
+    matcher = IntentMatcher.from_keyword_map({"ac": "maintenance"})
+    assert matcher.match("the ac is off") == "maintenance"
+    assert matcher.match("each account") is None
@@ -0,0 +1,91 @@
+import math
+import threading
+
+from app.utils.metrics import MetricsRegistry, _format_value, metrics
+
+
+def test_format_value():
+    assert _format_value(3.0) == "3"
+    assert _format_value(0.25) == "0.25"
+    assert _format_value(math.inf) == "+Inf"
+    assert _format_value(-math.inf) == "-Inf"
+    assert _format_value(math.nan) == "NaN"
+
+
+def test_counter_and_gauge_exposition_with_escaped_labels():
+    registry = MetricsRegistry()
+    requests = registry.counter("app_requests_total", "عدد الطلبات", ["route"])
+    requests.labels('/a"b\\c\nd').inc()
+    requests.labels('/a"b\\c\nd').inc(2)
+    registry.gauge("app_queue_depth", "عمق الطابور").set(7)
+
+    assert registry.expose() == (
+        "# HELP app_requests_total عدد الطلبات\n"
+        "# TYPE app_requests_total counter\n"
+        'app_requests_total{route="/a\\"b\\\\c\\nd"} 3\n'
+        "# HELP app_queue_depth عمق الطابور\n"
+        "# TYPE app_queue_depth gauge\n"
+        "app_queue_depth 7\n"
+    )
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = MetricsRegistry()
+    latency = registry.histogram("app_latency_seconds", "الزمن", ["route"], buckets=(0.1, 0.5))
+    child = latency.labels("/x")
+    for value in (0.05, 0.1, 0.3, 2.0):
+        child.observe(value)
+
+    lines = registry.expose().splitlines()[2:]
+    assert lines == [
+        'app_latency_seconds_bucket{route="/x",le="0.1"} 2',
+        'app_latency_seconds_bucket{route="/x",le="0.5"} 3',
+        'app_latency_seconds_bucket{route="/x",le="+Inf"} 4',
+        'app_latency_seconds_sum{route="/x"} 2.45',
+        'app_latency_seconds_count{route="/x"} 4',
+    ]
+
+
+def test_shards_from_every_thread_are_summed():
+    registry = MetricsRegistry()
+    counter = registry.counter("app_events_total", "الأحداث")
+
+    def work():
+        for _ in range(1000):
+            counter.inc()
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    counter.inc()
+    assert registry.expose().splitlines()[-1] == "app_events_total 4001"
+
+
+def test_callback_metrics():
+    registry = MetricsRegistry()
+    registry.callback("app_none", "بلا قيمة", lambda: None)
+    registry.callback("app_failing", "دالة تفشل", lambda: 1 / 0)
+    registry.callback("app_by_state", "حسب الحالة", lambda: {("idle",): 2, ("busy",): 1.5}, ["state"])
+    assert registry.expose().splitlines() == [
+        "# HELP app_none بلا قيمة", "# TYPE app_none gauge",
+        "# HELP app_failing دالة تفشل", "# TYPE app_failing gauge",
+        "# HELP app_by_state حسب الحالة", "# TYPE app_by_state gauge",
+        'app_by_state{state="idle"} 2',
+        'app_by_state{state="busy"} 1.5',
+    ]
+
+
+def test_pool_gauges_are_empty_without_a_pool():
+    # لا مجمع اتصالات في الاختبارات: المقاييس تظهر دون عينات
+    text = metrics.expose()
+    assert "# TYPE db_pool_connections_in_use gauge" in text
+    assert "# TYPE db_pool_checkouts_total counter" in text
+    assert not any(line.startswith("db_pool_") for line in text.splitlines())
+
+
+def test_registering_twice_returns_the_same_metric():
+    registry = MetricsRegistry()
+    first = registry.counter("app_dup_total", "مكرر")
+    assert registry.counter("app_dup_total", "مكرر") is first
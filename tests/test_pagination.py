@@ -0,0 +1,58 @@
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+
+from app.db.pagination import (
+    InvalidCursor, KeysetQuery, MAX_PAGE_SIZE, DEFAULT_PAGE_SIZE,
+    clamp_page_size, decode_cursor, encode_cursor,
+)
+
+
+def test_cursor_round_trip_keeps_types():
+    values = [date(2025, 1, 31), datetime(2025, 2, 1, 8, 30), Decimal("120.50"), "نص", 42]
+    cursor = encode_cursor(values)
+    assert "=" not in cursor
+    assert decode_cursor(cursor, len(values)) == values
+
+
+def test_decode_rejects_bad_cursors():
+    assert decode_cursor(None, 2) is None
+    with pytest.raises(InvalidCursor):
+        decode_cursor("not-base64!!", 2)
+    with pytest.raises(InvalidCursor):
+        decode_cursor(encode_cursor([1, 2, 3]), 2)
+
+
+def test_clamp_page_size():
+    assert clamp_page_size(None) == DEFAULT_PAGE_SIZE
+    assert clamp_page_size(-5) == 1
+    assert clamp_page_size(10_000) == MAX_PAGE_SIZE
+
+
+def test_build_first_page():
+    query = KeysetQuery("SELECT c.name, c.start_date, c.id FROM contracts c", ["c.start_date", "c.id"])
+    query.where("c.status = %s", "active", name="status", value="active")
+    sql, params = query.build(None, 20)
+    assert sql == (
+        "SELECT c.name, c.start_date, c.id FROM contracts c"
+        "\nWHERE c.status = %s"
+        "\nORDER BY c.start_date DESC, c.id DESC"
+        "\nLIMIT %s"
+    )
+    assert params == ["active", 21]
+
+
+def test_build_after_cursor_and_to_page():
+    query = KeysetQuery("SELECT c.name, c.start_date, c.id FROM contracts c", ["c.start_date", "c.id"])
+    rows = [("a", date(2025, 3, 1), 9), ("b", date(2025, 2, 1), 7), ("c", date(2025, 1, 1), 5)]
+    page = query.to_page(rows, 2)
+    assert page.items == rows[:2]
+    assert page.has_more
+
+    sql, params = query.build(page.next_cursor, 2)
+    assert "WHERE (c.start_date, c.id) < (%s, %s)" in sql
+    assert params == [date(2025, 2, 1), 7, 3]
+
+    last = query.to_page(rows[2:], 2)
+    assert last.next_cursor is None
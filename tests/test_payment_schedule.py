@@ -0,0 +1,53 @@
+from datetime import date
+from decimal import Decimal
+
+from app.services.payment_schedule import compute_installments, frequency_months, is_known_frequency
+
+
+def test_monthly_schedule_covers_every_started_month():
+    # الفترات تبدأ 15/1 و 15/2 و 15/3؛ 15/4 بعد نهاية العقد
+    assert len(compute_installments("2025-01-15", "2025-04-10", 100)) == 3
+    installments = compute_installments("2025-01-15", "2025-04-20", 100)
+    assert installments == [
+        (date(2025, 1, 1), Decimal("100")),
+        (date(2025, 2, 1), Decimal("100")),
+        (date(2025, 3, 1), Decimal("100")),
+        (date(2025, 4, 1), Decimal("100")),
+    ]
+
+
+def test_quarterly_last_installment_covers_remaining_months():
+    installments = compute_installments(date(2025, 1, 1), date(2025, 8, 1), Decimal("250.5"), "quarterly")
+    assert installments == [
+        (date(2025, 1, 1), Decimal("751.5")),
+        (date(2025, 4, 1), Decimal("751.5")),
+        (date(2025, 7, 1), Decimal("250.5")),
+    ]
+
+
+def test_payment_day_is_clamped_to_month_length():
+    installments = compute_installments(date(2024, 1, 1), date(2024, 5, 1), 80, "monthly", payment_day=31)
+    assert [due for due, _ in installments] == [
+        date(2024, 1, 31), date(2024, 2, 29), date(2024, 3, 31), date(2024, 4, 30),
+    ]
+
+
+def test_annual_and_explicit_month_counts():
+    assert compute_installments(date(2025, 1, 1), date(2027, 1, 1), 10, "annual") == [
+        (date(2025, 1, 1), Decimal("120")),
+        (date(2026, 1, 1), Decimal("120")),
+    ]
+    assert frequency_months("2") == 2
+    assert frequency_months("semi-annual") == 6
+    assert frequency_months("unknown") == 1
+
+
+def test_empty_range_has_no_installments():
+    assert compute_installments(date(2025, 5, 1), date(2025, 5, 1), 100) == []
+
+
+def test_is_known_frequency():
+    assert is_known_frequency("Quarterly ")
+    assert is_known_frequency("4")
+    assert not is_known_frequency("0")
+    assert not is_known_frequency("weekly")
@@ -0,0 +1,74 @@
+APP = '''
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.utils.request_timing import RequestTimingMiddleware, current_timer
+
+app = FastAPI()
+app.add_middleware(RequestTimingMiddleware, slow_ms=10_000)
+
+
+@app.get("/contracts/{contract_id}")
+async def contract(contract_id: int, queries: int = 1):
+    for i in range(queries):
+        current_timer().add_query(f"SELECT * FROM contract_payments WHERE contract_id = {i}", 0.001, False)
+    return {"id": contract_id}
+
+
+client = TestClient(app)
+'''
+
+
+def run(pytester, tests, *args):
+    pytester.makepyfile(test_budget=APP + tests)
+    return pytester.runpytest("-p", "app.utils.pytest_query_budget", *args)
+
+
+def test_marker_limit_fails_requests_over_budget(pytester):
+    result = run(pytester, '''
+import pytest
+
+@pytest.mark.query_budget(3)
+def test_within():
+    client.get("/contracts/1?queries=3")
+
+@pytest.mark.query_budget(3)
+def test_over():
+    client.get("/contracts/1?queries=4")
+''')
+    result.assert_outcomes(passed=1, failed=1)
+    result.stdout.fnmatch_lines(["*GET /contracts/{contract_id}: 4*3*"])
+
+
+def test_ini_route_budgets_and_command_line_default(pytester):
+    pytester.makeini('''
+[pytest]
+query_budgets =
+    GET /contracts/{contract_id} = 2
+''')
+    result = run(pytester, '''
+def test_route_budget():
+    client.get("/contracts/1?queries=3")
+''')
+    result.assert_outcomes(failed=1)
+
+    result = run(pytester, '''
+def test_route_budget():
+    client.get("/contracts/1?queries=2")
+''', "--query-budget=1")
+    result.assert_outcomes(passed=1)
+
+
+def test_n_plus_one_can_fail_tests(pytester):
+    result = run(pytester, '''
+import pytest
+
+@pytest.mark.query_budget(n_plus_one=True)
+def test_loop():
+    client.get("/contracts/1?queries=6")
+
+def test_loop_allowed():
+    client.get("/contracts/1?queries=6")
+''')
+    result.assert_outcomes(passed=1, failed=1)
+    result.stdout.fnmatch_lines(["*N+1 6*"])
@@ -0,0 +1,57 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.utils.request_timing import (
+    RequestTimer, RequestTimingMiddleware, _server_timing, current_timer, record_phase, timed_phase,
+)
+
+
+def test_breakdown_attributes_remaining_time_to_other():
+    timer = RequestTimer()
+    timer.add("db_connect", 0.002)
+    timer.add_query("SELECT * FROM t WHERE id = %s", 0.010, False, rows=1)
+    timer.add("template_render", 0.003)
+    breakdown = timer.breakdown(0.020)
+    assert breakdown == {
+        "db_connect": 2.0, "db_query": 10.0, "template_render": 3.0, "external_http": 0.0,
+        "other": 5.0, "total": 20.0,
+    }
+
+
+def test_query_summary_groups_by_fingerprint():
+    timer = RequestTimer()
+    timer.add_query("SELECT * FROM t WHERE id = 1", 0.001, False, rows=1)
+    timer.add_query("SELECT * FROM t WHERE id = 2", 0.002, True)
+    timer.add_query("SELECT now()", 0.0005, False, rows=1)
+    summary = timer.query_summary()
+    assert summary[0]["sql"] == "select * from t where id = ?"
+    assert (summary[0]["calls"], summary[0]["errors"], summary[0]["rows"], summary[0]["ms"]) == (2, 1, 1, 3.0)
+    assert len(summary) == 2
+
+
+def test_server_timing_header_format():
+    assert _server_timing({"db_query": 1.5, "other": 0.25, "total": 1.75}) == \
+        b"db_query;dur=1.5, other;dur=0.25, total;dur=1.75"
+
+
+def test_phases_outside_requests_are_ignored():
+    assert current_timer() is None
+    record_phase("db_query", 1.0)
+    with timed_phase("external_http"):
+        pass
+
+
+def test_middleware_adds_server_timing_header():
+    app = FastAPI()
+    app.add_middleware(RequestTimingMiddleware, slow_ms=10_000)
+
+    @app.get("/items/{item_id}")
+    async def item(item_id: int):
+        record_phase("external_http", 0.004)
+        return {"id": item_id}
+
+    response = TestClient(app).get("/items/3")
+    assert response.status_code == 200
+    phases = dict(part.split(";dur=") for part in response.headers["server-timing"].split(", "))
+    assert set(phases) == {"db_connect", "db_query", "template_render", "external_http", "other", "total"}
+    assert float(phases["external_http"]) == 4.0
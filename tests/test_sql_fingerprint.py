@@ -0,0 +1,32 @@
+from app.utils.sql_fingerprint import fingerprint, fingerprint_id
+
+
+def test_literals_and_placeholders_become_marks():
+    assert fingerprint("SELECT * FROM tenants WHERE id = 15 AND name = 'علي'") == \
+        "select * from tenants where id = ? and name = ?"
+    assert fingerprint("SELECT * FROM t WHERE a = %s AND b = %(b)s AND c = $1") == \
+        "select * from t where a = ? and b = ? and c = ?"
+
+
+def test_in_lists_and_values_rows_collapse():
+    assert fingerprint("select x from t where id in (1, 2, 3)") == "select x from t where id in (?)"
+    assert fingerprint("INSERT INTO t (a, b) VALUES (%s, %s), (%s, %s);") == \
+        "insert into t (a, b) values (?)"
+
+
+def test_comments_removed_and_strings_not_read_as_comments():
+    assert fingerprint("SELECT 1 -- تعليق\nFROM t /* block */ WHERE s = '--x'") == \
+        "select ? from t where s = ?"
+    assert fingerprint("SELECT * FROM t WHERE s = 'it''s'") == "select * from t where s = ?"
+
+
+def test_identifiers_keep_digits_and_quoted_case():
+    assert fingerprint('SELECT "Name", t2.col1 FROM t2 WHERE n = -3.5e2') == \
+        'select "Name", t2.col1 from t2 where n = ?'
+
+
+def test_fingerprint_id_is_stable_for_equivalent_queries():
+    first = fingerprint_id("SELECT * FROM contracts WHERE id = 1")
+    assert first == fingerprint_id("select *\n  from contracts\n where id = 99;")
+    assert len(first) == 16
+    assert first != fingerprint_id("SELECT * FROM tenants WHERE id = 1")